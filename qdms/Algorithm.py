@@ -2,9 +2,11 @@ import numpy as np
 import math
 import time
 from bisect import bisect_left
+from .MemristorSimulation import find_nearest_combinations
 
 
-def algorithm(resolution, memristor_simulation, verbose=False):
+def algorithm(resolution, memristor_simulation, verbose=False, is_direct=False, v_min=None, v_max=None, policy='full',
+              width=None, percentiles=(5, 95)):
     """
     Parameters
     ----------.
@@ -14,6 +16,14 @@ def algorithm(resolution, memristor_simulation, verbose=False):
     memristor_simulation: MemristorSimulation
         The memristor simulation object
 
+    is_direct : bool
+        If true, the voltages are found with find_correspondence_direct() from the states of the memristors, so
+        memristor_simulation doesn't need to be simulated.
+
+    v_min, v_max, policy, width, percentiles :
+        Range of the voltages. See ask_v_min_v_max(). The policy 'percentile' uses the voltages of
+        memristor_simulation.
+
     diff_flag : bool
         if True, will output the difference between the target and the result
 
@@ -23,14 +33,33 @@ def algorithm(resolution, memristor_simulation, verbose=False):
         Dictionary where the key is the voltage output and the package is the resistance value of each memristor
 
     """
-    v_min, v_max = ask_v_min_v_max(memristor_simulation.circuit)
+    if policy == 'percentile':
+        if memristor_simulation.voltages is not None:
+            achievable = memristor_simulation.voltages
+        else:
+            achievable = np.fromiter(memristor_simulation.voltages_memristor.keys(), dtype=float)
+    else:
+        achievable = None
+    v_min, v_max = ask_v_min_v_max(memristor_simulation.circuit, v_min=v_min, v_max=v_max, policy=policy, width=width,
+                                   voltages=achievable, percentiles=percentiles)
     voltage_target = np.linspace(v_min, v_max, num=math.ceil((v_max - v_min) / resolution) + 1)
-    voltage_table = {}
-    for k, v in memristor_simulation.voltages_memristor.items():
-        if v_min <= k <= v_max:
-            voltage_table[k] = v
     print(f'Sweep between {v_min} and {v_max} with a step of {resolution}, which give {round(len(voltage_target))} values')
-    voltages = find_correspondence(voltage_target, voltage_table, verbose=verbose)
+    if is_direct:
+        voltages = find_correspondence_direct(voltage_target, memristor_simulation.circuit,
+                                              memristor_simulation.create_resistance_table(),
+                                              is_with_replacement=memristor_simulation.distribution_type == 'linear',
+                                              verbose=verbose, v_min=v_min, v_max=v_max)
+    elif memristor_simulation.voltages is not None:
+        start = np.searchsorted(memristor_simulation.voltages, v_min, side='left')
+        stop = np.searchsorted(memristor_simulation.voltages, v_max, side='right')
+        voltage_table = (memristor_simulation.voltages[start:stop], memristor_simulation.resistances[start:stop])
+        voltages = find_correspondence(voltage_target, voltage_table, verbose=verbose)
+    else:
+        voltage_table = {}
+        for k, v in memristor_simulation.voltages_memristor.items():
+            if v_min <= k <= v_max:
+                voltage_table[k] = v
+        voltages = find_correspondence(voltage_target, voltage_table, verbose=verbose)
 
     if verbose:
         diff = []
@@ -65,26 +94,77 @@ def calculate_min_max_voltage(circuit):
     return voltage_min, voltage_max
 
 
-def ask_v_min_v_max(circuit):
+def ask_v_min_v_max(circuit, v_min=None, v_max=None, policy='full', width=None, voltages=None, percentiles=(5, 95)):
     """
+    The explicit v_min and v_max are used as is. Otherwise, they are chosen according to the policy:
+        'ask' : The user enters them in the console.
+        'full' : The whole range of calculate_min_max_voltage(), which doesn't need any simulation.
+        'centered' : A window of width (V) at the center of the whole range.
+        'percentile' : The percentiles of the achievable voltages.
+    Only 'ask' waits for the user, so it's never the default: 'full' is.
+
     Parameters
     ----------.
     circuit : Circuit
         Circuit object
 
+    v_min, v_max : float
+        Voltage minimum and maximum. If None, chosen by the policy.
+
+    policy : string
+        How the missing voltages are chosen: 'ask', 'full', 'centered' or 'percentile'. Default: 'full'.
+
+    width : float
+        Width of the window of the policy 'centered'. (V)
+
+    voltages : iterable[float]
+        The achievable voltages, needed by the policy 'percentile'.
+
+    percentiles : tuple[float, float]
+        The percentiles of the achievable voltages kept by the policy 'percentile'.
+
     Returns
     -------
     voltage_min, voltage_max : float
         The voltage minimum and maximum chose by the user
 
     """
-    v_min, v_max = calculate_min_max_voltage(circuit)
-    voltage_min = voltage_max = -1
-    while not v_min <= voltage_min <= v_max:
-        voltage_min = float(input(f'Enter v_min (must be between {v_min} and {v_max}):'))
-    while not voltage_min <= voltage_max <= v_max:
-        voltage_max = float(input(f'Enter v_max (must be between {voltage_min} and {v_max}):'))
-    return voltage_min, voltage_max
+    voltage_min_possible, voltage_max_possible = calculate_min_max_voltage(circuit)
+    if policy == 'ask':
+        voltage_min = voltage_max = -1
+        if v_min is not None:
+            voltage_min = v_min
+        while not voltage_min_possible <= voltage_min <= voltage_max_possible:
+            voltage_min = float(input(f'Enter v_min (must be between {voltage_min_possible} and {voltage_max_possible}):'))
+        if v_max is not None:
+            voltage_max = v_max
+        while not voltage_min <= voltage_max <= voltage_max_possible:
+            voltage_max = float(input(f'Enter v_max (must be between {voltage_min} and {voltage_max_possible}):'))
+        return voltage_min, voltage_max
+    elif policy == 'full':
+        voltage_min, voltage_max = voltage_min_possible, voltage_max_possible
+    elif policy == 'centered':
+        if width is None:
+            raise Exception('The policy centered needs a width.')
+        center = (voltage_min_possible + voltage_max_possible) / 2
+        voltage_min = max(voltage_min_possible, center - width / 2)
+        voltage_max = min(voltage_max_possible, center + width / 2)
+    elif policy == 'percentile':
+        if voltages is None or len(voltages) == 0:
+            raise Exception('The policy percentile needs the achievable voltages.')
+        voltage_min, voltage_max = np.clip(np.percentile(voltages, percentiles), voltage_min_possible,
+                                           voltage_max_possible)
+    else:
+        raise Exception(f'Policy {policy} not supported.')
+
+    if v_min is not None:
+        voltage_min = v_min
+    if v_max is not None:
+        voltage_max = v_max
+    if not voltage_min_possible <= voltage_min <= voltage_max <= voltage_max_possible:
+        raise Exception(f'v_min and v_max must be between {voltage_min_possible} and {voltage_max_possible}, '
+                        f'got {voltage_min} and {voltage_max}.')
+    return float(voltage_min), float(voltage_max)
 
 
 def take_closest(myList, myNumber):
@@ -114,6 +194,32 @@ def find_nearest(array, value):
         return array[idx]
 
 
+def find_nearest_index(array, values):
+    """
+    Vectorized find_nearest(), returning the index of the nearest value of array for each value.
+
+    Parameters
+    ----------.
+    array : np.ndarray
+        The sorted array.
+
+    values : iterable[float]
+        The values to find.
+
+    Returns
+    -------
+    index : np.ndarray
+        The index in array of the nearest value, the highest one when two are equally near, like find_nearest().
+
+    """
+    values = np.asarray(values, dtype=float)
+    idx = np.searchsorted(array, values, side="left")
+    before = np.maximum(idx - 1, 0)
+    after = np.minimum(idx, len(array) - 1)
+    is_before = (idx > 0) & ((idx == len(array)) | (np.abs(values - array[before]) < np.abs(values - array[after])))
+    return np.where(is_before, before, after)
+
+
 def find_correspondence(voltage_target, voltage_table, verbose=False):
     """
     Parameters
@@ -121,8 +227,9 @@ def find_correspondence(voltage_target, voltage_table, verbose=False):
     voltage_target : list of float
         The list of wanted voltages
 
-    voltage_table : list of float
-        The list of possible voltages from the memristor_simulation
+    voltage_table : dict or (np.ndarray, np.ndarray)
+        The possible voltages from the memristor_simulation, either as voltages_memristor or as the sorted voltages
+        array and the aligned resistances matrix (see MemristorSimulation.voltages and MemristorSimulation.resistances).
 
     Returns
     -------
@@ -131,17 +238,60 @@ def find_correspondence(voltage_target, voltage_table, verbose=False):
 
 
     """
-    voltages = {}
     if verbose:
-        time_start = time_loop = time.time()
-    voltages_ = list(voltage_table.keys())
-    for i in range(len(voltage_target)):
-        v = find_nearest(voltages_, voltage_target[i])
-        voltages[v] = np.sort(voltage_table[v])
-        if i % 50 == 0 and verbose:
-            left = len(voltage_target) - i
-            print(f'Done: {i}\tLeft: {left}\tTime left: {round((left / 50 ) * (time.time() - time_loop),2)}s')
-            time_loop = time.time()
+        time_start = time.time()
+    if isinstance(voltage_table, dict):
+        voltages_ = np.fromiter(voltage_table.keys(), dtype=float, count=len(voltage_table))
+        index = find_nearest_index(voltages_, voltage_target)
+        values = list(voltage_table.values())
+        voltages = {}
+        for i in index.tolist():
+            voltages[voltages_[i].item()] = np.sort(values[i])
+    else:
+        voltages_, resistances = voltage_table
+        index = find_nearest_index(voltages_, voltage_target)
+        voltages = dict(zip(voltages_[index].tolist(), np.sort(resistances[index], axis=1)))
+    if verbose:
+        print(f'Total time {time.time() - time_start}')
+    return voltages
+
+
+def find_correspondence_direct(voltage_target, circuit, resistance_table, is_with_replacement=False, verbose=False,
+                               v_min=None, v_max=None):
+    """
+    Same as find_correspondence(), but the nearest combination of each target is searched directly from the states of
+    the memristors (see MemristorSimulation.find_nearest_combinations()), without the table of every combination.
+
+    Parameters
+    ----------.
+    voltage_target : list of float
+        The list of wanted voltages
+
+    circuit : Circuit
+        Circuit object
+
+    resistance_table : iterable[iterable[float]]
+        The resistance (Ohm) of each state of each memristor. See MemristorSimulation.create_resistance_table().
+
+    is_with_replacement : bool
+        If true, every memristor has the same states (distribution_type 'linear').
+
+    v_min, v_max : float
+        If not None, only the combinations with a voltage output (V) in [v_min, v_max] are kept, like the table
+        restricted to this range by algorithm().
+
+    Returns
+    -------
+    voltages : dict
+        Dictionary where the key is the voltage output and the package is the resistance value of each memristor, sorted.
+
+    """
+    if verbose:
+        time_start = time.time()
+    voltages_, resistances = find_nearest_combinations(voltage_target, circuit, resistance_table,
+                                                       is_with_replacement=is_with_replacement, v_min=v_min,
+                                                       v_max=v_max)
+    voltages = {v: np.sort(r) for v, r in zip(voltages_.tolist(), resistances)}
     if verbose:
         print(f'Total time {time.time() - time_start}')
     return voltages
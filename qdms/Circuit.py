@@ -1,5 +1,7 @@
 from .Memristor import Memristor
+from .Data_Driven import read_memristors
 import copy
+import math
 
 
 class Circuit:
@@ -27,9 +29,17 @@ class Circuit:
         The simulator accept two types of architecture. If false, the old architecture is used, which is based on a
         voltage divider. The new architecture moves the memristor in the feedback loop of an op-amp.
 
+    conductance : float
+        The sum of the conductance (S) of the memristors, kept up to date by update_conductance() each time the g of a
+        memristor changes. None while the g of a memristor is None.
+
+    refresh_interval : int
+        The number of updates of conductance after which it's summed again from the memristors, so the rounding errors
+        of the updates don't add up.
+
     """
     def __init__(self, memristor_model, number_of_memristor, gain_resistance=0, v_in=1e-3, R_L=1,
-                 is_new_architecture=True):
+                 is_new_architecture=True, refresh_interval=10000):
         if not isinstance(memristor_model, Memristor):
             print(f'Error: memristor object <{memristor_model}> doesn\'t inherited from Memristor ABC')
             exit(1)
@@ -42,6 +52,23 @@ class Circuit:
         self.list_memristor = []
         for _ in range(number_of_memristor):
             self.list_memristor.append(copy.deepcopy(memristor_model))
+        if getattr(memristor_model, 'rng', None) is not None:
+            # A copy of the generator would draw the same numbers as the others
+            for memristor, rng in zip(self.list_memristor, memristor_model.rng.spawn(number_of_memristor)):
+                memristor.rng = rng
+        self.refresh_interval = refresh_interval
+        for memristor in self.list_memristor:
+            memristor.observers.append(self)
+        self.refresh_conductance()
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.__dict__.setdefault('refresh_interval', 10000)
+        # The memristors don't keep their observers when pickled
+        for memristor in self.list_memristor:
+            if self not in memristor.observers:
+                memristor.observers.append(self)
+        self.refresh_conductance()
 
     def print(self):
         print(self.memristor_model)
@@ -73,17 +100,85 @@ class Circuit:
             voltage = conductance * self.gain_resistance * self.v_in
         return voltage
 
+    def calculate_conductance(self, voltage):
+        """
+        This function calculate the conductance of the memristors giving this voltage. See calculate_voltage().
+
+        Parameters
+        ----------
+        voltage : float
+            The voltage of the circuit (V).
+
+        Returns
+        ----------
+        conductance : float
+            Conductance of the memristors (S).
+
+        """
+        if self.is_new_architecture:
+            conductance = self.v_in / (self.R_L * voltage)
+        else:
+            conductance = voltage / (self.gain_resistance * self.v_in)
+        return conductance
+
+    def refresh_conductance(self):
+        """
+        This function sums again the conductance of the memristors in conductance, None if the g of a memristor is None.
+        """
+        list_g = [memristor.g for memristor in self.list_memristor]
+        self.conductance = None if None in list_g else math.fsum(list_g)
+        self.number_of_update = 0
+
+    def update_conductance(self, memristor, previous_g, g):
+        """
+        This function updates conductance when the g of a memristor of the circuit changes. See Memristor.observers.
+
+        Parameters
+        ----------
+        memristor : Memristor
+            The memristor changed.
+
+        previous_g : float
+            The previous conductance of the memristor (S).
+
+        g : float
+            The new conductance of the memristor (S).
+        """
+        if previous_g is None or g is None or self.conductance is None:
+            self.refresh_conductance()
+            return
+        self.conductance += g - previous_g
+        self.number_of_update += 1
+        if self.number_of_update >= self.refresh_interval:
+            self.refresh_conductance()
+
     def current_conductance(self):
         """
-        This function return the current conductance of the circuit.
+        This function return the current conductance of the circuit, reading each memristor once, with their variability.
         """
         g = 0
-        for res in self.list_memristor:
-            g += 1 / res.read()
+        for res in read_memristors(self.list_memristor).tolist():
+            g += 1 / res
         return g
 
     def current_v_out(self):
         """
-        This function return the current voltage output of the circuit.
+        This function return the current voltage output of the circuit, reading each memristor once.
         """
         return self.calculate_voltage(self.current_conductance())
+
+    def running_conductance(self):
+        """
+        This function return the conductance of the circuit kept up to date in conductance, without reading the
+        memristors, so without the variability of the readings. See current_conductance().
+        """
+        if self.conductance is None:
+            raise Exception('Circuit conductance unknown: the g of a memristor is None.')
+        return self.conductance
+
+    def running_v_out(self):
+        """
+        This function return the voltage output of the running conductance, without the variability of the readings.
+        See current_v_out().
+        """
+        return self.calculate_voltage(self.running_conductance())
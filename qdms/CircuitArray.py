@@ -0,0 +1,222 @@
+import math
+import numpy as np
+from .Circuit import Circuit
+from .Data_Driven import Data_Driven, PARAMETER_NAMES, stack_parameters, read_batch
+
+
+class MemristorView(Data_Driven):
+    """
+    This class is a memristor of a CircuitArray. Its conductance, variability switch, write thresholds and model
+    parameters are entries of the arrays of the circuit, without a copy, and its other attributes are the ones of
+    circuit.memristor_model. It behaves like the Data_Driven device it replaces in circuit.list_memristor. Its read
+    noise (rng and noise buffer) is its own.
+
+    Parameters
+    ----------
+    circuit : CircuitArray
+        The circuit holding the memristor.
+
+    index : int
+        The index of the memristor in the arrays of the circuit.
+    """
+
+    def __init__(self, circuit, index, rng=None):
+        # Not Data_Driven.__init__(): the parameters are read from circuit.memristor_model
+        self.circuit = circuit
+        self.index = index
+        self.observers = []
+        self.finite_states = None
+        self.noise_buffer = None
+        self.noise_index = 0
+        self.rng = rng
+
+    def __setstate__(self, state):
+        # Not Data_Driven.__setstate__(): its defaults would shadow the attributes of circuit.memristor_model
+        self.__dict__.update(state)
+
+    def __getattr__(self, name):
+        # Only called for the attributes not set on the view nor in circuit.parameters, the ones of the model
+        if 'circuit' not in self.__dict__:
+            raise AttributeError(name)
+        return getattr(self.circuit.memristor_model, name)
+
+    @property
+    def g(self):
+        return self.circuit.g.item(self.index)
+
+    @g.setter
+    def g(self, g):
+        previous_g = self.circuit.g.item(self.index)
+        self.circuit.g[self.index] = g
+        self.circuit.update_conductance(self, previous_g, g)
+        for observer in self.observers:
+            observer.update_conductance(self, previous_g, g)
+
+    @property
+    def is_variability_on(self):
+        return self.circuit.is_variability_on.item(self.index)
+
+    @is_variability_on.setter
+    def is_variability_on(self, is_variability_on):
+        self.circuit.is_variability_on[self.index] = is_variability_on
+
+    @property
+    def pos_write_threshold(self):
+        return self.circuit.pos_write_threshold.item(self.index)
+
+    @pos_write_threshold.setter
+    def pos_write_threshold(self, pos_write_threshold):
+        self.circuit.pos_write_threshold[self.index] = pos_write_threshold
+
+    @property
+    def neg_write_threshold(self):
+        return self.circuit.neg_write_threshold.item(self.index)
+
+    @neg_write_threshold.setter
+    def neg_write_threshold(self, neg_write_threshold):
+        self.circuit.neg_write_threshold[self.index] = neg_write_threshold
+
+
+def parameter_property(name):
+    """
+    This function creates the property of MemristorView reading and writing the parameter name of the memristor in
+    circuit.parameters. r_p and r_n are read as lists, like the ones of Data_Driven.
+
+    Parameters
+    ----------
+    name : string
+        The name of the parameter, in PARAMETER_NAMES or r_p and r_n.
+
+    Returns
+    ----------
+    parameter : property
+        The property.
+    """
+    if name in PARAMETER_NAMES:
+        def get(self):
+            return self.circuit.parameters[name].item(self.index)
+    else:
+        def get(self):
+            return self.circuit.parameters[name][self.index].tolist()
+
+    def set(self, value):
+        self.circuit.parameters[name][self.index] = value
+    return property(get, set)
+
+
+for parameter_name in PARAMETER_NAMES + ['r_p', 'r_n']:
+    setattr(MemristorView, parameter_name, parameter_property(parameter_name))
+
+
+class CircuitArray(Circuit):
+    """
+    This class is a Circuit storing its memristors in arrays, one entry per memristor, instead of one deep copy of
+    memristor_model per memristor: the conductances, the variability switches, the write thresholds and the model
+    parameters (see Data_Driven.stack_parameters()). The memristors are read and set all at once with read_all() and
+    set_all(), and v_out() evaluates many conductances at once. list_memristor holds a MemristorView per memristor, so
+    it can be used anywhere a Circuit is. memristor_model needs to be a Data_Driven.
+
+    Parameters
+    ----------
+    g : np.ndarray
+        The conductance (S) of each memristor. Shape (number_of_memristor,).
+
+    is_variability_on : np.ndarray
+        If true, the readings of the memristor have variability. Shape (number_of_memristor,).
+
+    pos_write_threshold, neg_write_threshold : np.ndarray
+        The write thresholds (V) of each memristor. Shape (number_of_memristor,).
+
+    parameters : dict
+        The parameters of each memristor, see Data_Driven.stack_parameters(), initially the ones of memristor_model. The
+        views read their parameters there, and stack_parameters() slices them for the batch functions.
+
+    See Circuit for the other parameters.
+    """
+    def __init__(self, memristor_model, number_of_memristor, gain_resistance=0, v_in=1e-3, R_L=1,
+                 is_new_architecture=True, refresh_interval=10000):
+        if not isinstance(memristor_model, Data_Driven):
+            raise Exception(f'CircuitArray memristor model <{memristor_model}> is not a Data_Driven.')
+        self.memristor_model = memristor_model
+        self.number_of_memristor = number_of_memristor
+        self.gain_resistance = gain_resistance
+        self.v_in = v_in
+        self.R_L = R_L
+        self.is_new_architecture = is_new_architecture
+        self.refresh_interval = refresh_interval
+
+        self.g = np.full(number_of_memristor, memristor_model.g, dtype=float)
+        self.is_variability_on = np.full(number_of_memristor, memristor_model.is_variability_on, dtype=bool)
+        self.pos_write_threshold = np.full(number_of_memristor, memristor_model.pos_write_threshold, dtype=float)
+        self.neg_write_threshold = np.full(number_of_memristor, memristor_model.neg_write_threshold, dtype=float)
+        self.parameters = {name: np.repeat(value, number_of_memristor, axis=0)
+                           for name, value in stack_parameters([memristor_model]).items()}
+
+        # A copy of the generator would draw the same numbers as the others
+        rngs = memristor_model.rng.spawn(number_of_memristor) if memristor_model.rng is not None \
+            else [None] * number_of_memristor
+        self.list_memristor = [MemristorView(self, i, rng) for i, rng in enumerate(rngs)]
+        self.refresh_conductance()
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.refresh_conductance()
+
+    def refresh_conductance(self):
+        """
+        This function sums again the conductance of the memristors in conductance.
+        """
+        self.conductance = math.fsum(self.g.tolist())
+        self.number_of_update = 0
+
+    def read_all(self):
+        """
+        This function reads each memristor once, with their variability, like read() on each of them in order would. It
+        takes one np.random.normal() call when they use the global np.random without a noise buffer.
+
+        Returns
+        ----------
+        resistances : np.ndarray
+            The resistances read (Ohm). Shape (number_of_memristor,).
+        """
+        if self.memristor_model.noise_buffer_size or any(memristor.rng is not None for memristor in self.list_memristor):
+            return np.array([memristor.read() for memristor in self.list_memristor], dtype=float)
+        return read_batch(1 / self.g, self.parameters, self.is_variability_on)
+
+    def set_all(self, g):
+        """
+        This function sets the conductance of all the memristors.
+
+        Parameters
+        ----------
+        g : float or np.ndarray
+            The conductance (S), one for all or one per memristor.
+        """
+        self.g[:] = g
+        self.refresh_conductance()
+
+    def v_out(self, g=None):
+        """
+        This function calculates the voltage output of the circuit for conductances of the memristors, without reading
+        them.
+
+        Parameters
+        ----------
+        g : np.ndarray
+            The conductance (S) of each memristor, of shape (..., number_of_memristor), for example one row per sample
+            of a Monte-Carlo ensemble. If None, the current conductances.
+
+        Returns
+        ----------
+        voltage : float or np.ndarray
+            The voltage output (V), one per row of g.
+        """
+        if g is None:
+            return self.running_v_out()
+        return self.calculate_voltage(np.sum(g, axis=-1))
+
+    def current_conductance(self):
+        """
+        This function return the current conductance of the circuit, reading each memristor once, with their variability.
+        """
+        return float(np.sum(1 / self.read_all()))
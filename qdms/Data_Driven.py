@@ -1,7 +1,7 @@
 import math
 import numpy as np
 from .Memristor import Memristor as Memristor
-import random
+from .HelperFunction import random_generator
 
 
 class Data_Driven(Memristor):
@@ -43,9 +43,16 @@ class Data_Driven(Memristor):
         b_n model parameter.
     is_variability_on : bool
         If true, a variability will be apply on reading.
+    noise_buffer_size : int
+        If not 0, the noise of the readings comes from a buffer of noise_buffer_size standard normal samples, refilled
+        when empty, instead of one np.random.normal() call per reading. The samples are the same as np.random.normal()
+        would draw, but ahead of time, so they are shifted relative to the other users of np.random.
+    rng : np.random.Generator
+        Generator of the read noise. If None, the global np.random is used. See HelperFunction.random_generator().
+        Circuit gives each of its memristors an independent stream spawned from it.
     """
 
-    def __init__(self, parameter_model='O921C', is_variability_on=False):
+    def __init__(self, parameter_model='O921C', is_variability_on=False, noise_buffer_size=0, rng=None):
         self.A_p = self.A_n = self.t_p = self.t_n = self.k_p = self.k_n = self.eta = self.a_p = self.a_n = self.b_p = self.b_n = self.variability_a = self.variability_b = 0
         self.r_p = self.r_n = None
         self.parameter_model = parameter_model.upper()
@@ -55,6 +62,24 @@ class Data_Driven(Memristor):
         )
         self.g = 1 / self.r_on
         self.is_variability_on = is_variability_on
+        self.noise_buffer_size = noise_buffer_size
+        self.noise_buffer = None
+        self.noise_index = 0
+        self.rng = random_generator(rng)
+
+    def __getstate__(self):
+        # The buffer is drawn again after a copy, so copies of a device don't read the same noise
+        state = super(Data_Driven, self).__getstate__()
+        state['noise_buffer'] = None
+        state['noise_index'] = 0
+        return state
+
+    def __setstate__(self, state):
+        super(Data_Driven, self).__setstate__(state)
+        self.__dict__.setdefault('noise_buffer_size', 0)
+        self.__dict__.setdefault('noise_buffer', None)
+        self.__dict__.setdefault('noise_index', 0)
+        self.__dict__.setdefault('rng', None)
 
     def set_parameter(self):
         if self.parameter_model == 'N1257R':
@@ -127,7 +152,69 @@ class Data_Driven(Memristor):
         variability = 0
         if self.is_variability_on:
             variability = self.variability(res)
-        return np.random.normal(res, variability * res / 100)
+        rng = np.random if self.rng is None else self.rng
+        if not self.noise_buffer_size:
+            return rng.normal(res, variability * res / 100)
+        if not self.is_variability_on:
+            return res
+        if self.noise_buffer is None or self.noise_index >= len(self.noise_buffer):
+            self.noise_buffer = rng.standard_normal(self.noise_buffer_size)
+            self.noise_index = 0
+        self.noise_index += 1
+        # Same as np.random.normal(), which is loc + scale * standard normal sample
+        return res + variability * res / 100 * self.noise_buffer[self.noise_index - 1]
+
+    def draw_noise(self, number):
+        """
+        This function takes the next number samples of the noise buffer, refilling it as needed.
+
+        Parameters
+        ----------
+        number : int
+            The number of samples.
+
+        Returns
+        ----------
+        noise : np.ndarray
+            Standard normal samples. Shape (number,).
+        """
+        noise = np.empty(number)
+        done = 0
+        while done < number:
+            if self.noise_buffer is None or self.noise_index >= len(self.noise_buffer):
+                rng = np.random if self.rng is None else self.rng
+                self.noise_buffer = rng.standard_normal(self.noise_buffer_size)
+                self.noise_index = 0
+            taken = min(number - done, len(self.noise_buffer) - self.noise_index)
+            noise[done:done + taken] = self.noise_buffer[self.noise_index:self.noise_index + taken]
+            self.noise_index += taken
+            done += taken
+        return noise
+
+    def read_many(self, number):
+        """
+        This function reads the device number times, like number calls to read() would.
+
+        Parameters
+        ----------
+        number : int
+            The number of readings.
+
+        Returns
+        ----------
+        resistances : np.ndarray
+            The resistances read. Shape (number,).
+        """
+        res = 1 / self.g
+        variability = 0
+        if self.is_variability_on:
+            variability = self.variability(res)
+        if not self.noise_buffer_size:
+            rng = np.random if self.rng is None else self.rng
+            return rng.normal(res, variability * res / 100, number)
+        if not self.is_variability_on:
+            return np.full(number, res)
+        return res + variability * res / 100 * self.draw_noise(number)
 
     def simulate(self, voltage_signal, return_current=False, version2018=False):
         len_voltage_signal = 1
@@ -151,6 +238,62 @@ class Data_Driven(Memristor):
         if return_current:
             return current
         
+    def simulate_pulse(self, voltage, number_step, version2018=False):
+        """Method to apply a constant voltage pulse of number_step timesteps. The resistance after the pulse is found
+        with the closed form of the recurrence (see pulse_batch()) instead of simulating each timestep.
+
+        Parameters
+        ----------
+        voltage : float
+            The voltage (V) of the pulse.
+        number_step : int
+            The length of the pulse, in number of time_series_resolution.
+        version2018 : bool
+            If true, use resistance2018() instead of resistance().
+        """
+        if number_step <= 2:
+            self.simulate([voltage] * number_step, version2018=version2018)
+            return
+        self.simulate([voltage], version2018=version2018)
+        remaining = number_step - 1
+        r1 = 1 / self.g
+        resistance_ = None
+        if version2018:
+            if voltage == 0:
+                return
+            if voltage > 0:
+                k = self.k_p
+                r = sum(self.r_p[m] * voltage ** m for m in range(len(self.r_p)))
+                log_factor = -k * (self.A_p * (math.exp(self.t_p * abs(voltage)) - 1)) * self.time_series_resolution
+            else:
+                k = -self.k_n
+                r = sum(self.r_n[m] * voltage ** m for m in range(len(self.r_n)))
+                log_factor = self.k_n * (self.A_n * (-1 + math.exp(self.t_n * abs(voltage)))) * self.time_series_resolution
+            u = math.exp(k * r1) - math.exp(k * r)
+            if self.eta == 1 and u > 0:
+                return
+            if self.eta == 1:
+                try:
+                    resistance_ = math.log(math.exp(k * r) + math.exp(remaining * log_factor) * u) / k
+                except (ValueError, OverflowError):
+                    pass
+        else:
+            if voltage > 0:
+                r, s, sign = self.r_pn2017(voltage, self.r_p[0], self.r_p[1]), self.s_pn2017(voltage, self.A_p, self.t_p), 1
+            else:
+                r, s, sign = self.r_pn2017(voltage, self.r_n[0], self.r_n[1]), self.s_pn2017(voltage, self.A_n, self.t_n), -1
+            x = r1 - r
+            s_dt = s * self.time_series_resolution
+            if x * sign < 0 and 1 - s_dt * x > 0:
+                return
+            if s * x <= 0 and x * sign >= 0:
+                resistance_ = r + x / (1 - remaining * s_dt * x)
+
+        if resistance_ is None or not math.isfinite(resistance_):
+            self.simulate([voltage] * remaining, version2018=version2018)
+        else:
+            self.g = 1 / max(min(resistance_, self.r_off), self.r_on)
+
     def r_pn2017(self,voltage,a0,a1):
             """Function to return rp(v) or rn(v)
             From the 2017 paper model calculations
@@ -389,3 +532,349 @@ class Data_Driven(Memristor):
             log_scale=log_scale,
             return_result=return_result,
         )
+
+
+PARAMETER_NAMES = ['r_off', 'r_on', 'time_series_resolution', 'A_p', 'A_n', 't_p', 't_n', 'k_p', 'k_n', 'eta', 'a_p',
+                   'a_n', 'b_p', 'b_n', 'variability_a', 'variability_b']
+
+
+def circuit_parameters(memristors):
+    """
+    This function slices the parameters of memristors which are all views of the same CircuitArray from the arrays of
+    the circuit, without reading each of them.
+
+    Parameters
+    ----------
+    memristors : list[Memristor]
+        The devices.
+
+    Returns
+    ----------
+    parameters : dict
+        The parameters of the devices, like stack_parameters(). None if they aren't views of the same CircuitArray.
+    """
+    circuit = getattr(memristors[0], 'circuit', None) if memristors else None
+    if circuit is None or not all(getattr(m, 'circuit', None) is circuit for m in memristors):
+        return None
+    index = np.array([m.index for m in memristors], dtype=int)
+    return {name: value[index] for name, value in circuit.parameters.items()}
+
+
+def stack_parameters(memristors):
+    """
+    This function gather the parameters of many Data_Driven devices in arrays, one entry per device.
+
+    Parameters
+    ----------
+    memristors : iterable[Data_Driven]
+        The devices.
+
+    Returns
+    ----------
+    parameters : dict
+        Dictionary where the key is the parameter name and the package is an array of shape (N,). r_p and r_n are of
+        shape (N, M), where M is the largest number of coefficients (missing coefficients are 0).
+    """
+    memristors = list(memristors)
+    parameters = circuit_parameters(memristors)
+    if parameters is not None:
+        return parameters
+    parameters = {name: np.array([getattr(m, name) for m in memristors], dtype=float) for name in PARAMETER_NAMES}
+    number_coefficient = max(max(len(m.r_p), len(m.r_n)) for m in memristors)
+    for name in ['r_p', 'r_n']:
+        coefficients = np.zeros((len(memristors), number_coefficient))
+        for i, m in enumerate(memristors):
+            coefficients[i, :len(getattr(m, name))] = getattr(m, name)
+        parameters[name] = coefficients
+    return parameters
+
+
+def read_memristors(memristors):
+    """
+    This function reads each device once, like read() on each of them in order would, with one np.random.normal() call
+    when they all use the global np.random without a noise buffer.
+
+    Parameters
+    ----------
+    memristors : iterable[Memristor]
+        The devices.
+
+    Returns
+    ----------
+    resistances : np.ndarray
+        The resistances read. Shape (N,).
+    """
+    memristors = list(memristors)
+    if not all(isinstance(m, Data_Driven) and m.rng is None and not m.noise_buffer_size for m in memristors):
+        return np.array([m.read() for m in memristors], dtype=float)
+    res = 1 / np.array([m.g for m in memristors], dtype=float)
+    parameters = circuit_parameters(memristors)
+    if parameters is None:
+        parameters = {name: np.array([getattr(m, name) for m in memristors], dtype=float)
+                      for name in ['variability_a', 'variability_b']}
+    return read_batch(res, parameters, [m.is_variability_on for m in memristors])
+
+
+def read_batch(resistance, parameters, is_variability_on, rng=None):
+    """
+    Vectorized version of Data_Driven.read() without noise buffer: the resistances read for N devices of resistance
+    resistance, with one normal() call. The draws are in the C order of resistance, so the same as read() on each
+    device in that order.
+
+    Parameters
+    ----------
+    resistance : np.ndarray
+        The resistance (Ohm) of the devices, of shape (..., N).
+
+    parameters : dict
+        The parameters of the N devices, see stack_parameters(). Only variability_a and variability_b are used.
+
+    is_variability_on : iterable[bool]
+        If true, the readings of the device have variability. Shape (N,).
+
+    rng : np.random.Generator
+        The generator of the noise. If None, the global np.random is used.
+
+    Returns
+    ----------
+    resistance : np.ndarray
+        The resistances read (Ohm). Same shape as resistance.
+    """
+    resistance = np.asarray(resistance, dtype=float)
+    variability = np.where(is_variability_on, parameters['variability_a'] * resistance + parameters['variability_b'], 0)
+    return (np.random if rng is None else rng).normal(resistance, variability * resistance / 100)
+
+
+def simulate_batch(conductance, voltage_signal, parameters, return_current=False, version2018=False):
+    """
+    Vectorized version of Data_Driven.simulate() which advances N devices at once. The time loop is kept, but every
+    term that only depends on the voltage is computed before it, so each timestep is a handful of array operations.
+
+    Parameters
+    ----------
+    conductance : iterable[float]
+        The conductance (S) of the N devices.
+
+    voltage_signal : iterable[float] or iterable[iterable[float]]
+        A discrete voltage signal with resolution time_series_resolution. Of shape (T,) if shared by all the devices,
+        or (N, T) for a signal per device.
+
+    parameters : dict
+        The parameters of the N devices, see stack_parameters().
+
+    return_current : bool
+        If true, the current (A) of each device at each timestep is returned.
+
+    version2018 : bool
+        If true, use resistance2018() instead of resistance().
+
+    Returns
+    ----------
+    conductance : np.ndarray
+        The conductance (S) of the N devices after the signal. Shape (N,).
+
+    current : np.ndarray
+        The current (A) of each device at each timestep. Shape (N, T). Only if return_current.
+    """
+    g = np.array(conductance, dtype=float).reshape(-1)
+    voltage_signal = np.asarray(voltage_signal, dtype=float)
+    if voltage_signal.ndim == 0:
+        voltage_signal = voltage_signal.reshape(1)
+    if voltage_signal.ndim == 1 and all(np.all(v == v[:1]) for v in parameters.values()):
+        # Same signal and same model for every device: the voltage terms are computed once and broadcast
+        parameters = {k: v[:1] for k, v in parameters.items()}
+        voltage_signal = voltage_signal[:, None]
+    else:
+        # Timestep first, so each step works on a contiguous row
+        voltage_signal = np.ascontiguousarray(np.broadcast_to(voltage_signal, (len(g), voltage_signal.shape[-1])).T)
+    p = {k: v[None] for k, v in parameters.items() if v.ndim == 1}
+    is_positive = voltage_signal > 0
+    dt = p['time_series_resolution']
+
+    if return_current:
+        current = np.empty((voltage_signal.shape[0], len(g)))
+        a = np.where(is_positive, p['a_p'], p['a_n'])
+        sinh = np.sinh(np.where(is_positive, p['b_p'], p['b_n']) * voltage_signal)
+
+    if version2018:
+        step = _precompute_step2018(voltage_signal, p, parameters)
+    else:
+        step = _precompute_step2017(voltage_signal, is_positive, p, parameters)
+
+    with np.errstate(over='ignore', invalid='ignore', divide='ignore'):
+        for t in range(voltage_signal.shape[0]):
+            if return_current:
+                current[t] = a[t] * g * sinh[t]
+            r0 = 1 / g
+            if version2018:
+                resistance_ = _step2018(r0, step, t, p)
+            else:
+                r, sr, s, sign = step['r'][t], step['sr'][t], step['s'][t], step['sign'][t]
+                resistance_ = (r0 + (sr * (r - r0)) * dt[0]) / (1 + s * (r - r0) * dt[0])
+                keep = (resistance_ - r) * sign < 0
+                resistance_ = np.maximum(np.minimum(resistance_, p['r_off'][0]), p['r_on'][0])
+                resistance_ = np.where(keep, r0, resistance_)
+            g = 1 / resistance_
+
+    if return_current:
+        return g, current.T
+    return g
+
+
+def simulate_memristors(memristors, voltage_signal, return_current=False, version2018=False):
+    """
+    This function applies a voltage signal to many Data_Driven devices at once with simulate_batch() and updates their
+    conductance, like calling simulate() on each of them.
+
+    Parameters
+    ----------
+    memristors : iterable[Data_Driven]
+        The devices.
+
+    voltage_signal : iterable[float] or iterable[iterable[float]]
+        A discrete voltage signal, of shape (T,) if shared by all the devices or (N, T) for a signal per device.
+
+    return_current : bool
+        If true, the current (A) of each device at each timestep is returned.
+
+    version2018 : bool
+        If true, use resistance2018() instead of resistance().
+
+    Returns
+    ----------
+    current : np.ndarray
+        The current (A) of each device at each timestep. Shape (N, T). Only if return_current.
+    """
+    memristors = list(memristors)
+    result = simulate_batch([m.g for m in memristors], voltage_signal, stack_parameters(memristors),
+                            return_current=return_current, version2018=version2018)
+    g = result[0] if return_current else result
+    for memristor, g_ in zip(memristors, g.tolist()):
+        memristor.g = g_
+    if return_current:
+        return result[1]
+
+
+def pulse_batch(conductance, voltage, number_step, parameters, version2018=False):
+    """
+    Same result as simulate_batch() with a constant voltage during number_step timesteps, without the time loop.
+
+    With x = R - r(v), one timestep of resistance() is x' = x / (1 - s(v) * dt * x), so after n timesteps
+    x_n = x / (1 - n * s(v) * dt * x). With resistance2018() and eta = 1, exp(k * R) - exp(k * r(v)) (exp(-k * R) -
+    exp(-k * r(v)) for a negative voltage) is multiplied by the same factor at each timestep. In both cases the resistance
+    moves monotonically toward (or away from) r(v), so the confinement between r_on and r_off can be applied once at
+    the end. The first timestep is simulated to start from a confined resistance, and the devices outside of these
+    cases (or with a non-finite result) go through simulate_batch().
+
+    Parameters
+    ----------
+    conductance : iterable[float]
+        The conductance (S) of the N devices.
+
+    voltage : float or iterable[float]
+        The voltage (V) of the pulse, shared by all the devices or one per device.
+
+    number_step : int
+        The length of the pulse, in number of time_series_resolution.
+
+    parameters : dict
+        The parameters of the N devices, see stack_parameters().
+
+    version2018 : bool
+        If true, use resistance2018() instead of resistance().
+
+    Returns
+    ----------
+    conductance : np.ndarray
+        The conductance (S) of the N devices after the pulse. Shape (N,).
+    """
+    g = np.array(conductance, dtype=float).reshape(-1)
+    voltage = np.broadcast_to(np.asarray(voltage, dtype=float), g.shape)
+    if number_step <= 2:
+        return simulate_batch(g, np.repeat(voltage[:, None], number_step, axis=1), parameters, version2018=version2018)
+
+    g = simulate_batch(g, voltage[:, None], parameters, version2018=version2018)
+    remaining = number_step - 1
+    voltage_signal = voltage[None]
+    p = {k: v[None] for k, v in parameters.items() if v.ndim == 1}
+    r1 = 1 / g
+    with np.errstate(over='ignore', invalid='ignore', divide='ignore'):
+        if version2018:
+            step = _precompute_step2018(voltage_signal, p, parameters)
+            is_positive = step['is_positive'][0]
+            direction = np.where(is_positive, 1., -1.)
+            k = direction * np.where(is_positive, parameters['k_p'], parameters['k_n'])
+            r = np.where(is_positive, step['r_p'][0], step['r_n'][0])
+            log_factor = np.where(is_positive, step['log_decay_p'][0], step['shift_n'][0])
+            u = np.exp(k * r1) - np.exp(k * r)
+            resistance_ = np.log(np.exp(k * r) + np.exp(remaining * log_factor) * u) / k
+            is_exact = parameters['eta'] == 1
+            is_moving = is_exact & (u <= 0) & (voltage != 0)
+            is_stuck = is_exact & ((u > 0) | (voltage == 0))
+        else:
+            step = _precompute_step2017(voltage_signal, voltage_signal > 0, p, parameters)
+            r, s, sign = step['r'][0], step['s'][0], step['sign'][0]
+            x = r1 - r
+            s_dt = s * parameters['time_series_resolution']
+            resistance_ = r + x / (1 - remaining * s_dt * x)
+            is_moving = (s * x <= 0) & (x * sign >= 0)
+            is_stuck = (x * sign < 0) & (1 - s_dt * x > 0)
+        resistance_ = np.maximum(np.minimum(resistance_, parameters['r_off']), parameters['r_on'])
+        g_ = np.where(is_moving, 1 / resistance_, g)
+
+    is_other = ~(is_moving | is_stuck) | ~np.isfinite(g_)
+    if np.any(is_other):
+        g_[is_other] = simulate_batch(g[is_other], np.repeat(voltage[is_other, None], remaining, axis=1),
+                                      {k: v[is_other] for k, v in parameters.items()}, version2018=version2018)
+    return g_
+
+
+def _precompute_step2017(voltage_signal, is_positive, p, parameters):
+    """
+    Terms of resistance() which only depend on the voltage, for simulate_batch().
+    """
+    a0 = np.where(is_positive, parameters['r_p'][:, 0][None], parameters['r_n'][:, 0][None])
+    a1 = np.where(is_positive, parameters['r_p'][:, 1][None], parameters['r_n'][:, 1][None])
+    r = a0 + a1 * voltage_signal
+    A = np.where(is_positive, p['A_p'], p['A_n'])
+    t_ = np.where(is_positive, p['t_p'], p['t_n'])
+    s = A * (np.exp(np.abs(voltage_signal) / t_) - 1)
+    return {'r': r, 's': s, 'sr': s * r, 'sign': np.where(is_positive, 1., -1.)}
+
+
+def _precompute_step2018(voltage_signal, p, parameters):
+    """
+    Terms of resistance2018() which only depend on the voltage, for simulate_batch().
+    """
+    def r_pn(coefficients):
+        sum_ = np.zeros(voltage_signal.shape)
+        for m_pn in range(coefficients.shape[1]):
+            sum_ += coefficients[:, m_pn][None] * (voltage_signal ** m_pn)
+        return sum_
+
+    abs_voltage = np.abs(voltage_signal)
+    with np.errstate(over='ignore', invalid='ignore'):
+        r_p = r_pn(parameters['r_p'])
+        exp_r_p = np.exp(p['eta'] * p['k_p'] * r_p)
+        log_decay_p = -p['eta'] * p['k_p'] * (p['A_p'] * (np.exp(p['t_p'] * abs_voltage) - 1)) \
+            * p['time_series_resolution']
+        decay_p = np.exp(log_decay_p)
+        r_n = r_pn(parameters['r_n'])
+        shift_n = p['eta'] * p['k_n'] * (p['A_n'] * (-1 + np.exp(p['t_n'] * abs_voltage))) * p['time_series_resolution']
+        exp_r_n = np.exp(-p['eta'] * p['k_n'] * r_n) * (-1 + np.exp(shift_n))
+    return {'is_positive': voltage_signal > 0, 'is_negative': voltage_signal < 0, 'r_p': r_p, 'exp_r_p': exp_r_p,
+            'log_decay_p': log_decay_p, 'decay_p': decay_p, 'r_n': r_n, 'shift_n': shift_n, 'exp_r_n': exp_r_n}
+
+
+def _step2018(r0, step, t, p):
+    """
+    One timestep of resistance2018() for simulate_batch().
+    """
+    eta, r_on, r_off = p['eta'][0], p['r_on'][0], p['r_off'][0]
+    r_p, r_n = step['r_p'][t], step['r_n'][t]
+    positive = np.log(step['exp_r_p'][t] + step['decay_p'][t] * (np.exp(eta * p['k_p'][0] * r0) - step['exp_r_p'][t])) \
+        / p['k_p'][0]
+    positive = np.where(positive > eta * r_p, r0, np.maximum(np.minimum(positive, r_off), r_on))
+    negative = -np.log(np.exp(-eta * p['k_n'][0] * r0 + step['shift_n'][t]) - step['exp_r_n'][t]) / p['k_n'][0]
+    negative = np.where(negative < eta * r_n, r0, np.maximum(np.minimum(negative, r_off), r_on))
+    return np.where(step['is_positive'][t], positive, np.where(step['is_negative'][t], negative, r0))
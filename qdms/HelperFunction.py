@@ -1,4 +1,5 @@
 import datetime
+import numpy as np
 
 # GLOBAL_ID is a unique id per program run
 GLOBAL_ID = datetime.datetime.now()
@@ -31,6 +32,26 @@ def is_square(positive_int):
     return True
 
 
+def random_generator(seed=None):
+    """
+    Quick function to create the random generator of a stochastic component.
+
+    Parameters
+    ----------
+    seed : None, int, np.random.SeedSequence or np.random.Generator
+        If None, the component uses the global np.random. Otherwise, the seed of its own generator.
+
+    Returns
+    ----------
+    rng : np.random.Generator
+        The generator, or None for the global np.random.
+
+    """
+    if seed is None:
+        return None
+    return np.random.default_rng(seed)
+
+
 def limit_vector(vector,  bottom_limit, upper_limit):
     """
     This function cut the a vector to keep only the values between the bottom_limit and the upper_limit.
@@ -18,6 +18,11 @@ class Memristor(ABC):
         Positive write threshold voltage (V).
     neg_write_threshold : float
         Negative write threshold voltage (V).
+    g : float
+        Conductance of the device (S). Each change is sent to the observers.
+    observers : list
+        Objects notified with observer.update_conductance(memristor, previous_g, g) when g changes, like the Circuit
+        holding the device. They are not copied nor pickled with the device.
     """
 
     def __init__(
@@ -33,9 +38,34 @@ class Memristor(ABC):
         self.time_series_resolution = time_series_resolution
         self.pos_write_threshold = pos_write_threshold
         self.neg_write_threshold = neg_write_threshold
+        self.observers = []
         self.g = None
         self.finite_states = None
 
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['observers'] = []
+        return state
+
+    def __setstate__(self, state):
+        # g was a plain attribute before the observers
+        if 'g' in state:
+            state = dict(state)
+            state['_g'] = state.pop('g')
+        self.__dict__.update(state)
+        self.__dict__.setdefault('observers', [])
+
+    @property
+    def g(self):
+        return self._g
+
+    @g.setter
+    def g(self, g):
+        previous_g = self.__dict__.get('_g')
+        self._g = g
+        for observer in self.observers:
+            observer.update_conductance(self, previous_g, g)
+
     def print(self):
         print(self.time_series_resolution)
         print(self.r_off)
@@ -69,6 +99,22 @@ class Memristor(ABC):
         """
         return
 
+    def read_many(self, number):
+        """
+        Function to read the device number times. Models with a faster way to do it than calling read() can override it.
+
+        Parameters
+        ----------
+        number : int
+            The number of readings.
+
+        Returns
+        -------
+        resistances : np.ndarray
+            The resistances read.
+        """
+        return np.array([self.read() for _ in range(number)], dtype=float)
+
     @abstractmethod
     def simulate(self, voltage_signal):
         """Method to determine the equivalent conductance of a memristive device when a given voltage signal is applied.
@@ -85,6 +131,19 @@ class Memristor(ABC):
         """
         return
 
+    def simulate_pulse(self, voltage, number_step):
+        """Method to apply a constant voltage pulse of number_step timesteps. Models with a faster way to do it than
+        simulating each timestep can override it.
+
+        Parameters
+        ----------
+        voltage : float
+            The voltage (V) of the pulse.
+        number_step : int
+            The length of the pulse, in number of time_series_resolution.
+        """
+        self.simulate([voltage] * number_step)
+
     @abstractmethod
     def set_conductance(self, conductance):
         """Method to manually set the conductance of a memristive device.
@@ -1,9 +1,9 @@
-import itertools
+import functools
 import math
 import time
 import numpy as np
 from .Circuit import Circuit
-from .Data_Driven import Data_Driven
+from .Data_Driven import Data_Driven, stack_parameters, read_batch
 
 
 def spread_resistor_list(lrs, hrs, nb_states, number):
@@ -43,6 +43,221 @@ def spread_resistor_list(lrs, hrs, nb_states, number):
     return list_resistor
 
 
+def round_voltages(voltages):
+    """
+    This function rounds the voltages to 12 decimals exactly like round(voltage, 12), but vectorized. np.round() only
+    differs from round() when the voltage is almost halfway, so these ones are rounded with round().
+
+    Parameters
+    ----------
+    voltages : np.ndarray
+        The voltages (V).
+
+    Returns
+    ----------
+    voltages : np.ndarray
+        The rounded voltages (V).
+    """
+    voltages = np.asarray(voltages, dtype=float)
+    rounded = np.round(voltages, 12)
+    scaled = voltages * 1e12
+    is_halfway = np.abs(scaled - np.floor(scaled) - 0.5) <= 4 * np.spacing(scaled)
+    is_halfway |= ~(np.abs(scaled) < 2 ** 52)
+    rounded[is_halfway] = [round(v, 12) for v in voltages[is_halfway].tolist()]
+    return rounded
+
+
+@functools.lru_cache(maxsize=None)
+def combinations_block(nb_states, number):
+    """
+    This function creates every combination with replacement of number states out of nb_states, in the same order as
+    itertools.combinations_with_replacement(range(nb_states), number).
+
+    Returns
+    ----------
+    combinations : np.ndarray
+        Array of shape (math.comb(nb_states + number - 1, number), number) of states index.
+    """
+    dtype = np.min_scalar_type(nb_states)
+    if number == 0:
+        return np.zeros((1, 0), dtype=dtype)
+    blocks = []
+    for first in range(nb_states):
+        rest = combinations_block(nb_states - first, number - 1).astype(dtype) + first
+        blocks.append(np.hstack([np.full((len(rest), 1), first, dtype=rest.dtype), rest]))
+    return np.concatenate(blocks)
+
+
+def combinations_index(nb_states, number, chunk_size, prefix=(), start=0):
+    """
+    This generator yields the combinations with replacement of number states out of nb_states by chunks of at most
+    chunk_size combinations (or one combination of the last states if chunk_size is smaller than it), in the same order
+    as itertools.combinations_with_replacement(range(nb_states), number).
+
+    Parameters
+    ----------
+    nb_states : int
+        The number of states.
+
+    number : int
+        The length of the combinations.
+
+    chunk_size : int
+        The maximum number of combinations in a chunk.
+
+    prefix : tuple of int
+        The states fixed at the start of the combinations. Used by the recursion.
+
+    start : int
+        The first state available after the prefix. Used by the recursion.
+
+    Returns
+    ----------
+    combinations : iterable[np.ndarray]
+        Arrays of shape (chunk, len(prefix) + number) of states index.
+    """
+    if number == 0 or math.comb(nb_states - start + number - 1, number) <= chunk_size:
+        block = combinations_block(nb_states - start, number).astype(np.min_scalar_type(nb_states)) + start
+        yield np.hstack([np.full((len(block), len(prefix)), prefix, dtype=block.dtype), block])
+    else:
+        for first in range(start, nb_states):
+            yield from combinations_index(nb_states, number - 1, chunk_size, prefix + (first,), first)
+
+
+def mixed_radix_states(nb_states, number, start, stop):
+    """
+    This function decodes the combinations numbered from start to stop of number memristors with nb_states states
+    each, the state of the first memristor changing the fastest.
+
+    Returns
+    ----------
+    states : np.ndarray
+        Array of shape (stop - start, number) of states index.
+    """
+    index = np.arange(start, stop, dtype=np.int64)
+    stride = nb_states ** np.arange(number, dtype=np.int64)
+    return (index[:, np.newaxis] // stride % nb_states).astype(np.min_scalar_type(nb_states))
+
+
+def create_halves(resistance_table, is_with_replacement=False):
+    """
+    This function enumerates the states of the first half of the memristors and of the second half, with their
+    conductance sums. The voltage output only depends on the sum of the conductance of the two halves.
+
+    Parameters
+    ----------
+    resistance_table : np.ndarray
+        Array of shape (number_of_memristor, nb_states). The resistance (Ohm) of each state of each memristor.
+
+    is_with_replacement : bool
+        If true, every memristor has the same states (distribution_type 'linear') and the halves are combinations with
+        replacement sorted like combinations_index(), otherwise every state of every memristor.
+
+    Returns
+    ----------
+    (states_a, conductance_a), (states_b, conductance_b) : (np.ndarray, np.ndarray)
+        The states of each combination of the first and second half, and the sum of their conductance (S).
+    """
+    number, nb_states = resistance_table.shape
+    # read() sees the resistance through g = 1 / resistance
+    conductance_table = 1 / (1 / (1 / resistance_table))
+    halves = []
+    for first, last in [(0, number // 2), (number // 2, number)]:
+        if is_with_replacement:
+            states = np.concatenate(list(combinations_index(nb_states, last - first, math.inf)))
+        else:
+            states = mixed_radix_states(nb_states, last - first, 0, nb_states ** (last - first))
+        conductance = np.zeros(len(states))
+        for i in range(last - first):
+            conductance = conductance + conductance_table[first + i, states[:, i]]
+        halves.append((states, conductance))
+    return halves
+
+
+def find_nearest_combinations(voltage_target, circuit, resistance_table, is_with_replacement=False, chunk_size=100000,
+                              v_min=None, v_max=None):
+    """
+    This function finds, for each target, the combination of states whose voltage output is the nearest, without
+    computing the whole table. The partial conductance sums of the two halves are enumerated (see create_halves())
+    and, for each combination of the first half, the two combinations of the second half around the target are found
+    by binary search in its sorted sums. The memory needed is the one of the halves, about nb_states ** (number / 2).
+    The reads are without variability.
+
+    Parameters
+    ----------
+    voltage_target : iterable[float]
+        The voltages (V) wanted.
+
+    circuit : Circuit.Circuit
+        The circuit object.
+
+    resistance_table : np.ndarray
+        Array of shape (number_of_memristor, nb_states). The resistance (Ohm) of each state of each memristor.
+
+    is_with_replacement : bool
+        If true, every memristor has the same states and the order of the memristors doesn't matter.
+
+    chunk_size : int
+        The number of (target, combination of the first half) pairs computed at the same time.
+
+    v_min, v_max : float
+        If not None, only the combinations with a voltage output (V) in [v_min, v_max] are kept, like the table
+        restricted to this range. For a combination of the first half, the combinations of the second half are sorted
+        by voltage, so if both around a target are out of the range, none in between is in it.
+
+    Returns
+    ----------
+    voltages : np.ndarray
+        The voltage (V) output of the nearest combination of each target, rounded to 12 decimals.
+
+    resistances : np.ndarray
+        Array of shape (len(voltage_target), number_of_memristor). The resistance (Ohm) of each memristor.
+    """
+    voltage_target = np.atleast_1d(np.asarray(voltage_target, dtype=float))
+    resistance_table = np.asarray(resistance_table, dtype=float)
+    (states_a, conductance_a), (states_b, conductance_b) = create_halves(resistance_table, is_with_replacement)
+    if is_with_replacement and states_a.shape[1] and states_b.shape[1]:
+        # Each group of the first half ending at a state only goes with the second half starting at least there
+        groups = [(np.flatnonzero(states_a[:, -1] == state), np.flatnonzero(states_b[:, 0] >= state))
+                  for state in range(resistance_table.shape[1])]
+    else:
+        groups = [(np.arange(len(conductance_a)), np.arange(len(conductance_b)))]
+    # Both halves sorted, the binary searches of a target are sorted too, which is a lot faster
+    groups = [(index_a[np.argsort(conductance_a[index_a], kind='stable')],
+               index_b[np.argsort(conductance_b[index_b], kind='stable')])
+              for index_a, index_b in groups if len(index_a) and len(index_b)]
+
+    conductance_target = circuit.calculate_conductance(voltage_target)
+    best_diff = np.full(len(voltage_target), np.inf)
+    best = np.zeros((len(voltage_target), 2), dtype=np.int64)
+    for index_a, index_b in groups:
+        sorted_a = conductance_a[index_a]
+        sorted_b = conductance_b[index_b]
+        block = max(1, chunk_size // len(index_a))
+        for start in range(0, len(voltage_target), block):
+            stop = min(start + block, len(voltage_target))
+            position = np.searchsorted(sorted_b, conductance_target[start:stop, np.newaxis] - sorted_a)
+            for candidate in [np.maximum(position - 1, 0), np.minimum(position, len(index_b) - 1)]:
+                voltage = circuit.calculate_voltage(sorted_a + sorted_b[candidate])
+                diff = np.abs(voltage - voltage_target[start:stop, np.newaxis])
+                if v_min is not None:
+                    diff[voltage < v_min] = np.inf
+                if v_max is not None:
+                    diff[voltage > v_max] = np.inf
+                i = np.argmin(diff, axis=1)
+                diff = diff[np.arange(stop - start), i]
+                is_better = diff < best_diff[start:stop]
+                best_diff[start:stop][is_better] = diff[is_better]
+                best[start:stop][is_better] = np.stack([index_a[i], index_b[candidate[np.arange(stop - start), i]]],
+                                                       axis=1)[is_better]
+    if np.any(np.isinf(best_diff)):
+        raise Exception(f'No combination has a voltage output between {v_min} and {v_max}.')
+    conductance = conductance_a[best[:, 0]] + conductance_b[best[:, 1]]
+    states = np.hstack([states_a[best[:, 0]], states_b[best[:, 1]]])
+    resistances = resistance_table[np.arange(states.shape[1]), states]
+    return round_voltages(circuit.calculate_voltage(conductance)), resistances
+
+
 class MemristorSimulation:
     """
     This class contains all the parameters for the memristor simulation.
@@ -75,13 +290,30 @@ class MemristorSimulation:
     voltages_memristor : dict
         Dictionary where the key is the voltage output and the package is the resistance value of each memristor
 
+    voltages : np.ndarray
+        The sorted voltages output (V), the same as the keys of voltages_memristor.
+
+    states_index : np.ndarray
+        Array of shape (len(voltages), number_of_memristor). The states (index in list_resistance) of each memristor
+        for each voltage of voltages.
+
+    resistances : np.ndarray
+        Array of shape (len(voltages), number_of_memristor). The resistance (Ohm) of each memristor for each voltage of
+        voltages, the same as the values of voltages_memristor.
+
+    chunk_size : int
+        The number of combinations of states computed at the same time.
+
+    is_meet_in_the_middle : bool
+        If true, simulate() builds the table with simulate_meet_in_the_middle(), from the sums of two halves of the
+        memristors. See also find_nearest_combination() to avoid building the table.
+
     timers : list of float
         Contains the different timers of the simulation. (s)
 
-    start_loop_rec, start_inner_loop_rec, self.end_loop_rec, end_inner_loop_rec : float
-        Different timers used in the recursive loop (s)
     """
-    def __init__(self, circuit, nb_states, distribution_type='linear', is_using_conductance=False, verbose=False):
+    def __init__(self, circuit, nb_states, distribution_type='linear', is_using_conductance=False, verbose=False,
+                 chunk_size=100000, is_meet_in_the_middle=False):
         if not isinstance(circuit, Circuit):
             raise TypeError(f'Error: circuit object is not from Circuit class.')
         # if distribution_type != 'full_spread' and distribution_type != 'linear':
@@ -92,14 +324,23 @@ class MemristorSimulation:
         self.list_resistance = self.create_res_states()
         self.is_using_conductance = is_using_conductance
         self.voltages_memristor = {}
+        self.voltages = None
+        self.states_index = None
+        self.resistances = None
         self.verbose = verbose
+        self.chunk_size = chunk_size
+        self.is_meet_in_the_middle = is_meet_in_the_middle
 
         # Inner parameters
-        self.timers = []  # [List_resist, loop_rec, sorting_cutting, creating_plots, total]
-        self.start_loop_rec = 0
-        self.start_inner_loop_rec = 0
-        self.end_loop_rec = 0
-        self.end_inner_loop_rec = 0
+        self.timers = []  # [List_resist, simulate_loop, sorting_cutting, creating_plots, total]
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        # Saved before the arrays of the voltages, only voltages_memristor is there
+        for name in ['voltages', 'states_index', 'resistances']:
+            self.__dict__.setdefault(name, None)
+        self.__dict__.setdefault('chunk_size', 100000)
+        self.__dict__.setdefault('is_meet_in_the_middle', False)
 
     def presentation(self):
         """
@@ -131,126 +372,281 @@ class MemristorSimulation:
         if self.verbose:
             self.presentation()
 
-        if self.distribution_type == 'linear':
+        if self.is_meet_in_the_middle:
+            self.simulate_meet_in_the_middle()
+        elif self.distribution_type == 'linear':
             self.simulate_linear()
         elif self.distribution_type == 'full_spread':
             self.simulate_loop()
 
-        self.voltages_memristor = {k: self.voltages_memristor[k] for k in sorted(self.voltages_memristor)}
-
         for i in self.circuit.list_memristor:
             i.g = 1 / i.r_on
 
         return self.voltages_memristor
 
     def simulate_linear(self):
+        """
+        This function computes the voltage output of every combination with replacement of the states of
+        list_resistance[0], by chunks of chunk_size combinations.
+        """
         if self.verbose:
             timer_start = time.time()
-        res_values = list(itertools.combinations_with_replacement(self.list_resistance[0], self.circuit.number_of_memristor))
+        number = self.circuit.number_of_memristor
+        total = math.comb(self.nb_states + number - 1, number)
+        resistance_table = self.create_resistance_table()
+        list_voltages = []
+        list_states = []
         counter = 0
-        if self.verbose:
-            timer_start_ = time.time()
-        for current_res in res_values:
-            if counter % 500000 == 0 and self.verbose:
-                print(f'Done: {counter}\tLeft: {len(res_values) - counter}')
-                took = round(time.time() - timer_start_, 2)
-                print(f'Total time elapsed: {time.time() - timer_start}s\tTime Left: {took * (len(res_values) - counter) / 500000}')
-                timer_start_ = time.time()
-
-            for i in range(self.circuit.number_of_memristor):
-                self.circuit.list_memristor[i].g = 1 / current_res[i]
-            self.voltages_memristor[round(self.circuit.current_v_out(), 12)] = current_res
-            counter += 1
+        for states in combinations_index(self.nb_states, number, self.chunk_size):
+            if self.verbose:
+                self.print_progress(counter, total, timer_start)
+            list_voltages.append(self.calculate_voltages(states, resistance_table))
+            list_states.append(states)
+            counter += len(states)
+        self.store_voltages(np.concatenate(list_voltages), np.concatenate(list_states))
+        self.create_voltages_memristor()
         if self.verbose:
             print(f'Total time: {round(time.time() - timer_start, 2)}s')
             print()
 
     def simulate_loop(self):
-        current_states = []
-        for _ in range(self.circuit.number_of_memristor):
-            current_states.append(-1)
-
+        """
+        This function computes the voltage output of every state of every memristor (the memristor i uses the states
+        list_resistance[i]). The combinations are numbered in mixed radix, the state of the first memristor changing the
+        fastest, and computed by blocks of chunk_size combinations.
+        """
         if self.verbose:
             timer_start = time.time()
-            self.start_loop_rec = time.time()
-        self.loop_rec(self.list_resistance, self.circuit.number_of_memristor, current_states)
+        resistance_table = self.create_resistance_table()
+        total = self.nb_states ** self.circuit.number_of_memristor
+        list_voltages = []
+        list_states = []
+        for counter in range(0, total, self.chunk_size):
+            if self.verbose:
+                self.print_progress(counter, total, timer_start)
+            states = mixed_radix_states(self.nb_states, self.circuit.number_of_memristor, counter,
+                                        min(counter + self.chunk_size, total))
+            list_voltages.append(self.calculate_voltages(states, resistance_table))
+            list_states.append(states)
+        self.store_voltages(np.concatenate(list_voltages), np.concatenate(list_states))
+        self.create_voltages_memristor()
         if self.verbose:
             timer_end = time.time()
             self.timers.append(timer_end-timer_start)
+            print(f'Total time: {round(timer_end - timer_start, 2)}s')
             print()
 
-    def create_res_states(self):
+    def simulate_meet_in_the_middle(self):
         """
-        This function creates the theoretical resistance distribution according to the distribution_type.
+        This function computes the same table as simulate_linear() or simulate_loop() from the partial conductance sums
+        of the two halves of the memristors (see create_halves()), which only need to be added together. The reads are
+        without variability and the voltages can differ from the other modes by the rounding of the sum.
+        """
+        if self.verbose:
+            timer_start = time.time()
+        (states_a, conductance_a), (states_b, conductance_b) = self.create_halves()
+        list_voltages = []
+        list_states = []
+        if self.distribution_type == 'full_spread':
+            # The first half changes the fastest, like in simulate_loop()
+            block = max(1, self.chunk_size // len(conductance_a))
+            for start in range(0, len(conductance_b), block):
+                if self.verbose:
+                    self.print_progress(start * len(conductance_a), len(conductance_a) * len(conductance_b), timer_start)
+                stop = min(start + block, len(conductance_b))
+                conductance = conductance_a[np.newaxis, :] + conductance_b[start:stop, np.newaxis]
+                list_voltages.append(round_voltages(self.circuit.calculate_voltage(conductance.ravel())))
+                list_states.append(np.hstack([np.tile(states_a, (stop - start, 1)),
+                                              np.repeat(states_b[start:stop], len(conductance_a), axis=0)]))
+        else:
+            # A combination with replacement is a combination of the first half followed by one of the second half
+            # starting at a state at least as high. The second half is sorted by its first state.
+            first_b = states_b[:, 0] if states_b.shape[1] else np.zeros(len(states_b), dtype=int)
+            last_a = states_a[:, -1] if states_a.shape[1] else np.zeros(len(states_a), dtype=int)
+            start = 0
+            while start < len(conductance_a):
+                if self.verbose:
+                    self.print_progress(start, len(conductance_a), timer_start)
+                stop = min(start + max(1, self.chunk_size // max(1, len(conductance_b))), len(conductance_a))
+                start_b = int(np.searchsorted(first_b, last_a[start:stop].min()))
+                is_valid = (first_b[np.newaxis, start_b:] >= last_a[start:stop, np.newaxis]).ravel()
+                conductance = conductance_a[start:stop, np.newaxis] + conductance_b[np.newaxis, start_b:]
+                list_voltages.append(round_voltages(self.circuit.calculate_voltage(conductance.ravel()[is_valid])))
+                list_states.append(np.hstack([np.repeat(states_a[start:stop], len(conductance_b) - start_b, axis=0),
+                                              np.tile(states_b[start_b:], (stop - start, 1))])[is_valid])
+                start = stop
+        self.store_voltages(np.concatenate(list_voltages), np.concatenate(list_states))
+        self.create_voltages_memristor()
+        if self.verbose:
+            print(f'Total time: {round(time.time() - timer_start, 2)}s')
+            print()
+
+    def create_halves(self):
+        """
+        This function enumerates the two halves of the memristors with their conductance sums. See create_halves().
 
         Returns
         ----------
-        res_states : list of list of float
-            list of resistor (Ohm)
+        (states_a, conductance_a), (states_b, conductance_b) : (np.ndarray, np.ndarray)
+            The states of each combination of the first and second half, and the sum of their conductance (S).
         """
-        lrs = self.circuit.memristor_model.r_on
-        hrs = self.circuit.memristor_model.r_off
-        res_states = []
-        if self.distribution_type == 'linear':
-            res_states = [[int(lrs + i * ((hrs - lrs) / (self.nb_states - 1))) for i in range(self.nb_states)]]
-        elif self.distribution_type == 'full_spread':
-            res_states = spread_resistor_list(lrs, hrs, self.nb_states, self.circuit.number_of_memristor)
-        return res_states
+        return create_halves(self.create_resistance_table(), self.distribution_type == 'linear')
 
-    def add_voltage(self, list_resistance, current_states):
+    def find_nearest_combination(self, voltage_target, v_min=None, v_max=None):
         """
-        This function calculate the resistance or conductance depending on the simulation parameters
-        and calculate one output voltage of the circuit.
+        This function finds, for each target, the combination of states whose voltage output is the nearest, without
+        computing the whole table. See find_nearest_combinations().
 
         Parameters
         ----------
-        list_resistance : iterable[float][float]
-            The list of all resistances (Ohm)
+        voltage_target : iterable[float]
+            The voltages (V) wanted.
 
-        current_states : list of int
-            Contains the states of all loops from the recursive loop.
+        v_min, v_max : float
+            If not None, only the combinations with a voltage output (V) in [v_min, v_max] are kept.
 
         Returns
         ----------
+        voltages : np.ndarray
+            The voltage (V) output of the nearest combination of each target, rounded to 12 decimals.
+
+        resistances : np.ndarray
+            Array of shape (len(voltage_target), number_of_memristor). The resistance (Ohm) of each memristor.
+        """
+        return find_nearest_combinations(voltage_target, self.circuit, self.create_resistance_table(),
+                                         is_with_replacement=self.distribution_type == 'linear',
+                                         chunk_size=self.chunk_size, v_min=v_min, v_max=v_max)
+
+    def create_resistance_table(self):
+        """
+        This function gathers the states of each memristor.
+
+        Returns
+        ----------
+        resistance_table : np.ndarray
+            Array of shape (number_of_memristor, nb_states). The resistance (Ohm) of each state of each memristor.
+        """
+        number = self.circuit.number_of_memristor
+        if self.distribution_type == 'linear':
+            return np.array(self.list_resistance * number, dtype=float)
+        return np.array(self.list_resistance[:number], dtype=float)
 
+    def create_voltages_memristor(self):
         """
-        current_res = []
-        j = 0
-        for i in current_states:
-            current_res.append(list_resistance[j][i])
-            j += 1
+        This function creates self.resistances and the dict voltages_memristor from self.voltages and
+        self.states_index.
+        """
+        resistance_table = self.create_resistance_table()
+        if self.distribution_type == 'linear':
+            self.resistances = resistance_table[np.arange(len(resistance_table)), self.states_index]
+            resistances = np.array(self.list_resistance[0], dtype=object)[self.states_index]
+            self.voltages_memristor = dict(zip(self.voltages.tolist(), map(tuple, resistances.tolist())))
+        else:
+            # The resistance of the memristors is read back from g = 1 / resistance
+            self.resistances = 1 / (1 / resistance_table[np.arange(len(resistance_table)), self.states_index])
+            self.voltages_memristor = dict(zip(self.voltages.tolist(), self.resistances.tolist()))
+
+    def print_progress(self, counter, total, timer_start):
+        """
+        This function output in console the number of combinations done and the expected remaining time.
 
-        for i in range(self.circuit.number_of_memristor):
-            self.circuit.list_memristor[i].g = 1 / current_res[i]
-        self.voltages_memristor[round(self.circuit.current_v_out(), 12)] = [1/i.g for i in self.circuit.list_memristor]
+        Parameters
+        ----------
+        counter : int
+            The number of combinations done.
 
-    def loop_rec(self, list_resistance, counter, current_states):
+        total : int
+            The total number of combinations.
+
+        timer_start : float
+            The time when the simulation started. (s)
         """
-        This function is a recursive loop which calls a number of loops equal to the amount of memristor in the circuit.
+        print(f'Done: {counter}\tLeft: {total - counter}')
+        if counter:
+            took = time.time() - timer_start
+            print(f'Total time elapsed: {round(took, 2)}s\tTime Left: {round(took * (total - counter) / counter, 2)}s')
+
+    def calculate_voltages(self, states, resistance_table):
+        """
+        This function reads the memristors for each combination of states, like circuit.current_v_out() would do with
+        these resistances, and calculates the voltage output.
 
         Parameters
         ----------
-        list_resistance : list of float
-            The list of all resistances (Ohm)
+        states : np.ndarray
+            Array of shape (nb_combinations, number_of_memristor) of the state of each memristor.
 
-        counter : int
-            Keep count of the number of iteration
+        resistance_table : np.ndarray
+            Array of shape (number_of_memristor, nb_states). The resistance (Ohm) of each state of each memristor.
 
-        current_states : iterable[int]
-            Contains the states of all loops from the recursive loop.
+        Returns
+        ----------
+        voltages : np.ndarray
+            The voltages (V) output, rounded to 12 decimals.
         """
-        if counter == self.circuit.number_of_memristor - 1 and self.verbose:
-            self.end_loop_rec = time.time()
-            self.end_inner_loop_rec = time.time()
-            print(f'Total time elapsed: {round(self.end_loop_rec - self.start_loop_rec, 2)}s; '
-                  f'Loop time: {round(self.end_inner_loop_rec - self.start_inner_loop_rec, 2)}s')
-            loop_remaining = self.nb_states - current_states[counter]
-            print(f'Loops remaining: {loop_remaining}; Expected remaining time: '
-                  f'{round(loop_remaining * (self.end_inner_loop_rec - self.start_inner_loop_rec), 2)}s')
-            self.start_inner_loop_rec = time.time()
-        if counter >= 1:
-            for x in range(self.nb_states):
-                current_states[counter-1] = x
-                self.loop_rec(list_resistance, counter - 1, current_states)
+        list_memristor = self.circuit.list_memristor
+        number = len(list_memristor)
+        is_global_random = all(memristor.rng is None and not memristor.noise_buffer_size for memristor in list_memristor
+                               if isinstance(memristor, Data_Driven))
+        if all(isinstance(memristor, Data_Driven) for memristor in list_memristor) and \
+                (is_global_random or not any(memristor.is_variability_on for memristor in list_memristor)):
+            # read() sees the resistance through g = 1 / resistance
+            read_table = 1 / (1 / resistance_table)
+            if any(memristor.is_variability_on for memristor in list_memristor):
+                # Same draws in the same order as the successive read() of each memristor for each combination
+                resistances = read_table[np.arange(number), states]
+                conductance_table = 1 / read_batch(resistances, stack_parameters(list_memristor),
+                                                   [memristor.is_variability_on for memristor in list_memristor])
+                conductance_table = conductance_table.T
+                states = np.broadcast_to(np.arange(len(states)), (number, len(states))).T
+            else:
+                conductance_table = 1 / read_table
         else:
-            self.add_voltage(list_resistance, current_states)
+            conductance_table = np.empty(states.shape)
+            for j, current_states in enumerate(states.tolist()):
+                for i, memristor in enumerate(list_memristor):
+                    memristor.g = 1 / resistance_table[i, current_states[i]]
+                    conductance_table[j, i] = 1 / memristor.read()
+            conductance_table = conductance_table.T
+            states = np.broadcast_to(np.arange(len(states)), (number, len(states))).T
+        conductance = 0
+        for i in range(number):
+            conductance = conductance + conductance_table[i, states[:, i]]
+        return round_voltages(self.circuit.calculate_voltage(conductance))
+
+    def store_voltages(self, voltages, states_index):
+        """
+        This function sorts the voltages and their states in self.voltages and self.states_index. When a voltage
+        appears more than once, the last combination is kept, like writing in a dict would do.
+
+        Parameters
+        ----------
+        voltages : np.ndarray
+            The voltages (V) output, in the order of the combinations.
+
+        states_index : np.ndarray
+            The states of each combination.
+        """
+        order = np.argsort(voltages, kind='stable')
+        voltages = voltages[order]
+        is_last = np.append(voltages[1:] != voltages[:-1], True)
+        self.voltages = voltages[is_last]
+        self.states_index = states_index[order[is_last]]
+
+    def create_res_states(self):
+        """
+        This function creates the theoretical resistance distribution according to the distribution_type.
+
+        Returns
+        ----------
+        res_states : list of list of float
+            list of resistor (Ohm)
+        """
+        lrs = self.circuit.memristor_model.r_on
+        hrs = self.circuit.memristor_model.r_off
+        res_states = []
+        if self.distribution_type == 'linear':
+            res_states = [[int(lrs + i * ((hrs - lrs) / (self.nb_states - 1))) for i in range(self.nb_states)]]
+        elif self.distribution_type == 'full_spread':
+            res_states = spread_resistor_list(lrs, hrs, self.nb_states, self.circuit.number_of_memristor)
+        return res_states
@@ -94,7 +94,7 @@ def parametric_test_resolution_variance(path, configuration, variability=None, n
     memristor_sim = qdms.MemristorSimulation(circuit, configuration[2], distribution_type=configuration[1],is_using_conductance=False, verbose=verbose)
     memristor_sim.simulate()
 
-    algorithm = qdms.algorithm(0.0001, memristor_sim, verbose=verbose)
+    algorithm = qdms.algorithm(0.0001, memristor_sim, verbose=verbose, policy='full')
     directory_name = f'{path}//{configuration[0]}x{1}_{configuration[1]}_{configuration[2]}_states'
 
     if not os.path.isdir(f'{path}'):
@@ -122,7 +122,7 @@ def parametric_test_resolution_variance(path, configuration, variability=None, n
             while os.path.isdir(f'{sub_directory_name}\\{str(index)}'):
                 index += 1
 
-            qdms.Log.compressed_pickle(f'{sub_directory_name}\\{str(index)}', pulsed_programming.voltage_output)
+            qdms.Log.compressed_pickle(f'{sub_directory_name}\\{str(index)}', pulsed_programming.result)
 
         config_done += 1
 
@@ -268,7 +268,7 @@ def parametric_test_voltage_min_max(path, configurations=None, verbose=False):
             print(f'{len(configurations) - config_done} configurations left\tCurrent: {directory_name}\tTook: {time.time()-start}')
             config_done += 1
 
-def parametric_test_quality_diagram(path, configuration, variability=None, nb_occurences=10, verbose=False):
+def parametric_test_quality_diagram(path, configuration, variability=None, nb_occurences=10, verbose=False, seed=None):
     """
     This function generates numerous complete simulations to identify the impact of resolution and memristor variability
     on the quality of stability diagram
@@ -289,11 +289,14 @@ def parametric_test_quality_diagram(path, configuration, variability=None, nb_oc
 
     verbose : bool
         If true, output timers in console.
+
+    seed : int
+        Seed of the voltages sampled and of the pulsed programmings. If None, the global np.random is used.
     Returns
     -------
 
     """
-
+    rng = qdms.HelperFunction.random_generator(seed)
     if variability is None:
         variability = np.array([0, 0.1, 0.5, 1, 2, 3, 4, 5])
     variances = variability / 300
@@ -316,17 +319,18 @@ def parametric_test_quality_diagram(path, configuration, variability=None, nb_oc
 
         for config in configuration:
             start_ = time.time()
-            memristor = Data_Driven(is_variability_on=False)
-            circuit = Circuit(memristor_model=memristor, number_of_memristor=config[0], is_new_architecture=True,
-                              v_in=1e-3, gain_resistance=0, R_L=1)
-            memristor_sim = MemristorSimulation(circuit, config[1], distribution_type='full_spread', verbose=True) #CHANGE WHEN VARIA AVAILABLE
+            memristor = qdms.Data_Driven(is_variability_on=False)
+            circuit = qdms.Circuit(memristor_model=memristor, number_of_memristor=config[0], is_new_architecture=True,
+                                   v_in=1e-3, gain_resistance=0, R_L=1)
+            memristor_sim = qdms.MemristorSimulation(circuit, config[1], distribution_type='full_spread', verbose=True) #CHANGE WHEN VARIA AVAILABLE
             memristor_sim.simulate()
-            voltages_target = algorithm(config[3], memristor_sim)
-            pulsed_programming = PulsedProgramming(memristor_sim, verbose=True, pulse_algorithm='fabien',
-                                                   tolerance=config[2], is_relative_tolerance=True,
-                                                   number_of_reading=1)
+            voltages_target = qdms.algorithm(config[3], memristor_sim, policy='full')
+            pulsed_programming = qdms.PulsedProgramming(memristor_sim, verbose=True, pulse_algorithm='fabien',
+                                                        tolerance=config[2], is_relative_tolerance=True,
+                                                        number_of_reading=1, rng=rng)
             voltages_target_ = pulsed_programming.simulate(voltages_target, [[50, False], [10, False]])
-            quantum_sim = QDSimulation(list(voltages_target_.keys()))
+            voltages_output = np.sort(voltages_target_.voltage)
+            quantum_sim = qdms.QDSimulation(voltages_output, voltages_output)
             quantum_sim.simulate()
 
             rms = 0
@@ -334,35 +338,32 @@ def parametric_test_quality_diagram(path, configuration, variability=None, nb_oc
             for i in range(nb_occurences):
                 if verbose:
                     print(f'Config {config_done+1}/{len(variances)*len(configuration)}: loop {i+1}/{nb_occurences}')
-                voltage_target = (memristor_sim.voltages_memristor.max() - memristor_sim.voltages_memristor.min())*np.random.random()
-                ind = np.where(memristor_sim.voltages_memristor>=voltage_target)[0][0]
+                voltage_target = quantum_sim.voltages_x.min() + (np.random if rng is None else rng).random() \
+                    * (quantum_sim.voltages_x.max() - quantum_sim.voltages_x.min())
+                ind = np.where(quantum_sim.voltages_x >= voltage_target)[0][0]
                 diagram_slice = quantum_sim.stability_diagram[:, ind]
-                tol = (memristor_sim.voltages_memristor.max() - memristor_sim.voltages_memristor.min()) / (20 * int(diagram_slice.max()) - int(diagram_slice.min()))
-                if 2*tol/1e-8<1000:
-                    nb_points = 2*tol/1e-8
-                else:
-                    nb_points = 1000
                 derivative_slice = np.gradient(diagram_slice)
-                i_left = 0
-                for j in range(int(diagram_slice.max())-int(diagram_slice.min())):
-                    i_right = np.where(diagram_slice < diagram_slice.min()+j+1)[0][-1]
-                    v_trans_varia = memristor_sim.voltages_memristor[i_left + np.armax(derivative_slice[i_left:i_right])]
-                    i_left = i_right
-
-                    sweep_x = np.linspace(v_trans_varia - tol, v_trans_varia + tol, nb_points)
-                    sweep_y = np.linspace(memristor_sim.voltages_memristor[ind], memristor_sim.voltages_memristor[ind], 1)
-                    x_mesh, y_mesh = np.meshgrid(sweep_x, sweep_y)
-                    high_res_diagram = N_moy_DQD(x_mesh, y_mesh, Cg1=quantum_sim.Cg1, Cg2=quantum_sim.Cg2, Cm=quantum_sim.Cm,
-                                                 CL=quantum_sim.CL, CR=quantum_sim.CR, N_min=quantum_sim.N_min,
-                                                 N_max=quantum_sim.N_max, kBT=2 * quantum_sim.kB * quantum_sim.T, e=1.602e-19)
-                    derivative_high_res = np.gradient(high_res_diagram[0])
-                    v_trans_high_res = sweep_x[np.argmax(derivative_high_res)]
+                # Exact transitions of the same sweep at zero temperature: the column ind of the diagram has gate 1
+                # fixed and sweeps gate 2
+                v_trans_exact = qdms.coulomb_blockade.transition_voltages_DQD(
+                    quantum_sim.voltages_x[ind], Cg1=quantum_sim.Cg1, Cg2=quantum_sim.Cg2,
+                    Cm=quantum_sim.Cm * (quantum_sim.Cg1 + quantum_sim.Cg2) / 2, CL=quantum_sim.CL, CR=quantum_sim.CR,
+                    N_min=quantum_sim.N_min, N_max=quantum_sim.N_max, e=1.602e-19, is_sweep_gate_2=True,
+                    V_range=(quantum_sim.voltages_y.min(), quantum_sim.voltages_y.max()))
+                # n1 - n2 goes down along gate 2: one interval around each change of the rounded charge
+                changes = np.nonzero(np.diff(np.round(diagram_slice)))[0]
+                bounds = np.concatenate([[0], (changes[:-1] + changes[1:]) // 2 + 1, [len(diagram_slice)]])
+                for k in range(len(changes)):
+                    i_left, i_right = bounds[k], bounds[k + 1]
+                    v_trans_varia = quantum_sim.voltages_y[i_left + np.argmax(np.abs(derivative_slice[i_left:i_right]))]
+
+                    v_trans_high_res = v_trans_exact[np.argmin(np.abs(v_trans_exact - v_trans_varia))]
                     v_shift.append(v_trans_varia-v_trans_high_res)
                     rms += v_shift[-1]**2
             rmss.append(rms/len(v_shift))
             results[f'{config_done}'] = {'RMS': rmss, 'voltage_shift': v_shift, 'config': config, 'variance': variance}
             config_done += 1
-    with open(f'{directory_name}\\data.pickle', 'wb') as handle:
+    with open(f'{directory_name}//data.pickle', 'wb') as handle:
         pickle.dump(results, handle, protocol=pickle.HIGHEST_PROTOCOL)
     if verbose:
         print(f'For {len(variances) * len(configuration)} simulations -> {time.time() - start} s')
@@ -467,9 +468,11 @@ def load_resolution_variance_data(path, verbose=False):
                 print(f'{current_dir_var} variance {current_dir_sim} simulation')
             path_ = f'{path}\\{current_dir_var}\\{current_dir_sim}'
             sim = qdms.Log.decompress_pickle(path_)
-            resolution = np.mean(np.diff(list(sim.keys())))
-            # std = np.std(np.diff(list(sim.keys())))
-            sim.clear()
+            # The simulations saved before ProgrammingResult are dict voltage_output
+            if isinstance(sim, dict):
+                sim = qdms.ProgrammingResult.from_voltage_output(sim)
+            resolution = sim.resolution()
+            # std = sim.statistics()['std_resolution']
             memristor_simulations[index_var].append([resolution, float(current_dir_var)])
         index_var += 1
         if verbose:
@@ -1024,15 +1027,9 @@ def create_pulsed_programming_efficiency_plot_1(pulsed_programmings, directory_n
     for key in dict_.keys():
         for current_key in dict_.get(key).keys():
             for current in dict_.get(key).get(current_key):
-                second_final_read = first_final_read = 0
-                flag_first = True
-                for current_ in current.graph_resistance:
-                    if current_[3] and flag_first:
-                        first_final_read = current_[1]
-                        flag_first = not flag_first
-                    elif current_[3]:
-                        second_final_read = current_[1]
-                y_.append(second_final_read - first_final_read)
+                # Pulses between the first and the last finished convergences
+                final_read = current.graph_resistance.index[current.graph_resistance.is_finish]
+                y_.append((final_read[-1] if len(final_read) > 1 else 0) - (final_read[0] if len(final_read) else 0))
             x.append(dict_.get(key).get(current_key)[0].variance_read * 300)
             y.append(np.mean(y_[:]))
             error_bar.append(np.std(y_[:]))
@@ -1122,15 +1119,9 @@ def create_pulsed_programming_efficiency_plot_2(pulsed_programmings, directory_n
     for key in dict_.keys():
         for current_key in dict_.get(key).keys():
             for current in dict_.get(key).get(current_key):
-                second_final_read = first_final_read = 0
-                flag_first = True
-                for current_ in current.graph_resistance:
-                    if current_[3] and flag_first:
-                        first_final_read = current_[1]
-                        flag_first = not flag_first
-                    elif current_[3]:
-                        second_final_read = current_[1]
-                y_.append(second_final_read - first_final_read)
+                # Pulses between the first and the last finished convergences
+                final_read = current.graph_resistance.index[current.graph_resistance.is_finish]
+                y_.append((final_read[-1] if len(final_read) > 1 else 0) - (final_read[0] if len(final_read) else 0))
             x.append(dict_.get(key).get(current_key)[0].tolerance)
             y.append(np.mean(y_[:]))
             error_bar.append(np.std(y_[:]))
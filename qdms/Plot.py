@@ -6,6 +6,7 @@ from .QDSimulation import QDSimulation
 import math
 import time
 from .HelperFunction import is_square
+from .PulseTrace import ACTIONS
 
 
 def plot_everything(memristor_sim, qd_sim, pulsed_programming, directory_name=None, number_iteration=10, plots=None, verbose=False, dpi=600):
@@ -219,16 +220,20 @@ def create_pulsed_programming_plot(pulsed_programming, path=None, number_iterati
     ax.set_ylabel('Resistance \u03A9')
 
     def find_index(pulsed_programming_, n):
-        counter_ = 0
-        p_res = 0
-        for i in range(len(pulsed_programming_.graph_resistance)):
-            if pulsed_programming_.graph_resistance[i][3] and p_res != pulsed_programming_.graph_resistance[i][0]:
-                p_res = pulsed_programming_.graph_resistance[i][0]
-                counter_ += 1
-                if counter_ > n:
-                    return i
-
-    y, x, action, annotation = zip(*pulsed_programming.graph_resistance[0:find_index(pulsed_programming, number_iteration)])
+        # Position of the n+1-th finished pulse whose resistance differs from the previous finished one
+        trace = pulsed_programming_.graph_resistance
+        finish = np.flatnonzero(trace.is_finish)
+        res = trace.value[finish]
+        is_new = res != np.concatenate([[0], res[:-1]])
+        if np.count_nonzero(is_new) > n:
+            return int(finish[is_new][n])
+
+    trace = pulsed_programming.graph_resistance
+    stop = find_index(pulsed_programming, number_iteration)
+    y = trace.value[:stop].tolist()
+    x = trace.index[:stop].tolist()
+    action = [ACTIONS[code] for code in trace.action[:stop].tolist()]
+    annotation = trace.is_finish[:stop].tolist()
     time_tick_locations = []
 
     list_set = []
@@ -236,23 +241,20 @@ def create_pulsed_programming_plot(pulsed_programming, path=None, number_iterati
     list_read = []
 
     annotate_point = []
-    counter = 0
 
     counter_start = 0
 
-    for current_index in x:
-        current_y = y[current_index]
-        if action[current_index] == 'read':
-            list_read.append([current_y, counter])
-            counter += 1
-        elif action[current_index] == 'set':
-            list_set.append([current_y, counter])
-            counter += 1
-        elif action[current_index] == 'reset':
-            list_reset.append([current_y, counter])
-            counter += 1
-        if annotation[current_index]:
-            counter_end = counter
+    # x holds the pulse numbers, which skip the pulses not recorded with trace_level 'sampled'
+    for position, current_index in enumerate(x):
+        current_y = y[position]
+        if action[position] == 'read':
+            list_read.append([current_y, current_index])
+        elif action[position] == 'set':
+            list_set.append([current_y, current_index])
+        elif action[position] == 'reset':
+            list_reset.append([current_y, current_index])
+        if annotation[position]:
+            counter_end = current_index + 1
             annotate_point.append([counter_end - counter_start, counter_end, current_y])
             counter_start = counter_end
 
@@ -346,22 +348,22 @@ def create_amplitude_plot(pulsed_programming, path=None, number_iteration=10, dp
     voltages_reset = []
 
     def find_index(pulsed_programming_, n):
-        counter_ = 0
-        p_res = 0
-        for i in range(len(pulsed_programming_.graph_resistance)):
-            if pulsed_programming_.graph_resistance[i][3] and p_res != pulsed_programming_.graph_resistance[i][0]:
-                p_res = pulsed_programming_.graph_resistance[i][0]
-                counter_ += 1
-                if counter_ > n:
-                    return i
-
-    for i in pulsed_programming.graph_voltages[:find_index(pulsed_programming, number_iteration)]:
-        if i[2] == 'reset':
-            voltages_reset.append([i[0], i[1]])
-        elif i[2] == 'set':
-            voltages_set.append([i[0], i[1]])
-        elif i[2] == 'read':
-            voltages_read.append([i[0], i[1]])
+        # Position of the n+1-th finished pulse whose resistance differs from the previous finished one
+        trace = pulsed_programming_.graph_resistance
+        finish = np.flatnonzero(trace.is_finish)
+        res = trace.value[finish]
+        is_new = res != np.concatenate([[0], res[:-1]])
+        if np.count_nonzero(is_new) > n:
+            return int(finish[is_new][n])
+
+    trace = pulsed_programming.graph_voltages
+    stop = find_index(pulsed_programming, number_iteration)
+    # stop is a position in graph_resistance, the pulses of graph_voltages are kept up to its pulse number
+    is_plotted = np.ones(len(trace), dtype=bool) if stop is None \
+        else trace.index < pulsed_programming.graph_resistance.index[stop]
+    for code, voltages_action in enumerate([voltages_read, voltages_set, voltages_reset]):
+        is_action = is_plotted & (trace.action == code)
+        voltages_action.extend(zip(trace.value[is_action].tolist(), trace.index[is_action].tolist()))
 
     plt.figure()
     if len(voltages_reset) != 0:
@@ -0,0 +1,225 @@
+import numpy as np
+
+
+class ProgrammingResult:
+    """
+    This class records the result of a pulsed programming in columns, one row per voltage target programmed: the target
+    voltage, the voltage output reached, the resistance read on each memristor and the number of pulses written. The
+    columns are grown by doubling, and only the rows recorded are saved. Unlike the dict voltage_output it replaces, two
+    targets reaching the same voltage output are both kept. The dict is still built, on demand, by voltage_output.
+
+    Parameters
+    ----------
+    target_voltage : np.ndarray
+        The voltage (V) wanted for each row. NaN if unknown.
+
+    voltage : np.ndarray
+        The voltage output (V) reached for each row.
+
+    resistances : np.ndarray
+        Array of shape (len(voltage), number_of_memristor). The resistance (Ohm) read on each memristor for each row.
+
+    number_of_pulse : np.ndarray
+        The number of writing pulses to program each row. -1 if unknown.
+    """
+
+    def __init__(self, number_of_memristor=0, capacity=256):
+        self.number_of_memristor = number_of_memristor
+        self.size = 0
+        self._target_voltage = np.empty(capacity)
+        self._voltage = np.empty(capacity)
+        self._resistances = np.empty((capacity, number_of_memristor))
+        self._number_of_pulse = np.empty(capacity, dtype=np.int64)
+        self._voltage_output = None
+
+    def __getstate__(self):
+        # Only the recorded rows are saved, and not the dict
+        state = self.__dict__.copy()
+        for name in ['_target_voltage', '_voltage', '_resistances', '_number_of_pulse']:
+            state[name] = state[name][:self.size].copy()
+        state['_voltage_output'] = None
+        return state
+
+    def __len__(self):
+        return self.size
+
+    @property
+    def target_voltage(self):
+        return self._target_voltage[:self.size]
+
+    @property
+    def voltage(self):
+        return self._voltage[:self.size]
+
+    @property
+    def resistances(self):
+        return self._resistances[:self.size]
+
+    @property
+    def number_of_pulse(self):
+        return self._number_of_pulse[:self.size]
+
+    @property
+    def error(self):
+        """
+        The voltage output reached minus the target voltage (V) of each row.
+        """
+        return self.voltage - self.target_voltage
+
+    @property
+    def voltage_output(self):
+        """
+        The dict with keys as voltage output and package as list of resistance read, like the former
+        PulsedProgramming.voltage_output. A voltage output reached twice keeps the last row. Built on the first access
+        after a record.
+        """
+        if self._voltage_output is None:
+            self._voltage_output = dict(zip(self.voltage.tolist(), self.resistances.tolist()))
+        return self._voltage_output
+
+    def reserve(self, size):
+        """
+        This function grows the columns, at least doubling them, so they can hold size rows.
+
+        Parameters
+        ----------
+        size : int
+            The number of rows to hold.
+        """
+        if size > len(self._voltage):
+            capacity = max(size, 2 * len(self._voltage))
+            for name in ['_target_voltage', '_voltage', '_resistances', '_number_of_pulse']:
+                column = getattr(self, name)
+                grown = np.empty((capacity,) + column.shape[1:], dtype=column.dtype)
+                grown[:self.size] = column[:self.size]
+                setattr(self, name, grown)
+
+    def record(self, target_voltage, voltage, resistances, number_of_pulse=-1):
+        """
+        This function records the result of a voltage target.
+
+        Parameters
+        ----------
+        target_voltage : float
+            The voltage (V) wanted.
+
+        voltage : float
+            The voltage output (V) reached.
+
+        resistances : iterable[float]
+            The resistance (Ohm) read on each memristor.
+
+        number_of_pulse : int
+            The number of writing pulses to program it.
+        """
+        resistances = np.asarray(resistances, dtype=float)
+        if self.size == 0 and len(resistances) != self.number_of_memristor:
+            self.number_of_memristor = len(resistances)
+            self._resistances = np.empty((len(self._voltage), self.number_of_memristor))
+        if self.size == len(self._voltage):
+            self.reserve(self.size + 1)
+        self._target_voltage[self.size] = target_voltage
+        self._voltage[self.size] = voltage
+        self._resistances[self.size] = resistances
+        self._number_of_pulse[self.size] = number_of_pulse
+        self.size += 1
+        self._voltage_output = None
+
+    def extend(self, result):
+        """
+        This function records all the rows of an other result.
+
+        Parameters
+        ----------
+        result : ProgrammingResult
+            The rows recorded.
+        """
+        if len(result) == 0:
+            return
+        if self.size == 0 and result.number_of_memristor != self.number_of_memristor:
+            self.number_of_memristor = result.number_of_memristor
+            self._resistances = np.empty((len(self._voltage), self.number_of_memristor))
+        size = self.size + result.size
+        self.reserve(size)
+        self._target_voltage[self.size:size] = result.target_voltage
+        self._voltage[self.size:size] = result.voltage
+        self._resistances[self.size:size] = result.resistances
+        self._number_of_pulse[self.size:size] = result.number_of_pulse
+        self.size = size
+        self._voltage_output = None
+
+    @classmethod
+    def from_voltage_output(cls, voltage_output):
+        """
+        This function creates a result from a dict voltage_output, with the target voltages and the number of pulses
+        unknown.
+
+        Parameters
+        ----------
+        voltage_output : dict
+            dict with keys as voltage output and package as list of resistance read
+
+        Returns
+        ----------
+        result : ProgrammingResult
+            The result.
+        """
+        resistances = list(voltage_output.values())
+        result = cls(len(resistances[0]) if resistances else 0, capacity=max(len(resistances), 1))
+        for voltage, resistance in zip(voltage_output.keys(), resistances):
+            result.record(np.nan, voltage, resistance)
+        return result
+
+    def sort_by_voltage(self):
+        """
+        This function returns a copy of the result with the rows sorted by voltage output, like the voltages of
+        MemristorSimulation. Rows with the same voltage output stay in the order recorded.
+
+        Returns
+        ----------
+        result : ProgrammingResult
+            The sorted result.
+        """
+        order = np.argsort(self.voltage, kind='stable')
+        result = ProgrammingResult(self.number_of_memristor, capacity=max(self.size, 1))
+        result._target_voltage[:self.size] = self.target_voltage[order]
+        result._voltage[:self.size] = self.voltage[order]
+        result._resistances[:self.size] = self.resistances[order]
+        result._number_of_pulse[:self.size] = self.number_of_pulse[order]
+        result.size = self.size
+        return result
+
+    def resolution(self):
+        """
+        This function returns the mean difference between consecutive voltages output, in the order recorded, which is
+        the order of the targets. It's np.mean(np.diff(list(voltage_output.keys()))) without colliding voltages.
+
+        Returns
+        ----------
+        resolution : float
+            The mean difference (V).
+        """
+        return np.mean(np.diff(self.voltage))
+
+    def statistics(self):
+        """
+        This function summarizes the result.
+
+        Returns
+        ----------
+        statistics : dict
+            'resolution' : the mean difference between consecutive voltages output (V). 'std_resolution' : its standard
+            deviation (V). 'mean_error', 'max_error' : the mean and the max absolute error on the target voltages (V).
+            'mean_pulse', 'total_pulse' : the mean and the total number of pulses.
+        """
+        diff = np.diff(self.voltage)
+        error = np.abs(self.error)
+        pulses = self.number_of_pulse[self.number_of_pulse >= 0]
+        return {
+            'resolution': float(np.mean(diff)) if len(diff) else np.nan,
+            'std_resolution': float(np.std(diff)) if len(diff) else np.nan,
+            'mean_error': float(np.nanmean(error)) if np.any(~np.isnan(error)) else np.nan,
+            'max_error': float(np.nanmax(error)) if np.any(~np.isnan(error)) else np.nan,
+            'mean_pulse': float(np.mean(pulses)) if len(pulses) else np.nan,
+            'total_pulse': int(np.sum(pulses)),
+        }
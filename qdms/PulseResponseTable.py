@@ -0,0 +1,390 @@
+import hashlib
+import math
+import os
+import time
+import numpy as np
+from .Data_Driven import Data_Driven, PARAMETER_NAMES, pulse_batch, stack_parameters
+from .Log import compressed_pickle, decompress_pickle
+
+# Change it when the content of the table changes, so the tables cached on disk are rebuilt
+TABLE_VERSION = 2
+
+
+class PulseResponseTable:
+    """
+    This class contains the resistance of a Data_Driven parameter model after a pulse, for a grid of starting resistance,
+    voltage and pulse width. The grid is built once with pulse_batch() and then queried by interpolation, which is
+    useful when the same pulses are applied to many devices. See PulseResponseTable.load_or_build() to cache it on disk.
+
+    Parameters
+    ----------
+    parameter_model : string
+        The Data_Driven parameter model. See Data_Driven.set_parameter().
+
+    pulse_widths : iterable[float]
+        The pulse widths (s) of the grid. Between two widths, the response is interpolated linearly.
+
+    v_min, v_max : float
+        The voltage (V) range of the grid.
+
+    r_min, r_max : float
+        The resistance (Ohm) range of the grid, inside [r_on, r_off]. If None, r_on and r_off. Outside of it the model
+        confines the resistance abruptly, so these points go through the exact path.
+
+    nb_resistance, nb_voltage : int
+        The starting number of points of the grid along the resistance and the voltage, before the refinement.
+
+    max_error : float
+        The maximum absolute error (Ohm) tolerated against the exact path, measured in the middle of the grid cells.
+
+    max_refinement : int
+        The maximum number of refinement passes of the grid to respect max_error. See build().
+
+    version2018 : bool
+        If true, use resistance2018() instead of resistance().
+
+    resistances, voltages : np.ndarray
+        The axes of the grid.
+
+    response : np.ndarray
+        The resistance (Ohm) after the pulse, of shape (len(pulse_widths), len(resistances), len(voltages)).
+
+    is_exact : np.ndarray
+        Of shape (len(resistances) - 1, len(voltages) - 1), true for the cells over max_error after the refinement.
+        The queries in these cells use the exact path.
+
+    error : float
+        The maximum absolute error (Ohm) of the interpolated cells, measured against the exact path when the table was
+        built.
+
+    key : string
+        Hash of everything the table depends on, used to name the cached file.
+    """
+
+    def __init__(self, parameter_model='O921C', pulse_widths=(200e-9,), v_min=-3, v_max=3, r_min=None, r_max=None,
+                 nb_resistance=257, nb_voltage=301, max_error=1, max_refinement=4, version2018=False):
+        self.memristor = Data_Driven(parameter_model=parameter_model)
+        self.parameter_model = self.memristor.parameter_model
+        self.pulse_widths = np.sort(np.array(pulse_widths, dtype=float))
+        self.v_min = v_min
+        self.v_max = v_max
+        self.r_min = self.memristor.r_on if r_min is None else max(r_min, self.memristor.r_on)
+        self.r_max = self.memristor.r_off if r_max is None else min(r_max, self.memristor.r_off)
+        self.nb_resistance = nb_resistance
+        self.nb_voltage = nb_voltage
+        self.max_error = max_error
+        self.max_refinement = max_refinement
+        self.version2018 = version2018
+        self.version = TABLE_VERSION
+        self.key = self.create_key()
+
+        self.resistances = None
+        self.voltages = None
+        self.response = None
+        self.is_exact = None
+        self.error = None
+
+    def print(self):
+        print(self.parameter_model)
+        print(self.pulse_widths)
+        print(self.v_min, self.v_max)
+        print(self.r_min, self.r_max)
+        print(self.nb_resistance, self.nb_voltage)
+        print(self.max_error)
+        print(self.error)
+        print(self.version2018)
+        print(self.key)
+
+    def create_key(self):
+        """
+        This function creates the hash of the table version, the model parameters and the grid parameters.
+
+        Returns
+        ----------
+        key : string
+            The hash.
+        """
+        description = [self.version, self.parameter_model, self.version2018, list(self.pulse_widths), self.v_min,
+                       self.v_max, self.r_min, self.r_max, self.nb_resistance, self.nb_voltage, self.max_error,
+                       self.max_refinement]
+        description += [getattr(self.memristor, name) for name in PARAMETER_NAMES + ['r_p', 'r_n']]
+        return hashlib.md5(repr(description).encode()).hexdigest()[:16]
+
+    def number_step(self, t_pulse):
+        """
+        Number of timesteps of a pulse, computed like PulsedProgramming.write_resistance().
+        """
+        return int(t_pulse / self.memristor.time_series_resolution)
+
+    def exact(self, resistance, voltage, t_pulse):
+        """
+        This function computes the resistance after the pulse with pulse_batch(), without the table.
+
+        Parameters
+        ----------
+        resistance : iterable[float]
+            The resistance (Ohm) before the pulse.
+
+        voltage : iterable[float]
+            The voltage (V) of the pulse.
+
+        t_pulse : float
+            The pulse width (s).
+
+        Returns
+        ----------
+        resistance : np.ndarray
+            The resistance (Ohm) after the pulse.
+        """
+        resistance, voltage = np.broadcast_arrays(np.asarray(resistance, dtype=float), np.asarray(voltage, dtype=float))
+        parameters = {k: np.repeat(v, resistance.size, axis=0) for k, v in stack_parameters([self.memristor]).items()}
+        g = pulse_batch(1 / resistance.ravel(), voltage.ravel(), self.number_step(t_pulse), parameters,
+                        version2018=self.version2018)
+        return (1 / g).reshape(resistance.shape)
+
+    def build(self, verbose=False):
+        """
+        This function fills the table. The response changes quickly in some regions (e.g. small negative voltages), so
+        the axes start uniform and the intervals where the linear interpolation along an axis is over max_error / 2 are
+        split, until the error in every cell (see cell_error()) respects self.max_error. After max_refinement passes, the
+        cells still over max_error, and the ones partly confined (see is_confined_cell()), are marked in self.is_exact and
+        the queries falling in them use the exact path.
+
+        Parameters
+        ----------
+        verbose : bool
+            If true, output in console the error and the time of each refinement.
+        """
+        self.resistances = np.linspace(self.r_min, self.r_max, self.nb_resistance)
+        self.voltages = np.linspace(self.v_min, self.v_max, self.nb_voltage)
+        for refinement in range(self.max_refinement + 1):
+            if verbose:
+                start = time.time()
+            r_middle = (self.resistances[1:] + self.resistances[:-1]) / 2
+            v_middle = (self.voltages[1:] + self.voltages[:-1]) / 2
+            self.response = self.compute(self.resistances, self.voltages)
+            error_r = np.abs(self.compute(r_middle, self.voltages) - (self.response[:, 1:] + self.response[:, :-1]) / 2)
+            error_v = np.abs(self.compute(self.resistances, v_middle)
+                             - (self.response[:, :, 1:] + self.response[:, :, :-1]) / 2)
+            error_cell = self.cell_error()
+            self.error = np.nanmax(error_cell)
+            if verbose:
+                print(f'Grid: {len(self.resistances)}x{len(self.voltages)}\tError: {self.error} (Ohm)\t'
+                      f'Took: {round(time.time() - start, 2)} s')
+            if self.error <= self.max_error or refinement == self.max_refinement:
+                self.is_exact = (np.nanmax(error_cell, axis=0) > self.max_error) | self.is_confined_cell()
+                break
+            split_r = np.nanmax(error_r, axis=(0, 2)) > self.max_error / 2
+            split_v = np.nanmax(error_v, axis=(0, 1)) > self.max_error / 2
+            if not np.any(split_r) and not np.any(split_v):
+                # Only the cross term is over the bound, split the worst cells in both directions
+                worst = np.nanmax(error_cell, axis=0) > self.max_error
+                split_r, split_v = np.any(worst, axis=1), np.any(worst, axis=0)
+            self.resistances = np.sort(np.concatenate([self.resistances, r_middle[split_r]]))
+            self.voltages = np.sort(np.concatenate([self.voltages, v_middle[split_v]]))
+        if verbose and np.any(self.is_exact):
+            print(f'{np.count_nonzero(self.is_exact)} of {self.is_exact.size} cells use the exact path')
+        self.error = np.max(error_cell[:, ~self.is_exact], initial=0)
+
+    def is_confined_cell(self):
+        """
+        This function finds the cells where the response is confined to r_on or r_off at some corners but not at all of
+        them. The response has a kink inside these cells, where the bilinear interpolation error can peak anywhere.
+
+        Returns
+        ----------
+        is_confined : np.ndarray
+            Of shape (len(resistances) - 1, len(voltages) - 1), true for these cells.
+        """
+        is_bound = (self.response <= self.memristor.r_on) | (self.response >= self.memristor.r_off)
+        corners = [is_bound[:, :-1, :-1], is_bound[:, 1:, :-1], is_bound[:, :-1, 1:], is_bound[:, 1:, 1:]]
+        return np.any(np.any(corners, axis=0) & ~np.all(corners, axis=0), axis=0)
+
+    def cell_error(self):
+        """
+        This function measures the error of the bilinear interpolation in each cell of the grid, against the exact path,
+        at the middle and at the four quarter points of the cell. The middle alone misses the cells where the error
+        peaks off center.
+
+        Returns
+        ----------
+        error_cell : np.ndarray
+            The maximum absolute error (Ohm) in each cell, of shape (len(self.pulse_widths), len(resistances) - 1,
+            len(voltages) - 1).
+        """
+        error_cell = None
+        for weight_r, weight_v in [(0.5, 0.5), (0.25, 0.25), (0.25, 0.75), (0.75, 0.25), (0.75, 0.75)]:
+            r = self.resistances[:-1] + weight_r * np.diff(self.resistances)
+            v = self.voltages[:-1] + weight_v * np.diff(self.voltages)
+            interpolated = (self.response[:, :-1, :-1] * (1 - weight_r) + self.response[:, 1:, :-1] * weight_r) \
+                * (1 - weight_v) + (self.response[:, :-1, 1:] * (1 - weight_r) + self.response[:, 1:, 1:] * weight_r) \
+                * weight_v
+            error = np.abs(self.compute(r, v) - interpolated)
+            error_cell = error if error_cell is None else np.fmax(error_cell, error)
+        return error_cell
+
+    def compute(self, resistances, voltages):
+        """
+        This function computes the exact response on the grid resistances x voltages for every pulse width.
+
+        Returns
+        ----------
+        response : np.ndarray
+            Of shape (len(self.pulse_widths), len(resistances), len(voltages)).
+        """
+        r_mesh, v_mesh = np.meshgrid(resistances, voltages, indexing='ij')
+        return np.array([self.exact(r_mesh, v_mesh, t_pulse) for t_pulse in self.pulse_widths])
+
+    def locate(self, resistance, voltage):
+        """
+        This function finds the cells of the grid containing the points. The points need to be inside the grid.
+
+        Returns
+        ----------
+        i, j : np.ndarray
+            The index of the cells along the resistance and the voltage.
+        """
+        i = np.clip(np.searchsorted(self.resistances, resistance, side='right') - 1, 0, len(self.resistances) - 2)
+        j = np.clip(np.searchsorted(self.voltages, voltage, side='right') - 1, 0, len(self.voltages) - 2)
+        return i, j
+
+    def interpolate(self, index_width, weight_width, resistance, voltage, i, j):
+        """
+        Bilinear interpolation of the table in resistance and voltage, then linear in pulse width.
+
+        Parameters
+        ----------
+        index_width : int
+            The index of the pulse width just under the wanted one.
+
+        weight_width : float
+            The interpolation weight of the pulse width index_width + 1.
+
+        resistance, voltage : np.ndarray
+            The resistance (Ohm) and voltage (V).
+
+        i, j : np.ndarray
+            The cells of the points. See locate().
+
+        Returns
+        ----------
+        resistance : np.ndarray
+            The interpolated resistance (Ohm) after the pulse.
+        """
+        weight_r = (resistance - self.resistances[i]) / (self.resistances[i + 1] - self.resistances[i])
+        weight_v = (voltage - self.voltages[j]) / (self.voltages[j + 1] - self.voltages[j])
+
+        def bilinear(k):
+            return (self.response[k, i, j] * (1 - weight_r) + self.response[k, i + 1, j] * weight_r) * (1 - weight_v) \
+                + (self.response[k, i, j + 1] * (1 - weight_r) + self.response[k, i + 1, j + 1] * weight_r) * weight_v
+
+        result = bilinear(index_width)
+        if weight_width != 0:
+            result = result * (1 - weight_width) + bilinear(index_width + 1) * weight_width
+        return result
+
+    def find_width(self, t_pulse):
+        """
+        This function locates a pulse width in self.pulse_widths.
+
+        Returns
+        ----------
+        index_width, weight_width : int, float
+            See interpolate(). index_width is None if the pulse width is outside of the table.
+        """
+        k = int(np.searchsorted(self.pulse_widths, t_pulse, side='right')) - 1
+        if k >= 0 and math.isclose(self.pulse_widths[k], t_pulse, rel_tol=1e-9):
+            return k, 0.
+        if 0 <= k < len(self.pulse_widths) - 1:
+            return k, (t_pulse - self.pulse_widths[k]) / (self.pulse_widths[k + 1] - self.pulse_widths[k])
+        if k == -1 and math.isclose(self.pulse_widths[0], t_pulse, rel_tol=1e-9):
+            return 0, 0.
+        return None, None
+
+    def query(self, resistance, voltage, t_pulse):
+        """
+        This function returns the resistance after a pulse. The points outside of the table go through the exact path.
+
+        Parameters
+        ----------
+        resistance : float or iterable[float]
+            The resistance (Ohm) before the pulse.
+
+        voltage : float or iterable[float]
+            The voltage (V) of the pulse.
+
+        t_pulse : float
+            The pulse width (s).
+
+        Returns
+        ----------
+        resistance : float or np.ndarray
+            The resistance (Ohm) after the pulse, a float if resistance and voltage are floats.
+        """
+        if self.response is None:
+            self.build()
+        index_width, weight_width = self.find_width(t_pulse)
+        if np.ndim(resistance) == 0 and np.ndim(voltage) == 0:
+            if index_width is not None and self.r_min <= resistance <= self.r_max and self.v_min <= voltage <= self.v_max:
+                i, j = self.locate(resistance, voltage)
+                if not self.is_exact[i, j]:
+                    return float(self.interpolate(index_width, weight_width, resistance, voltage, i, j))
+            memristor = self.memristor
+            memristor.g = 1 / resistance
+            memristor.simulate_pulse(voltage, self.number_step(t_pulse), version2018=self.version2018)
+            return 1 / memristor.g
+
+        resistance, voltage = np.broadcast_arrays(np.asarray(resistance, dtype=float), np.asarray(voltage, dtype=float))
+        if index_width is None:
+            return self.exact(resistance, voltage, t_pulse)
+        is_inside = (self.r_min <= resistance) & (resistance <= self.r_max) & (self.v_min <= voltage) & (voltage <= self.v_max)
+        i, j = self.locate(resistance[is_inside], voltage[is_inside])
+        is_table = ~self.is_exact[i, j]
+        i, j = i[is_table], j[is_table]
+        is_inside[is_inside] = is_table
+        result = np.empty(resistance.shape)
+        result[is_inside] = self.interpolate(index_width, weight_width, resistance[is_inside], voltage[is_inside], i, j)
+        if not np.all(is_inside):
+            result[~is_inside] = self.exact(resistance[~is_inside], voltage[~is_inside], t_pulse)
+        return result
+
+    @staticmethod
+    def load_or_build(path, parameter_model='O921C', verbose=False, **kwargs):
+        """
+        This function loads the table from the folder path if it was already built with the same parameters and table
+        version, otherwise it builds it and saves it in path.
+
+        Parameters
+        ----------
+        path : string
+            The folder of the cached tables.
+
+        parameter_model : string
+            The Data_Driven parameter model.
+
+        verbose : bool
+            Output in console if the table was loaded or built.
+
+        kwargs
+            The other parameters of PulseResponseTable.
+
+        Returns
+        ----------
+        table : PulseResponseTable
+            The table, ready to be queried.
+        """
+        table = PulseResponseTable(parameter_model=parameter_model, **kwargs)
+        file = os.path.join(path, f'pulse_response_{table.parameter_model}_v{table.version}_{table.key}')
+        if os.path.exists(f'{file}.pbz2'):
+            cached = decompress_pickle(f'{file}.pbz2')
+            if getattr(cached, 'version', None) == TABLE_VERSION and getattr(cached, 'key', None) == table.key:
+                if verbose:
+                    print(f'PulseResponseTable loaded from {file}.pbz2')
+                return cached
+        table.build(verbose=verbose)
+        if not os.path.isdir(path):
+            os.makedirs(path)
+        compressed_pickle(file, table)
+        if verbose:
+            print(f'PulseResponseTable saved in {file}.pbz2')
+        return table
@@ -0,0 +1,202 @@
+import numpy as np
+
+# Code of each action in PulseTrace.action
+ACTIONS = ('read', 'set', 'reset')
+
+
+class PulseTrace:
+    """
+    This class records the pulses of a pulsed programming in columns: one array per field, grown by doubling, instead of
+    one list per pulse. A segment is the pulses of one convergence, up to the one flagged finished, and is found in O(1)
+    with segment(). The columns are views of the recorded pulses, so the plots and the logs use them without a copy.
+    It also behaves like the list of [value, index, action, is_finish] ([value, index, action] without has_finish) it
+    replaces: len(), indexing, iteration and append().
+
+    Parameters
+    ----------
+    value : np.ndarray
+        The resistance (Ohm) read or the voltage (V) applied at each pulse.
+
+    index : np.ndarray
+        The pulse number of each pulse.
+
+    action : np.ndarray
+        The code of the action of each pulse, an index in ACTIONS.
+
+    is_finish : np.ndarray
+        If true, the convergence finished at this pulse.
+
+    segment_ends : np.ndarray
+        The position of the pulses flagged finished, the ends of the segments.
+
+    has_finish : bool
+        If true, the pulses are recorded with is_finish, like graph_resistance. Otherwise, like graph_voltages.
+    """
+
+    def __init__(self, has_finish=True, capacity=1024):
+        self.has_finish = has_finish
+        self.size = 0
+        self.number_segment = 0
+        self._value = np.empty(capacity)
+        self._index = np.empty(capacity, dtype=np.int64)
+        self._action = np.empty(capacity, dtype=np.int8)
+        self._is_finish = np.empty(capacity, dtype=bool)
+        self._segment_ends = np.empty(capacity, dtype=np.int64)
+
+    def __getstate__(self):
+        # Only the recorded pulses are saved
+        state = self.__dict__.copy()
+        for name in ['_value', '_index', '_action', '_is_finish']:
+            state[name] = state[name][:self.size].copy()
+        state['_segment_ends'] = state['_segment_ends'][:self.number_segment].copy()
+        return state
+
+    def __len__(self):
+        return self.size
+
+    def __getitem__(self, item):
+        if isinstance(item, slice):
+            return [self[i] for i in range(*item.indices(self.size))]
+        if item < 0:
+            item += self.size
+        if not 0 <= item < self.size:
+            raise IndexError('PulseTrace index out of range')
+        entry = [float(self._value[item]), int(self._index[item]), ACTIONS[self._action[item]]]
+        if self.has_finish:
+            entry.append(bool(self._is_finish[item]))
+        return entry
+
+    def __iter__(self):
+        for i in range(self.size):
+            yield self[i]
+
+    @property
+    def value(self):
+        return self._value[:self.size]
+
+    @property
+    def index(self):
+        return self._index[:self.size]
+
+    @property
+    def action(self):
+        return self._action[:self.size]
+
+    @property
+    def is_finish(self):
+        return self._is_finish[:self.size]
+
+    @property
+    def segment_ends(self):
+        return self._segment_ends[:self.number_segment]
+
+    @property
+    def next_index(self):
+        """
+        The pulse number following the last pulse recorded, 0 if none is. With trace_level 'sampled', it's not len().
+        """
+        return int(self._index[self.size - 1]) + 1 if self.size else 0
+
+    def reserve(self, size):
+        """
+        This function grows the columns, at least doubling them, so they can hold size pulses.
+
+        Parameters
+        ----------
+        size : int
+            The number of pulses to hold.
+        """
+        if size > len(self._value):
+            capacity = max(size, 2 * len(self._value))
+            for name in ['_value', '_index', '_action', '_is_finish']:
+                column = getattr(self, name)
+                grown = np.empty(capacity, dtype=column.dtype)
+                grown[:self.size] = column[:self.size]
+                setattr(self, name, grown)
+        if self.number_segment + (size - self.size) > len(self._segment_ends):
+            grown = np.empty(max(self.number_segment + size - self.size, 2 * len(self._segment_ends)), dtype=np.int64)
+            grown[:self.number_segment] = self._segment_ends[:self.number_segment]
+            self._segment_ends = grown
+
+    def record(self, value, index, action, is_finish=False):
+        """
+        This function records a pulse.
+
+        Parameters
+        ----------
+        value : float
+            The resistance (Ohm) read or the voltage (V) applied.
+
+        index : int
+            The pulse number.
+
+        action : string
+            'read', 'set' or 'reset'.
+
+        is_finish : bool
+            If true, the convergence finished at this pulse.
+        """
+        if self.size == len(self._value) or self.number_segment == len(self._segment_ends):
+            self.reserve(self.size + 1)
+        self._value[self.size] = value
+        self._index[self.size] = index
+        self._action[self.size] = ACTIONS.index(action)
+        self._is_finish[self.size] = is_finish
+        if is_finish:
+            self._segment_ends[self.number_segment] = self.size
+            self.number_segment += 1
+        self.size += 1
+
+    def append(self, entry):
+        """
+        This function records a pulse given like in the list replaced, [value, index, action, is_finish].
+
+        Parameters
+        ----------
+        entry : list
+            The pulse.
+        """
+        self.record(*entry)
+
+    def extend(self, trace, index_offset=0):
+        """
+        This function records all the pulses of an other trace, with their pulse number shifted by index_offset.
+
+        Parameters
+        ----------
+        trace : PulseTrace
+            The pulses recorded.
+
+        index_offset : int
+            The shift of the pulse numbers.
+        """
+        size = self.size + trace.size
+        self.reserve(size)
+        self._value[self.size:size] = trace.value
+        self._index[self.size:size] = trace.index + index_offset
+        self._action[self.size:size] = trace.action
+        self._is_finish[self.size:size] = trace.is_finish
+        number_segment = self.number_segment + trace.number_segment
+        self._segment_ends[self.number_segment:number_segment] = trace.segment_ends + self.size
+        self.number_segment = number_segment
+        self.size = size
+
+    def segment(self, k):
+        """
+        This function returns the position of the pulses of the k-th convergence, which ends with the k-th pulse flagged
+        finished.
+
+        Parameters
+        ----------
+        k : int
+            The number of the segment.
+
+        Returns
+        ----------
+        segment : slice
+            The pulses of the segment, to index the columns.
+        """
+        if k < 0:
+            k += self.number_segment
+        start = self._segment_ends[k - 1] + 1 if k > 0 else 0
+        return slice(int(start), int(self._segment_ends[k]) + 1)
@@ -1,6 +1,56 @@
 import numpy as np
+import copy
 import math
 import time
+from concurrent.futures import ProcessPoolExecutor
+from types import SimpleNamespace
+from .Data_Driven import stack_parameters, pulse_batch, read_memristors, read_batch
+from .HelperFunction import random_generator
+from .PulseTrace import PulseTrace
+from .ProgrammingResult import ProgrammingResult
+
+
+def program_chunk(pulsed_programming, voltages_target, precision, seed):
+    """
+    This function programs a chunk of voltages_target in a worker process, on the worker's own copy of the circuit.
+
+    Parameters
+    ----------
+    pulsed_programming : PulsedProgramming
+        The copy of the pulsed programming used by the worker.
+
+    voltages_target : dict
+        dict with keys as voltage and package as list of resistance
+
+    precision : list
+        [[macro_tune, is_relative_variability], [fine_tune, is_relative_variability]] for the balance() method.
+
+    seed : np.random.SeedSequence
+        Seed of the chunk. It seeds np.random in the worker and spawns the streams of the generators of the pulsed
+        programming and of each memristor, so the chunk gives the same result whatever the process running it.
+
+    Returns
+    ----------
+    result, graph_resistance, graph_voltages, trace_summary : ProgrammingResult, PulseTrace, PulseTrace, list
+        The results of the chunk.
+
+    conductances : list of float
+        The conductance of each memristor at the end of the chunk.
+    """
+    np.random.seed(int(seed.generate_state(1)[0]))
+    list_memristor = pulsed_programming.memristor_simulation.circuit.list_memristor
+    streams = seed.spawn(len(list_memristor) + 1)
+    if pulsed_programming.rng is not None:
+        pulsed_programming.rng = np.random.default_rng(streams[0])
+    for memristor, stream in zip(list_memristor, streams[1:]):
+        if getattr(memristor, 'rng', None) is not None:
+            memristor.rng = np.random.default_rng(stream)
+    # The block of write noise copied from the parent would be the same in every chunk
+    pulsed_programming.refill_variability_write()
+    pulsed_programming.simulate(voltages_target, precision)
+    conductances = [memristor.g for memristor in pulsed_programming.memristor_simulation.circuit.list_memristor]
+    return pulsed_programming.result, pulsed_programming.graph_resistance, pulsed_programming.graph_voltages, \
+        pulsed_programming.trace_summary, conductances
 
 
 class PulsedProgramming:
@@ -26,18 +76,22 @@ class PulsedProgramming:
         If true, the tolerance_value would be in percentage instead of (Ohm). ex: 10 : if true, 10% : if false, 10 Ohm
 
     variability_write : iterable[float]
-        A gaussian distribution with (mu=0, sigma=variance_write)
+        The current block of a gaussian distribution with (mu=0, sigma=variance_write). When all its samples are used,
+        a new block is drawn, so the write noise never repeats. See draw_variability_write().
 
     index_variability : int
-        Index of the current variability. If over 1000, reset to 0.
+        Index of the current variability in variability_write.
+
+    variability_block_size : int
+        Number of samples of each block of variability_write. See refill_variability_write().
 
     variance_write : float
         Variance of the gaussian distribution on the memristor write. See variability.
 
-    graph_resistance : List[Union[float, int]]
+    graph_resistance : PulseTrace
         Contains all resistance of the simulation. It's used in the creation of plots.
 
-    graph_voltages : List[Union[float, int]]
+    graph_voltages : PulseTrace
         Contains all voltages of the simulation. It's used in the creation of plots.
 
     number_of_reading : int
@@ -45,10 +99,60 @@ class PulsedProgramming:
 
     max_pulse : int
         The max number of pulses.
+
+    pulse_table : PulseResponseTable
+        If not None, the pulses written at once on many memristors of the same parameter model are found by
+        interpolation in this table instead of being simulated. See write_resistance_batch() and PulseResponseTable.
+        It's only queried by lockstep_convergence() (is_lockstep) with at least batch_threshold (16) memristors: a
+        single pulse is faster with the closed form, so write_resistance() doesn't use it.
+
+    chunk_size : int
+        If not None, the voltages targets are split in chunks of chunk_size voltages programmed by a pool of processes.
+        See simulate_parallel().
+
+    max_workers : int
+        Number of processes used by simulate_parallel(). If None, the number of processors.
+
+    seed : int
+        Seed of the chunks of simulate_parallel(). If None, it's drawn from rng.
+
+    rng : np.random.Generator
+        Generator of variability_write. If None, the global np.random is used. See HelperFunction.random_generator().
+
+    is_lockstep : bool
+        If true, the memristors of the circuit are programmed together with lockstep_convergence() instead of one after
+        the other.
+
+    trace_level : string
+        What the convergences record. 'off': nothing. 'summary': only trace_summary. 'sampled': trace_summary and one
+        pulse out of trace_sampling of the memristor plot_memristor, plus the pulses finishing a convergence, in
+        graph_resistance and graph_voltages. 'full': trace_summary and every pulse of the memristor plot_memristor.
+        Bulk runs should use 'off' or 'summary', so no pulse is recorded.
+
+    trace_sampling : int
+        With trace_level 'sampled', one pulse out of trace_sampling is recorded.
+
+    result : ProgrammingResult
+        The voltage output reached, the resistance read and the number of pulses for each voltage target programmed.
+
+    voltage_output : dict
+        dict with keys as voltage output and package as list of resistance read. Built from result when accessed.
+
+    number_of_pulse : int
+        The number of writing pulses applied since the creation.
+
+    trace_summary : list
+        One [target_res, number_of_pulse, error, time] per convergence, with error the final resistance minus
+        target_res (Ohm) and time the duration (s). Empty if trace_level is 'off'.
     """
 
     def __init__(self, memristor_simulation, pulse_algorithm='fabien', max_voltage=0, tolerance=0, is_relative_tolerance=False,
-                 variance_write=0, number_of_reading=1, max_pulse=20000, verbose=False, plot_memristor=0):
+                 variance_write=0, number_of_reading=1, max_pulse=20000, verbose=False, plot_memristor=0, pulse_table=None,
+                 chunk_size=None, max_workers=None, seed=None, is_lockstep=False,
+                 rng=None, variability_block_size=1000, trace_level='full', trace_sampling=10):
+        if trace_level not in ('off', 'summary', 'sampled', 'full'):
+            raise Exception(f'PulsedProgramming trace_level \'{trace_level}\' not supported. '
+                            f'Use \'off\', \'summary\', \'sampled\' or \'full\'.')
         self.memristor_simulation = memristor_simulation
         self.pulse_algorithm = pulse_algorithm
         self.tolerance = tolerance
@@ -58,14 +162,56 @@ class PulsedProgramming:
         self.number_of_reading = number_of_reading
         self.max_pulse = max_pulse
         self.verbose = verbose
-        self.voltage_output = {}
+        self.result = ProgrammingResult()
+        self.number_of_pulse = 0
         self.plot_memristor = plot_memristor
-
+        self.pulse_table = pulse_table
+        self.chunk_size = chunk_size
+        self.max_workers = max_workers
+        self.seed = seed
+        self.is_lockstep = is_lockstep
+        self.rng = random_generator(rng)
+        if pulse_table is not None and (not is_lockstep or memristor_simulation.circuit.number_of_memristor < 16):
+            print('Warning: PulsedProgramming pulse_table is never queried without is_lockstep and at least 16 '
+                  'memristors.')
+
+        self.variability_block_size = variability_block_size
         self.index_variability = 0
-        self.variability_write = np.random.normal(0, variance_write, 1000)
+        self.variability_write = (np.random if self.rng is None else self.rng).normal(0, variance_write,
+                                                                                        variability_block_size)
 
-        self.graph_resistance = []
-        self.graph_voltages = []
+        self.graph_resistance = PulseTrace(has_finish=True)
+        self.graph_voltages = PulseTrace(has_finish=False)
+
+        self.trace_level = trace_level
+        self.trace_sampling = trace_sampling
+        self.trace_summary = []
+
+    @property
+    def voltage_output(self):
+        """
+        The dict with keys as voltage output and package as list of resistance read, built from result when accessed.
+        """
+        return self.result.voltage_output
+
+    def __setstate__(self, state):
+        # The results were the dict voltage_output before ProgrammingResult
+        if 'voltage_output' in state:
+            state = dict(state)
+            state['result'] = ProgrammingResult.from_voltage_output(state.pop('voltage_output'))
+        state.setdefault('number_of_pulse', 0)
+        self.__dict__.update(state)
+        # Saved before the trace levels, when every pulse was recorded
+        self.__dict__.setdefault('trace_level', 'full')
+        self.__dict__.setdefault('trace_sampling', 10)
+        self.__dict__.setdefault('trace_summary', [])
+        # The graphs were lists of [value, index, action, is_finish] before PulseTrace
+        for name, has_finish in [('graph_resistance', True), ('graph_voltages', False)]:
+            if isinstance(self.__dict__.get(name), list):
+                trace = PulseTrace(has_finish=has_finish)
+                for entry in self.__dict__[name]:
+                    trace.append(entry)
+                self.__dict__[name] = trace
 
     def print(self):
         print(self.pulse_algorithm)
@@ -98,13 +244,244 @@ class PulsedProgramming:
         Returns
         ----------
         """
+        # A single pulse is faster with the closed form than with a query of pulse_table
         t = int(t_pulse / memristor.time_series_resolution)
-        signal = [voltage] * t
-        memristor.simulate(signal)
+        memristor.simulate_pulse(voltage, t)
+        self.number_of_pulse += 1
 
-        self.index_variability = self.index_variability + 1 if self.index_variability < len(self.variability_write) - 1 else 0
+        self.index_variability += 1
+        if self.index_variability >= len(self.variability_write):
+            self.refill_variability_write()
         memristor.g = 1 / (1 / memristor.g + (1 / memristor.g) * self.variability_write[self.index_variability])
 
+    def refill_variability_write(self):
+        """
+        This function replaces variability_write with a new block of samples, the next one to use being the first.
+        Without variance_write, the block of zeros is kept instead of drawing a new one.
+        """
+        if self.variance_write != 0:
+            self.variability_write = (np.random if self.rng is None else self.rng).normal(0, self.variance_write,
+                                                                                            self.variability_block_size)
+        self.index_variability = 0
+
+    def draw_variability_write(self, number):
+        """
+        This function takes the next number samples of the write variability, like number calls to write_resistance()
+        would, refilling variability_write as needed.
+
+        Parameters
+        ----------
+        number : int
+            The number of samples.
+
+        Returns
+        ----------
+        variability : np.ndarray
+            The samples. Shape (number,).
+        """
+        variability = np.empty(number)
+        done = 0
+        while done < number:
+            if self.index_variability + 1 >= len(self.variability_write):
+                self.refill_variability_write()
+                variability[done] = self.variability_write[0]
+                done += 1
+                continue
+            taken = min(number - done, len(self.variability_write) - 1 - self.index_variability)
+            variability[done:done + taken] = self.variability_write[self.index_variability + 1:
+                                                                    self.index_variability + 1 + taken]
+            self.index_variability += taken
+            done += taken
+        return variability
+
+    def write_resistance_batch(self, memristors, conductance, voltage, t_pulse, parameters, batch_threshold=16):
+        """
+        Same as write_resistance() for many memristors at once, in the order of memristors. Below batch_threshold
+        memristors, write_resistance() is faster than the overhead of pulse_batch() and is used instead.
+
+        Parameters
+        ----------
+        memristors : list of Memristor
+            The memristors wrote.
+
+        conductance : np.ndarray
+            The conductance (S) of the memristors.
+
+        voltage : np.ndarray
+            The voltage (V) applied on each memristor.
+
+        t_pulse : float
+            The time of the writing pulse. (s)
+
+        parameters : dict
+            The parameters of the memristors, see stack_parameters(). Not used below batch_threshold memristors.
+
+        batch_threshold : int
+            Minimum number of memristors written with pulse_batch().
+
+        Returns
+        ----------
+        conductance : np.ndarray
+            The conductance (S) of the memristors after the pulse.
+        """
+        g = np.array(conductance, dtype=float)
+        if len(g) < batch_threshold:
+            for i, memristor in enumerate(memristors):
+                memristor.g = g[i]
+                self.write_resistance(memristor, voltage[i], t_pulse)
+                g[i] = memristor.g
+            return g
+        is_table = np.zeros(len(g), dtype=bool)
+        if self.pulse_table is not None:
+            is_table = np.array([getattr(memristor, 'parameter_model', None) == self.pulse_table.parameter_model
+                                 for memristor in memristors], dtype=bool)
+            if np.any(is_table):
+                g[is_table] = 1 / self.pulse_table.query(1 / g[is_table], voltage[is_table], t_pulse)
+        number_step = (t_pulse / parameters['time_series_resolution']).astype(int)
+        for t in np.unique(number_step[~is_table]):
+            is_pulse = ~is_table & (number_step == t)
+            g[is_pulse] = pulse_batch(g[is_pulse], voltage[is_pulse], t, {k: v[is_pulse] for k, v in parameters.items()})
+        self.number_of_pulse += len(g)
+
+        return 1 / (1 / g + (1 / g) * self.draw_variability_write(len(g)))
+
+    def lockstep_convergence(self, memristors, list_resistance, plot_index=None, batch_threshold=16):
+        """
+        This function runs fabien_convergence() or log_convergence(), according to pulse_algorithm, on all the
+        memristors at once. Each iteration reads, compares and writes every memristor not done yet with array
+        operations, so many memristors (of one or many circuits) cost about the same as one. The memristors are read
+        and written in an other order than one after the other, so the noise differs from simulate_list_memristor().
+
+        Parameters
+        ----------
+        memristors : list of Memristor
+            The memristors programmed.
+
+        list_resistance : list
+            list of the wanted resistance for the memristors.
+
+        plot_index : int
+            Index of the memristor added to graph_resistance and graph_voltages, according to trace_level. If None, none
+            is.
+
+        batch_threshold : int
+            Minimum number of memristors written with pulse_batch(), see write_resistance_batch().
+        """
+        start_time = time.time()
+        if self.trace_level not in ('sampled', 'full'):
+            plot_index = None
+        sampling = self.trace_sampling if self.trace_level == 'sampled' else 1
+        memristors = list(memristors)
+        target_res = np.array(list_resistance, dtype=float)
+        if self.is_relative_tolerance:
+            res_max = target_res + self.tolerance * target_res / 100
+            res_min = target_res - self.tolerance * target_res / 100
+        else:
+            res_max = target_res + self.tolerance
+            res_min = target_res - self.tolerance
+        parameters = stack_parameters(memristors)
+        is_variability_on = np.array([memristor.is_variability_on for memristor in memristors], dtype=bool)
+        g = np.array([memristor.g for memristor in memristors], dtype=float)
+
+        def parameters_write(index):
+            # Only sliced when pulse_batch() is used, see write_resistance_batch()
+            return {k: v[index] for k, v in parameters.items()} if len(index) >= batch_threshold else None
+
+        # The models without the noise buffer, like the former Data_Driven, don't have noise_buffer_size
+        is_global_random = all(getattr(memristor, 'rng', None) is None
+                               and not getattr(memristor, 'noise_buffer_size', 0) for memristor in memristors)
+
+        def read(index):
+            if not is_global_random:
+                for i in index:
+                    memristors[i].g = g[i]
+                return read_memristors([memristors[i] for i in index])
+            variability = {name: parameters[name][index] for name in ['variability_a', 'variability_b']}
+            return read_batch(1 / g[index], variability, is_variability_on[index])
+
+        is_log = self.pulse_algorithm == 'log'
+        step = 0.005
+        voltage_set = 0.5
+        voltage_reset = -0.5
+        # additional parameters of log_convergence()
+        min_shift = 0.005 * (parameters['r_off'] - parameters['r_on'])
+        max_shift = 0.2 * (parameters['r_off'] - parameters['r_on'])
+        a = 0.1
+
+        positive_voltage = np.full(len(g), voltage_set)
+        negative_voltage = np.full(len(g), voltage_reset)
+        counter = np.zeros(len(g), dtype=int)
+        counter_read = np.zeros(len(g), dtype=int)
+        r_shift = np.ones(len(g))
+        start_index = self.graph_resistance.next_index
+
+        active = np.arange(len(g))
+        current_res = read(active) if is_log else None
+        while len(active):
+            if not is_log:
+                current_res = read(active)
+            if is_log:
+                # Strict, like log_convergence()
+                is_read = (res_min[active] < current_res) & (current_res < res_max[active])
+            else:
+                is_read = (res_min[active] <= current_res) & (current_res <= res_max[active])
+            is_reset = ~is_read & (current_res < res_min[active])
+            is_set = ~is_read & (current_res > res_max[active])
+            counter_read[active[is_read]] += 1
+            reset, set_ = active[is_reset], active[is_set]
+
+            if is_log:
+                shift = r_shift[active]
+                delta = np.abs(target_res[active] - current_res) / shift
+                is_small = shift < min_shift[active]
+                is_large = ~is_small & (shift > max_shift[active])
+                with np.errstate(divide='ignore'):
+                    positive_voltage[active[is_set & is_small]] += a * np.log10(delta[is_set & is_small])
+                    negative_voltage[active[is_reset & is_small]] -= a * np.log10(delta[is_reset & is_small])
+                positive_voltage[active[is_set & is_large]] = voltage_set
+                negative_voltage[active[is_reset & is_large]] = voltage_reset
+            if self.max_voltage != 0:
+                positive_voltage[set_] = np.minimum(positive_voltage[set_], self.max_voltage)
+                negative_voltage[reset] = np.maximum(negative_voltage[reset], -self.max_voltage)
+
+            is_write = is_reset | is_set
+            write = active[is_write]
+            voltage = np.where(is_reset, negative_voltage[active], positive_voltage[active])
+            g[write] = self.write_resistance_batch([memristors[i] for i in write], g[write], voltage[is_write], 200e-9,
+                                                   parameters_write(write), batch_threshold)
+            if not is_log:
+                negative_voltage[reset] -= step
+                positive_voltage[reset] = voltage_set
+                positive_voltage[set_] += step
+                negative_voltage[set_] = voltage_reset
+
+            is_finish = (counter_read[active] == self.number_of_reading) | (counter[active] >= self.max_pulse)
+            if np.any(counter[active] >= self.max_pulse):
+                print('Got max pulse')
+            if plot_index is not None and plot_index in active:
+                i = np.searchsorted(active, plot_index)
+                action = 'reset' if is_reset[i] else 'set' if is_set[i] else 'read'
+                if counter[plot_index] % sampling == 0 or is_finish[i]:
+                    self.graph_voltages.record(0.2 if is_read[i] else voltage[i], counter[plot_index] + start_index,
+                                               action)
+                    self.graph_resistance.record(current_res[i], counter[plot_index] + start_index, action,
+                                                 bool(is_finish[i]))
+            counter[active] += 1
+
+            if is_log:
+                previous_res = current_res
+                current_res = read(active)
+                r_shift[active] = np.where(current_res != previous_res, np.abs(current_res - previous_res), 1)
+                current_res = current_res[~is_finish]
+            active = active[~is_finish]
+
+        for memristor, g_ in zip(memristors, g):
+            memristor.g = g_
+        if self.trace_level != 'off':
+            duration = time.time() - start_time
+            self.trace_summary += [[float(target_res[i]), int(counter[i]), float(1 / g[i] - target_res[i]), duration]
+                                   for i in range(len(g))]
+
     def find_number_iteration(self):
         """
         This function find the number of iteration needed to create the resistance list depending on the distribution type
@@ -130,9 +507,17 @@ class PulsedProgramming:
 
         precision : list
             [[macro_tune, is_relative_variability], [fine_tune, is_relative_variability]] for the balance() method.
+
+        Returns
+        ----------
+        result : ProgrammingResult
+            The voltage output reached and the resistance read for each voltage target. The dict voltage_output is built
+            from it.
         """
         if self.pulse_algorithm != 'fabien' and self.pulse_algorithm != 'log':
             raise(Exception(f'Pulse algorithm not supported: {self.pulse_algorithm}'))
+        if self.chunk_size is not None:
+            return self.simulate_parallel(voltages_target, precision)
         # voltages_target_list = list(voltages_target.keys())
         # resolution = voltages_target_list[1] - voltages_target_list[0]
         index = 1
@@ -142,9 +527,14 @@ class PulsedProgramming:
         for v in list(voltages_target.keys()):
             if index == 1:
                 start_time_ = time.time()
+            number_of_pulse = self.number_of_pulse
             self.simulate_list_memristor(voltages_target[v], precision)
-            self.voltage_output[self.memristor_simulation.circuit.current_v_out()] = [i.read() for i in self.memristor_simulation.circuit.list_memristor]
-            diff_voltage[abs(v - self.memristor_simulation.circuit.current_v_out())] = [round(1 / np.sum([1/res for res in voltages_target[v]]), 4), round(1 / self.memristor_simulation.circuit.current_conductance(), 4)]
+            # The voltage output of the resistances read, so both are of the same reading
+            resistances = read_memristors(self.memristor_simulation.circuit.list_memristor)
+            conductance = np.sum(1 / resistances)
+            v_out = self.memristor_simulation.circuit.calculate_voltage(conductance)
+            self.result.record(v, v_out, resistances, self.number_of_pulse - number_of_pulse)
+            diff_voltage[abs(v - v_out)] = [round(1 / np.sum([1/res for res in voltages_target[v]]), 4), round(1 / conductance, 4)]
             if index == 50 and self.verbose:
                 conf_done += index
                 print(f'Conf done: {conf_done}\tTook: {round(time.time() - start_time_, 2)} s\tTime left: {round((time.time() - start_time_) * (len(voltages_target.keys()) - conf_done) / 50, 2)} s')
@@ -161,7 +551,69 @@ class PulsedProgramming:
             print(f'Mean diff: {np.mean(list(diff_voltage.keys()))}')
             print(f'Min diff: {np.min(list(diff_voltage.keys()))}\tMax diff: {np.max(list(diff_voltage.keys()))}')
 
-        return self.voltage_output
+        return self.result
+
+    def simulate_parallel(self, voltages_target, precision=None):
+        """
+        This function splits voltages_target in chunks of chunk_size voltages, in order, and programs them with a pool of
+        max_workers processes. Each chunk starts from the current state of the circuit, on its own copy, with np.random
+        and the generators seeded from self.seed and the index of the chunk (see program_chunk()). So the result doesn't
+        depend on the number of processes.
+        The chunks are merged in order: result as if the chunks were done one after the other, and the counters
+        of graph_resistance and graph_voltages follow each other. The circuit is left as the last chunk left it.
+
+        Parameters
+        ----------
+        voltages_target : dict
+            dict with keys as voltage and package as list of resistance
+
+        precision : list
+            [[macro_tune, is_relative_variability], [fine_tune, is_relative_variability]] for the balance() method.
+
+        Returns
+        ----------
+        result : ProgrammingResult
+            The voltage output reached and the resistance read for each voltage target.
+        """
+        start_time = time.time()
+        targets = list(voltages_target.items())
+        chunks = [dict(targets[i:i + self.chunk_size]) for i in range(0, len(targets), self.chunk_size)]
+        if self.seed is not None:
+            entropy = self.seed
+        else:
+            entropy = int(np.random.randint(2 ** 32) if self.rng is None else self.rng.integers(2 ** 32))
+        seeds = np.random.SeedSequence(entropy).spawn(len(chunks))
+
+        # Only the circuit of the memristor simulation is used while programming
+        worker = copy.copy(self)
+        worker.memristor_simulation = SimpleNamespace(circuit=self.memristor_simulation.circuit)
+        worker.chunk_size = None
+        worker.verbose = False
+        worker.result = ProgrammingResult()
+        worker.graph_resistance = PulseTrace(has_finish=True)
+        worker.graph_voltages = PulseTrace(has_finish=False)
+        worker.trace_summary = []
+
+        with ProcessPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = [executor.submit(program_chunk, worker, chunk, precision, seed) for chunk, seed in zip(chunks, seeds)]
+            for index, future in enumerate(futures):
+                result, graph_resistance, graph_voltages, trace_summary, conductances = future.result()
+                self.result.extend(result)
+                self.number_of_pulse += int(np.sum(result.number_of_pulse))
+                index_offset = self.graph_resistance.next_index
+                self.graph_resistance.extend(graph_resistance, index_offset=index_offset)
+                self.graph_voltages.extend(graph_voltages, index_offset=index_offset)
+                self.trace_summary += trace_summary
+                if self.verbose:
+                    print(f'Chunk done: {index + 1}/{len(chunks)}\tTook: {round(time.time() - start_time, 2)} s')
+
+        if chunks:
+            for memristor, g in zip(self.memristor_simulation.circuit.list_memristor, conductances):
+                memristor.g = g
+        if self.verbose:
+            print(f'Total time: {time.time() - start_time}')
+            print()
+        return self.result
 
     def simulate_list_memristor(self, list_resistance, precision):
         """
@@ -175,6 +627,11 @@ class PulsedProgramming:
         precision : list
             [[macro_tune, is_relative_variability], [fine_tune, is_relative_variability]] for the balance() method.
         """
+        if self.is_lockstep:
+            self.lockstep_convergence(self.memristor_simulation.circuit.list_memristor, list_resistance,
+                                      plot_index=self.plot_memristor)
+            self.balance(list_resistance, precision)
+            return
         for i in range(self.memristor_simulation.circuit.number_of_memristor):
             plot = True if i == self.plot_memristor else False
             if self.pulse_algorithm == 'fabien':
@@ -197,7 +654,8 @@ class PulsedProgramming:
             won't do it.
         """
         final_g = np.sum([1 / i for i in list_resistance])
-        delta_g = final_g - self.memristor_simulation.circuit.current_conductance()
+        # The running conductance of the circuit, instead of reading every memristor
+        delta_g = final_g - self.memristor_simulation.circuit.running_conductance()
         for i in range(self.memristor_simulation.circuit.number_of_memristor):
             plot = True if -(i+1) == self.plot_memristor else False
             final_res = 1 / (self.memristor_simulation.circuit.list_memristor[-(i+1)].g + delta_g)
@@ -241,37 +699,41 @@ class PulsedProgramming:
             res_max = target_res + self.tolerance
             res_min = target_res - self.tolerance
 
-        start_len_res = len(self.graph_resistance)
-        start_len_v = len(self.graph_voltages)
+        # The pulses follow the last one recorded, whatever the trace_level of the previous ones
+        start_index = self.graph_resistance.next_index
         counter = 0
         action = 'read'
+        voltage = 0.2
         flag_finish = False
         counter_read = 0
+        is_traced = plot and self.trace_level in ('sampled', 'full')
+        sampling = self.trace_sampling if self.trace_level == 'sampled' else 1
+        start_time = time.time()
 
         while not flag_finish:
             current_res = memristor.read()
 
             if res_min <= current_res <= res_max:
                 counter_read += 1
-                if plot:
+                if is_traced:
                     action = 'read'
-                    self.graph_voltages.append([0.2, counter + start_len_v, action])
+                    voltage = 0.2
             elif current_res < res_min:
                 if self.max_voltage != 0:
                     negative_voltage = -self.max_voltage if negative_voltage <= -self.max_voltage else negative_voltage
                 self.write_resistance(memristor, negative_voltage, 200e-9)
-                if plot:
+                if is_traced:
                     action = 'reset'
-                    self.graph_voltages.append([negative_voltage, counter + start_len_v, action])
+                    voltage = negative_voltage
                 negative_voltage -= step
                 positive_voltage = voltage_set
             elif current_res > res_max:
                 if self.max_voltage != 0:
                     positive_voltage = self.max_voltage if positive_voltage >= self.max_voltage else positive_voltage
                 self.write_resistance(memristor, positive_voltage, 200e-9)
-                if plot:
+                if is_traced:
                     action = 'set'
-                    self.graph_voltages.append([positive_voltage, counter + start_len_v, action])
+                    voltage = positive_voltage
                 positive_voltage += step
                 negative_voltage = voltage_reset
 
@@ -280,10 +742,15 @@ class PulsedProgramming:
             if counter >= self.max_pulse:
                 flag_finish = not flag_finish
                 print(f'Got max pulse {self.max_pulse}')
-            if plot:
-                self.graph_resistance.append([current_res, counter + start_len_res, action, flag_finish])
+            if is_traced and (counter % sampling == 0 or flag_finish):
+                self.graph_voltages.record(voltage, counter + start_index, action)
+                self.graph_resistance.record(current_res, counter + start_index, action, flag_finish)
             counter += 1
 
+        if self.trace_level != 'off':
+            self.trace_summary.append([float(target_res), counter, float(1 / memristor.g - target_res),
+                                       time.time() - start_time])
+
     def log_convergence(self, memristor, target_res, plot=False):
         """
         This function run the pulsed programming with a variable voltage to set the target_res for the memristor.
@@ -311,21 +778,25 @@ class PulsedProgramming:
             res_max = target_res + self.tolerance
             res_min = target_res - self.tolerance
 
-        start_len_res = len(self.graph_resistance)
-        start_len_v = len(self.graph_voltages)
+        # The pulses follow the last one recorded, whatever the trace_level of the previous ones
+        start_index = self.graph_resistance.next_index
         counter = 0
         action = 'read'
+        voltage = 0.2
         flag_finish = False
         counter_read = 0
+        is_traced = plot and self.trace_level in ('sampled', 'full')
+        sampling = self.trace_sampling if self.trace_level == 'sampled' else 1
+        start_time = time.time()
 
         r_shift = 1
         current_res = memristor.read()
         while not flag_finish:
             if res_min < current_res < res_max:
                 counter_read += 1
-                if plot:
+                if is_traced:
                     action = 'read'
-                    self.graph_voltages.append([0.2, counter + start_len_v, action])
+                    voltage = 0.2
 
             elif current_res > res_max:
                 if r_shift < min_shift * (memristor.r_off - memristor.r_on):
@@ -335,9 +806,9 @@ class PulsedProgramming:
                 if self.max_voltage != 0:
                     positive_voltage = self.max_voltage if positive_voltage >= self.max_voltage else positive_voltage
                 self.write_resistance(memristor, positive_voltage, 200e-9)
-                if plot:
+                if is_traced:
                     action = 'set'
-                    self.graph_voltages.append([positive_voltage, counter + start_len_v, action])
+                    voltage = positive_voltage
 
             elif current_res < res_min:
                 if r_shift < min_shift * (memristor.r_off - memristor.r_on):
@@ -347,9 +818,9 @@ class PulsedProgramming:
                 if self.max_voltage != 0:
                     negative_voltage = -self.max_voltage if negative_voltage <= -self.max_voltage else negative_voltage
                 self.write_resistance(memristor, negative_voltage, 200e-9)
-                if plot:
+                if is_traced:
                     action = 'reset'
-                    self.graph_voltages.append([negative_voltage, counter + start_len_v, action])
+                    voltage = negative_voltage
 
             if counter_read == self.number_of_reading:
                 flag_finish = not flag_finish
@@ -357,14 +828,19 @@ class PulsedProgramming:
                 flag_finish = not flag_finish
                 print('Got max pulse')
 
-            if plot:
-                self.graph_resistance.append([current_res, counter + start_len_res, action, flag_finish])
+            if is_traced and (counter % sampling == 0 or flag_finish):
+                self.graph_voltages.record(voltage, counter + start_index, action)
+                self.graph_resistance.record(current_res, counter + start_index, action, flag_finish)
             counter += 1
 
             previous_res = current_res
             current_res = memristor.read()
             r_shift = abs(current_res - previous_res) if abs(current_res - previous_res) != 0 else 1
 
+        if self.trace_level != 'off':
+            self.trace_summary.append([float(target_res), counter, float(1 / memristor.g - target_res),
+                                       time.time() - start_time])
+
     def fabien_convergence(self, memristor, target_res, plot=False):
         """
         This function run the pulsed programming with a variable voltage to set the target_res for the memristor.
@@ -388,37 +864,41 @@ class PulsedProgramming:
             res_max = target_res + self.tolerance
             res_min = target_res - self.tolerance
 
-        start_len_res = len(self.graph_resistance)
-        start_len_v = len(self.graph_voltages)
+        # The pulses follow the last one recorded, whatever the trace_level of the previous ones
+        start_index = self.graph_resistance.next_index
         counter = 0
         action = 'read'
+        voltage = 0.2
         flag_finish = False
         counter_read = 0
+        is_traced = plot and self.trace_level in ('sampled', 'full')
+        sampling = self.trace_sampling if self.trace_level == 'sampled' else 1
+        start_time = time.time()
 
         while not flag_finish:
             current_res = memristor.read()
 
             if res_min <= current_res <= res_max:
                 counter_read += 1
-                if plot:
+                if is_traced:
                     action = 'read'
-                    self.graph_voltages.append([0.2, counter + start_len_v, action])
+                    voltage = 0.2
             elif current_res < res_min:
                 if self.max_voltage != 0:
                     negative_voltage = -self.max_voltage if negative_voltage <= -self.max_voltage else negative_voltage
                 self.write_resistance(memristor, negative_voltage, 200e-9)
-                if plot:
+                if is_traced:
                     action = 'reset'
-                    self.graph_voltages.append([negative_voltage, counter + start_len_v, action])
+                    voltage = negative_voltage
                 negative_voltage -= step
                 positive_voltage = voltage_set
             elif current_res > res_max:
                 if self.max_voltage != 0:
                     positive_voltage = self.max_voltage if positive_voltage >= self.max_voltage  else positive_voltage
                 self.write_resistance(memristor, positive_voltage, 200e-9)
-                if plot:
+                if is_traced:
                     action = 'set'
-                    self.graph_voltages.append([positive_voltage, counter + start_len_v, action])
+                    voltage = positive_voltage
                 positive_voltage += step
                 negative_voltage = voltage_reset
 
@@ -427,7 +907,12 @@ class PulsedProgramming:
             if counter >= self.max_pulse:
                 flag_finish = not flag_finish
                 print('Got max pulse')
-            if plot:
-                self.graph_resistance.append([current_res, counter + start_len_res, action, flag_finish])
+            if is_traced and (counter % sampling == 0 or flag_finish):
+                self.graph_voltages.record(voltage, counter + start_index, action)
+                self.graph_resistance.record(current_res, counter + start_index, action, flag_finish)
                 # print(f'{self.graph_resistance[-1]}\t{self.graph_voltages[-1]}')
             counter += 1
+
+        if self.trace_level != 'off':
+            self.trace_summary.append([float(target_res), counter, float(1 / memristor.g - target_res),
+                                       time.time() - start_time])
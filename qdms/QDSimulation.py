@@ -1,7 +1,61 @@
+import math
+import os
 import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import shared_memory
 from .coulomb_blockade import *
 
 
+def simulate_tile(index, voltages_x, voltages_y, position, shape, parameters, output_name=None, output_path=None):
+    """
+    This function computes one tile of the stability diagram in a worker process and writes it in the shared output,
+    either the shared memory block output_name or the .npy file output_path.
+
+    Parameters
+    ----------
+    index : int
+        Index of the tile, returned when the tile is written.
+
+    voltages_x, voltages_y : Iterable[float]
+        Voltages of the tile.
+
+    position : tuple[int, int]
+        Row and column of the first voltage of the tile in the stability diagram.
+
+    shape : tuple[int, int]
+        Shape of the whole stability diagram.
+
+    parameters : dict
+        Keyword arguments of N_moy_DQD().
+
+    output_name : str
+        Name of the shared memory block of the stability diagram.
+
+    output_path : str
+        Path of the .npy file of the stability diagram.
+
+    Returns
+    ----------
+    index : int
+        Index of the tile.
+    """
+    x, y = np.meshgrid(voltages_x, voltages_y)
+    tile = N_moy_DQD(x, y, **parameters)
+    row, column = position
+    if output_path is not None:
+        output = np.load(output_path, mmap_mode='r+')
+        output[row:row + tile.shape[0], column:column + tile.shape[1]] = tile
+        output.flush()
+        del output
+    else:
+        block = shared_memory.SharedMemory(name=output_name)
+        output = np.ndarray(shape, dtype=float, buffer=block.buf)
+        output[row:row + tile.shape[0], column:column + tile.shape[1]] = tile
+        del output
+        block.close()
+    return index
+
+
 class QDSimulation:
     """
     This class contains all the parameters for the quantum dot simulation using coulomb_blockade.py.
@@ -46,18 +100,36 @@ class QDSimulation:
     T : float
         Temperature (K)
 
-    N_max : int
-        Maximum number of electron
+    N_min, N_max : int
+        Minimum and maximum number of electron in a dot. See find_number_electron().
 
     Cm : float
         Ratio of the cross capacitance.
 
+    window : int
+        If not None, only the charge states at most window electrons away from the ground state are summed. See
+        N_moy_DQD().
+
+    tile_size : int
+        If not None, the stability diagram is split in tiles of tile_size x tile_size voltages computed by a pool of
+        processes. See simulate_tiles().
+
+    max_workers : int
+        Number of processes used by simulate_tiles(). If None, the number of processors.
+
+    transitions : np.ndarray
+        Voltages (x, y) of the centers of the cells crossed by a charge transition, found by simulate_adaptive().
+
+    evaluations : int
+        Number of voltages evaluated by simulate_adaptive().
+
     verbose : bool
         If true, output in console of time.
 
     """
 
-    def __init__(self, voltages_x, voltages_y, T=0.1, Cm=0.4, parameter_model='UNSW', verbose=True):
+    def __init__(self, voltages_x, voltages_y, T=0.1, Cm=0.4, parameter_model='UNSW', window=None, tile_size=None,
+                 max_workers=None, verbose=True):
         self.stability_diagram = [[None for _ in range(len(voltages_x))] for _ in range(len(voltages_y))]
         self.voltages_x = voltages_x
         self.voltages_y = voltages_y
@@ -73,8 +145,23 @@ class QDSimulation:
         self.Cm = Cm
         self.kB = 1.381e-23
         self.N_min, self.N_max = self.find_number_electron()
+        self.window = window
+        self.tile_size = tile_size
+        self.max_workers = max_workers
+        self.transitions = None
+        self.evaluations = 0
         self.verbose = verbose
 
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        # Saved before the tiles, when the whole diagram was computed at once
+        self.__dict__.setdefault('window', None)
+        self.__dict__.setdefault('tile_size', None)
+        self.__dict__.setdefault('max_workers', None)
+        # Saved before simulate_adaptive()
+        self.__dict__.setdefault('transitions', None)
+        self.__dict__.setdefault('evaluations', 0)
+
     def print(self):
         print(np.array(self.stability_diagram))
         print(np.array(self.voltages_x))
@@ -124,13 +211,15 @@ class QDSimulation:
         else:
             raise Exception(f'Parameter model {self.parameter_model} not supported.')
 
-    def simulate(self):
+    def simulate(self, path=None):
         """
         Function to simulate the number of electron depending on the voltages.
         The output is stored in self.stability_diagram
 
         Parameters
         ----------
+        path : str
+            Only used with tile_size. See simulate_tiles().
 
         Returns
         ----------
@@ -141,29 +230,223 @@ class QDSimulation:
             print("##########################")
             print(f"Start QD simulation with {len(self.voltages_x)} voltages and {self.N_max} electrons")
 
+        if self.tile_size is not None:
+            self.simulate_tiles(path)
+            return
+
         x, y = np.meshgrid(self.voltages_x, self.voltages_y)
-        self.stability_diagram = N_moy_DQD(x, y, Cg1=self.Cg1, Cg2=self.Cg2, Cm=self.Cm * (self.Cg1+self.Cg2)/2,
-                                            CL=self.CL, CR=self.CR, N_min=self.N_min, N_max=self.N_max,
-                                            kBT=2 * self.kB * self.T, e=1.602e-19, verbose=self.verbose)
+        self.stability_diagram = N_moy_DQD(x, y, verbose=self.verbose, **self.parameters())
 
-    def find_number_electron(self):
-        if self.parameter_model == 'UNSW'.lower():
-            return int(min(self.voltages_x) * 65), int(max(self.voltages_x) * 65)
+    def simulate_adaptive(self, step=16, tolerance=0.05, is_dense=True):
+        """
+        This function samples the stability diagram with a quadtree. A coarse grid with a voltage every step voltages is
+        computed, then the cells whose corners differ by more than tolerance are split in four, until the cells are one
+        voltage wide. The flat cells are on a charge plateau: their voltages are interpolated from the corners instead
+        of being computed. The step must be smaller than the smallest plateau, or it could be missed.
+        The centers of the smallest cells crossed by a transition are stored in self.transitions.
 
-        elif self.parameter_model == 'QuTech'.lower():
-            return int(min(self.voltages_x) * 30), int(max(self.voltages_x) * 35)
+        Parameters
+        ----------
+        step : int
+            Number of voltages between two voltages of the coarse grid.
 
-        elif self.parameter_model == 'Princeton'.lower():
-            return int(min(self.voltages_x) * 155), int(max(self.voltages_x) * 155)
+        tolerance : float
+            Maximum difference between the corners of a flat cell.
 
-        elif self.parameter_model == 'Sandia_national_lab'.lower():
-            return int(min(self.voltages_x) * 10), int(max(self.voltages_x) * 15)
+        is_dense : bool
+            If true, the interpolated stability diagram is stored in self.stability_diagram. Otherwise, only the
+            transitions are kept.
 
-        elif self.parameter_model == 'CEA_LETI'.lower():
-            return int(min(self.voltages_x) * 60), int(max(self.voltages_x) * 125)
+        Returns
+        ----------
 
-        elif self.parameter_model == 'UCL'.lower():
-            return int(min(self.voltages_x) * 1), int(max(self.voltages_x) * 10)
+        """
+        if self.verbose:
+            start = time.time()
+        voltages_x = np.asarray(self.voltages_x, dtype=float)
+        voltages_y = np.asarray(self.voltages_y, dtype=float)
+        shape = (len(voltages_y), len(voltages_x))
+        parameters = self.parameters()
+        diagram = np.full(shape, np.nan)
+        self.evaluations = 0
+
+        def evaluate(rows, columns):
+            index = np.unique(np.ravel_multi_index((rows.ravel(), columns.ravel()), shape))
+            index = index[np.isnan(diagram.flat[index])]
+            rows, columns = np.unravel_index(index, shape)
+            diagram.flat[index] = N_moy_DQD(voltages_x[columns], voltages_y[rows], **parameters)
+            self.evaluations += len(index)
+
+        def coarse(length):
+            nodes = np.unique(np.append(np.arange(0, length, step), length - 1))
+            return (nodes[:-1], nodes[1:]) if len(nodes) > 1 else (nodes, nodes)
+
+        rows_start, rows_end = coarse(shape[0])
+        columns_start, columns_end = coarse(shape[1])
+        r0, c0 = np.meshgrid(rows_start, columns_start, indexing='ij')
+        r1, c1 = np.meshgrid(rows_end, columns_end, indexing='ij')
+        r0, r1, c0, c1 = r0.ravel(), r1.ravel(), c0.ravel(), c1.ravel()
+        evaluate(np.concatenate([r0, r0, r1, r1]), np.concatenate([c0, c1, c0, c1]))
+
+        flat_cells = []
+        transitions = []
+        while len(r0):
+            corners = np.stack([diagram[r0, c0], diagram[r0, c1], diagram[r1, c0], diagram[r1, c1]])
+            is_transition = np.ptp(corners, axis=0) > tolerance
+            is_split_row = r1 - r0 > 1
+            is_split_column = c1 - c0 > 1
+            is_refined = is_transition & (is_split_row | is_split_column)
+            flat_cells.append((r0[~is_refined], r1[~is_refined], c0[~is_refined], c1[~is_refined]))
+            is_smallest = is_transition & ~is_refined
+            transitions.append(np.stack([(voltages_x[c0[is_smallest]] + voltages_x[c1[is_smallest]]) / 2,
+                                         (voltages_y[r0[is_smallest]] + voltages_y[r1[is_smallest]]) / 2], axis=1))
+
+            r0, r1, c0, c1 = r0[is_refined], r1[is_refined], c0[is_refined], c1[is_refined]
+            is_split_row, is_split_column = is_split_row[is_refined], is_split_column[is_refined]
+            row_middle = np.where(is_split_row, (r0 + r1) // 2, r1)
+            column_middle = np.where(is_split_column, (c0 + c1) // 2, c1)
+            # Children of each cell: the first half and, if the cell is split along the axis, the second half
+            rows = [(r0, row_middle, np.ones_like(is_split_row)), (row_middle, r1, is_split_row)]
+            columns = [(c0, column_middle, np.ones_like(is_split_column)), (column_middle, c1, is_split_column)]
+            children = [(r_start[is_row & is_column], r_end[is_row & is_column],
+                         c_start[is_row & is_column], c_end[is_row & is_column])
+                        for r_start, r_end, is_row in rows for c_start, c_end, is_column in columns]
+            r0, r1, c0, c1 = (np.concatenate(child) for child in zip(*children))
+            evaluate(np.concatenate([r0, r0, r1, r1]), np.concatenate([c0, c1, c0, c1]))
+
+        self.transitions = np.concatenate(transitions)
+        if is_dense:
+            r0, r1, c0, c1 = (np.concatenate(cells) for cells in zip(*flat_cells))
+            # Bilinear interpolation of the flat cells, grouped by size
+            for height, width in set(zip((r1 - r0).tolist(), (c1 - c0).tolist())):
+                is_size = (r1 - r0 == height) & (c1 - c0 == width)
+                top, bottom, left, right = r0[is_size], r1[is_size], c0[is_size], c1[is_size]
+                rows = top[:, np.newaxis, np.newaxis] + np.arange(height + 1)[:, np.newaxis]
+                columns = left[:, np.newaxis, np.newaxis] + np.arange(width + 1)
+                with np.errstate(invalid='ignore', divide='ignore'):
+                    ty = (voltages_y[rows] - voltages_y[top, np.newaxis, np.newaxis]) \
+                        / (voltages_y[bottom] - voltages_y[top])[:, np.newaxis, np.newaxis]
+                    tx = (voltages_x[columns] - voltages_x[left, np.newaxis, np.newaxis]) \
+                        / (voltages_x[right] - voltages_x[left])[:, np.newaxis, np.newaxis]
+                ty = np.nan_to_num(ty)
+                tx = np.nan_to_num(tx)
+                corner = [diagram[top, left], diagram[top, right], diagram[bottom, left], diagram[bottom, right]]
+                corner = [value[:, np.newaxis, np.newaxis] for value in corner]
+                values = (1 - ty) * ((1 - tx) * corner[0] + tx * corner[1]) + ty * ((1 - tx) * corner[2] + tx * corner[3])
+                rows, columns = np.broadcast_arrays(rows, columns)
+                is_missing = np.isnan(diagram[rows, columns])
+                diagram[rows[is_missing], columns[is_missing]] = values[is_missing]
+            self.stability_diagram = diagram
+
+        if self.verbose:
+            print(f'Evaluations: {self.evaluations}/{diagram.size}\tTransitions: {len(self.transitions)}\t'
+                  f'Total time: {time.time() - start}')
 
+    def parameters(self):
+        """
+        This function returns the keyword arguments of N_moy_DQD() for this simulation.
+
+        Returns
+        ----------
+        parameters : dict
+            The keyword arguments of N_moy_DQD().
+        """
+        return dict(Cg1=self.Cg1, Cg2=self.Cg2, Cm=self.Cm * (self.Cg1+self.Cg2)/2, CL=self.CL, CR=self.CR,
+                    N_min=self.N_min, N_max=self.N_max, kBT=2 * self.kB * self.T, e=1.602e-19, window=self.window)
+
+    def simulate_tiles(self, path=None):
+        """
+        This function splits the stability diagram in tiles of tile_size x tile_size voltages and computes them with a
+        pool of max_workers processes. The tiles are written directly in a shared output, so the memory used only
+        depends on the tile size and the number of processes.
+        If path is None, the output is a shared memory block copied in self.stability_diagram at the end. Otherwise,
+        it's the .npy file path, memory mapped in self.stability_diagram, and the finished tiles are kept in the file
+        path + '.tiles.npy'. If both files already exist, only the unfinished tiles are computed, which resumes an
+        interrupted simulation.
+
+        Parameters
+        ----------
+        path : str
+            Path of the .npy file of the stability diagram.
+
+        Returns
+        ----------
+
+        """
+        voltages_x = np.asarray(self.voltages_x, dtype=float)
+        voltages_y = np.asarray(self.voltages_y, dtype=float)
+        shape = (len(voltages_y), len(voltages_x))
+        tiles = [(row, column) for row in range(0, shape[0], self.tile_size)
+                 for column in range(0, shape[1], self.tile_size)]
+
+        block = None
+        if path is not None:
+            tiles_path = f'{path}.tiles.npy'
+            if os.path.exists(path) and os.path.exists(tiles_path):
+                output = np.load(path, mmap_mode='r+')
+                is_done = np.load(tiles_path)
+                if output.shape != shape or len(is_done) != len(tiles):
+                    raise Exception(f'{path} doesn\'t match the voltages and the tile size.')
+            else:
+                output = np.lib.format.open_memmap(path, mode='w+', dtype=float, shape=shape)
+                output.flush()
+                is_done = np.zeros(len(tiles), dtype=bool)
+                np.save(tiles_path, is_done)
         else:
-            raise Exception(f'Parameter model {self.parameter_model} not supported.')
+            block = shared_memory.SharedMemory(create=True, size=max(1, shape[0] * shape[1] * 8))
+            output = np.ndarray(shape, dtype=float, buffer=block.buf)
+            is_done = np.zeros(len(tiles), dtype=bool)
+
+        if self.verbose:
+            print(f'Tiles: {len(tiles)}\tAlready done: {np.count_nonzero(is_done)}')
+            start = time.time()
+        parameters = self.parameters()
+        try:
+            with ProcessPoolExecutor(max_workers=self.max_workers) as executor:
+                futures = [executor.submit(simulate_tile, index, voltages_x[column:column + self.tile_size],
+                                           voltages_y[row:row + self.tile_size], (row, column), shape, parameters,
+                                           output_name=None if block is None else block.name, output_path=path)
+                           for index, (row, column) in enumerate(tiles) if not is_done[index]]
+                for counter, future in enumerate(as_completed(futures)):
+                    is_done[future.result()] = True
+                    if path is not None:
+                        # Replaced atomically, so an interruption never leaves a corrupted list of finished tiles
+                        with open(f'{tiles_path}.tmp', 'wb') as file:
+                            np.save(file, is_done)
+                        os.replace(f'{tiles_path}.tmp', tiles_path)
+                    if self.verbose:
+                        took = time.time() - start
+                        print(f'Done: {counter + 1}\tLeft: {len(futures) - counter - 1}\t'
+                              f'Time Left: {round(took * (len(futures) - counter - 1) / (counter + 1), 2)}s')
+            if block is None:
+                self.stability_diagram = output
+            else:
+                self.stability_diagram = np.array(output)
+        finally:
+            if block is not None:
+                del output
+                block.close()
+                block.unlink()
+
+    def find_number_electron(self):
+        """
+        This function finds the range of number of electron needed by the voltages, from the dimensionless gate charges
+        Ng = Cg * V / e. The ground state is near Ng, and a state with a dot k electrons away from the range of Ng has
+        an energy of at least 0.5 * lambda_min * k ** 2 over it (lambda_min, lambda_max the eigenvalues of the charging
+        energy matrix). The margin k makes the states outside of the range weigh less than exp(-40) relative to the
+        ground state.
+
+        Returns
+        ----------
+        N_min, N_max : int
+            The minimum and maximum number of electron in a dot.
+        """
+        e = 1.602e-19
+        kBT = 2 * self.kB * self.T
+        Ec1, Ec2, Ecm = charging_energy(self.Cg1, self.Cg2, self.Cm * (self.Cg1+self.Cg2)/2, self.CL, self.CR, e=e)
+        lambda_min, lambda_max = np.linalg.eigvalsh([[Ec1, Ecm], [Ecm, Ec2]])
+        # The ground state is at most 0.25 * lambda_max over the minimum of the continuous energy (0 at N = Ng)
+        margin = math.ceil(math.sqrt((2 * 40 * kBT + 0.5 * lambda_max) / lambda_min))
+        Ng = [self.Cg1 * min(self.voltages_x) / e, self.Cg1 * max(self.voltages_x) / e,
+              self.Cg2 * min(self.voltages_y) / e, self.Cg2 * max(self.voltages_y) / e]
+        return max(0, math.floor(min(Ng)) - margin), math.ceil(max(Ng)) + margin
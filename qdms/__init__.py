@@ -2,9 +2,14 @@
 # __all__=['HelperFunction']
 
 from . import HelperFunction
-from .Data_Driven import Data_Driven
+from .Data_Driven import Data_Driven, stack_parameters, simulate_batch, simulate_memristors, pulse_batch, read_memristors, \
+    read_batch
 from .Circuit import Circuit
+from .CircuitArray import CircuitArray, MemristorView
 from .PulsedProgramming import PulsedProgramming
+from .PulseResponseTable import PulseResponseTable
+from .PulseTrace import PulseTrace
+from .ProgrammingResult import ProgrammingResult
 from .MemristorSimulation import MemristorSimulation
 from .QDSimulation import QDSimulation
 from . import Log
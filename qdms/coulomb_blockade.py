@@ -55,6 +55,30 @@ def Ng(Vg, Cg=1, e=1):
     """
     return e*Cg*Vg
 
+def thermal_average(E, X, kBT):
+    """
+    Boltzmann average of X over the states of the first axis, evaluated in the log domain: the energies are shifted by
+    their minimum before the exponential, so the partition function neither overflows nor underflows.
+
+    Parameters
+    ----------
+    E : Array
+        Energy of each state, the states along the first axis.
+    X : Array
+        Value to average for each state, broadcastable with E.
+    kBT : Float
+        Thermal energy.
+
+    Returns
+    -------
+    Float
+        Average of X.
+
+    """
+    log_weight = -(E - np.min(E, axis=0))/kBT
+    weight = np.exp(log_weight)
+    return np.sum(X*weight, axis=0)/np.sum(weight, axis=0)
+
 def U_moy(Ng, N_max=10, kBT=0.01):
     """
 
@@ -73,15 +97,9 @@ def U_moy(Ng, N_max=10, kBT=0.01):
         Average electrostatic energy of the single dot.
 
     """
-    Z = 0 # partition function
-    moy = 0
-    for N in range(N_max+1): # loop from [0, N_max]
-        E = U(N, Ng)
-        Z = Z + np.exp(-E/kBT)
-
-        moy = moy + E*np.exp(-E/kBT)
-
-    return moy/Z
+    N = np.arange(N_max+1).reshape((-1,) + (1,)*np.ndim(Ng)) # [0, N_max]
+    E = U(N, Ng)
+    return thermal_average(E, E, kBT)
 
 def N_moy(Ng, N_max=10, Ec=1, kBT=0.01):
     """
@@ -103,15 +121,9 @@ def N_moy(Ng, N_max=10, Ec=1, kBT=0.01):
         Average electron number in the single dot.
 
     """
-    Z = 0
-    moy = 0
-    for N in range(N_max+1): # loop from [0, N_max]
-        E = U(N, Ng, Ec=Ec)
-        Z = Z + np.exp(-E/kBT)
-
-        moy = moy + N*np.exp(-E/kBT)
-
-    return moy/Z
+    N = np.arange(N_max+1).reshape((-1,) + (1,)*np.ndim(Ng)) # [0, N_max]
+    E = U(N, Ng, Ec=Ec)
+    return thermal_average(E, N, kBT)
 
 ###############################################################################
 
@@ -152,6 +164,38 @@ def f(N1, N2, Vg1, Vg2, Ec1, Ec2, Cg1, Cg2, Ecm, e):
         +1/e**2*(0.5*Cg1**2*Vg1**2*Ec1+0.5*Cg2**2*Vg2**2*Ec2+Cg1*Vg1*Cg2*Vg2*Ecm)
 
 
+def charging_energy(Cg1, Cg2, Cm, CL, CR, e=1):
+    """
+
+    Parameters
+    ----------
+    Cg1 : Float
+        Capacitance of gate 1.
+    Cg2 : Float
+        Capacitance of gate 2.
+    Cm : Float
+        Capacitance between the two dots.
+    CL : Float
+        Capacitance of the source.
+    CR : Float
+        Capacitance of the drain.
+    e : Float, optional
+        Elementary charge. The default is 1.
+
+    Returns
+    -------
+    Ec1, Ec2, Ecm : Float
+        Charging energy of dot 1, of dot 2 and electrostatic coupling energy between the two dots.
+
+    """
+    C1 = CL+Cg1+Cm # sum of the capacitance attached to dot 1
+    C2 = CR+Cg2+Cm
+    Ec1 = e**2*(C2/(C1*C2-Cm**2)) #Ec1 = e**2/C1*(1/(1-(Cm**2/(C1*C2)))) # version from paper but diverges at Cm=0
+    Ec2 = e**2*(C1/(C1*C2-Cm**2)) #Ec2 = e**2/C2*(1/(1-(Cm**2/(C1*C2))))
+    Ecm = e**2*(Cm/(C1*C2-Cm**2)) #Ecm = e**2/Cm*(1/((C1*C2/Cm**2)-1))
+    return Ec1, Ec2, Ecm
+
+
 def U_DQD(N1, N2, Vg1, Vg2, Cg1, Cg2, Cm, CL, CR, e=1):
     """
 
@@ -184,11 +228,7 @@ def U_DQD(N1, N2, Vg1, Vg2, Cg1, Cg2, Cm, CL, CR, e=1):
         Electrostatic energy of the double dot.
 
     """
-    C1 = CL+Cg1+Cm # sum of the capacitance attached to dot 1
-    C2 = CR+Cg2+Cm
-    Ec1 = e**2*(C2/(C1*C2-Cm**2)) #Ec1 = e**2/C1*(1/(1-(Cm**2/(C1*C2)))) # version from paper but diverges at Cm=0
-    Ec2 = e**2*(C1/(C1*C2-Cm**2)) #Ec2 = e**2/C2*(1/(1-(Cm**2/(C1*C2))))
-    Ecm = e**2*(Cm/(C1*C2-Cm**2)) #Ecm = e**2/Cm*(1/((C1*C2/Cm**2)-1))
+    Ec1, Ec2, Ecm = charging_energy(Cg1, Cg2, Cm, CL, CR, e=e)
 
     return 0.5*N1**2*Ec1+0.5*N2**2*Ec2+N1*N2*Ecm+f(N1, N2, Vg1, Vg2, Ec1, Ec2, Cg1, Cg2, Ecm, e=e)
 
@@ -236,8 +276,232 @@ def U_DQD(N1, N2, Vg1, Vg2, Cg1, Cg2, Cm, CL, CR, e=1):
 #     return moy/Z
 
 
-def N_moy_DQD(Vg1, Vg2, Cg1, Cg2, Cm, CL, CR, N_min=0, N_max=10, kBT=0.01, e=1, verbose=False, is_occupation=False):
+def ground_state_DQD(Ng1, Ng2, Ec1, Ec2, Ecm, N_min=0, N_max=10):
+    """
+    The ground state is found among the charge states around c, the nearest state of Ng in [N_min, N_max]. The energy
+    0.5*(N-Ng)^T Ec (N-Ng) of the ground state is at most the one of c, 0.5*lambda_max*|c-Ng|^2, so the ground state is
+    at most sqrt(lambda_max/lambda_min)*|c-Ng| away from Ng and (sqrt(lambda_max/lambda_min) + 1)*|c-Ng| away from c
+    (lambda the eigenvalues of Ec). |c-Ng| is at most sqrt(0.5) when Ng is in [N_min, N_max], and grows with the
+    distance of Ng to it otherwise. The radius is at most N_max - N_min, when every state is searched.
+
+    Parameters
+    ----------
+    Ng1 : Float
+        Dimensionless gate charge of dot 1.
+    Ng2 : Float
+        Dimensionless gate charge of dot 2.
+    Ec1 : Float
+        Charging energy of dot 1.
+    Ec2 : Float
+        Charging energy of dot 2.
+    Ecm : Float
+        Electrostatic coupling energy between the two dots.
+    N_min : Int, optional
+        Minimum number of electrons in a dot. The default is 0.
+    N_max : Int, optional
+        Maximum number of electrons in a dot. The default is 10.
+
+    Returns
+    -------
+    N1, N2 : Int
+        Number of electrons on dot 1 and dot 2 in the ground state.
+
+    """
+    lambda_min, lambda_max = np.linalg.eigvalsh([[Ec1, Ecm], [Ecm, Ec2]])
+    Ng1, Ng2 = np.broadcast_arrays(np.asarray(Ng1, dtype=float), np.asarray(Ng2, dtype=float))
+    center1 = np.clip(np.rint(Ng1), N_min, N_max)
+    center2 = np.clip(np.rint(Ng2), N_min, N_max)
+    distance = np.sqrt((center1 - Ng1)**2 + (center2 - Ng2)**2).max(initial=0)
+    radius = int(min(np.ceil((np.sqrt(lambda_max/lambda_min) + 1)*distance), N_max - N_min))
+    best_energy = np.full(Ng1.shape, np.inf)
+    N1 = np.zeros(Ng1.shape, dtype=int)
+    N2 = np.zeros(Ng1.shape, dtype=int)
+    for d1 in range(-radius, radius + 1):
+        for d2 in range(-radius, radius + 1):
+            candidate1 = np.clip(center1 + d1, N_min, N_max)
+            candidate2 = np.clip(center2 + d2, N_min, N_max)
+            dN1 = candidate1 - Ng1
+            dN2 = candidate2 - Ng2
+            energy = 0.5*Ec1*dN1**2 + 0.5*Ec2*dN2**2 + Ecm*dN1*dN2
+            is_lower = energy < best_energy
+            best_energy = np.where(is_lower, energy, best_energy)
+            N1 = np.where(is_lower, candidate1, N1).astype(int)
+            N2 = np.where(is_lower, candidate2, N2).astype(int)
+    return N1[()], N2[()]
+
+
+def honeycomb_DQD(Cg1, Cg2, Cm, CL, CR, N_min=0, N_max=10, e=1):
+    """
+    Vertices and edges of the honeycomb (the charge transition lines of the double dot at zero temperature). Two states
+    N and N+d have the same energy on the line d^T Ec (Ng-N) = 0.5*d^T Ec d. The vertices are the triple points where
+    N, N+(1,0) and N+(0,1) have the same energy, Ng = N + 0.5*Ec^-1 (Ec1, Ec2), and where N+(1,0), N+(0,1) and N+(1,1)
+    do, Ng = N + Ec^-1 (Ecm+0.5*Ec1, Ecm+0.5*Ec2). The edges on the border of [N_min, N_max] are infinite and left out.
+
+    Parameters
+    ----------
+    Cg1 : Float
+        Capacitance of gate 1.
+    Cg2 : Float
+        Capacitance of gate 2.
+    Cm : Float
+        Capacitance between the two dots.
+    CL : Float
+        Capacitance of the source.
+    CR : Float
+        Capacitance of the drain.
+    N_min : Int, optional
+        Minimum number of electrons in a dot. The default is 0.
+    N_max : Int, optional
+        Maximum number of electrons in a dot. The default is 10.
+    e : Float, optional
+        Elementary charge. The default is 1.
+
+    Returns
+    -------
+    vertices : np.ndarray
+        Voltages (Vg1, Vg2) of the triple points, shape (number of vertices, 2).
+    edges : np.ndarray
+        Voltages of the two ends of each transition line, shape (number of edges, 2, 2).
+
+    """
+    Ec1, Ec2, Ecm = charging_energy(Cg1, Cg2, Cm, CL, CR, e=e)
+    Ec_inverse = np.linalg.inv([[Ec1, Ecm], [Ecm, Ec2]])
+    to_voltage = np.array([e/Cg1, e/Cg2])
+    electron_offset = Ec_inverse @ [0.5*Ec1, 0.5*Ec2]
+    hole_offset = Ec_inverse @ [Ecm + 0.5*Ec1, Ecm + 0.5*Ec2]
+
+    # Triple points of N, with N and N+(1,1) in [N_min, N_max]
+    N = np.arange(N_min, N_max)
+    N = np.stack(np.meshgrid(N, N, indexing='ij'), axis=-1)
+    electron = (N + electron_offset)*to_voltage
+    hole = (N + hole_offset)*to_voltage
+
+    # N+(1,0)/N+(0,1) joins the two triple points of N, N/N+(1,0) joins the electron one of N to the hole one of
+    # N-(0,1) and N/N+(0,1) the electron one of N to the hole one of N-(1,0)
+    edges = [np.stack([electron, hole], axis=-2).reshape(-1, 2, 2),
+             np.stack([electron[:, 1:], hole[:, :-1]], axis=-2).reshape(-1, 2, 2),
+             np.stack([electron[1:], hole[:-1]], axis=-2).reshape(-1, 2, 2)]
+    vertices = np.concatenate([electron.reshape(-1, 2), hole.reshape(-1, 2)])
+    return vertices, np.concatenate(edges)
+
+
+def transition_voltages_DQD(V_fixed, Cg1, Cg2, Cm, CL, CR, N_min=0, N_max=10, e=1, is_sweep_gate_2=False,
+                            V_range=None):
+    """
+    Voltages where the ground state changes along a sweep of one gate, the other one being fixed. Every line where two
+    neighboring states have the same energy (see honeycomb_DQD()) is crossed once by the sweep. Between two consecutive
+    crossings, the ground state doesn't change, so the crossings where it differs on both sides are the transitions.
+
+    Parameters
+    ----------
+    V_fixed : Float
+        Voltage on the gate that isn't swept.
+    Cg1 : Float
+        Capacitance of gate 1.
+    Cg2 : Float
+        Capacitance of gate 2.
+    Cm : Float
+        Capacitance between the two dots.
+    CL : Float
+        Capacitance of the source.
+    CR : Float
+        Capacitance of the drain.
+    N_min : Int, optional
+        Minimum number of electrons in a dot. The default is 0.
+    N_max : Int, optional
+        Maximum number of electrons in a dot. The default is 10.
+    e : Float, optional
+        Elementary charge. The default is 1.
+    is_sweep_gate_2 : Bool, optional
+        If true, gate 2 is swept and V_fixed is on gate 1. The default is False.
+    V_range : tuple of Float, optional
+        Minimum and maximum voltages of the sweep. If not None, only the transitions in this range are returned, which
+        is much faster with many electrons. The default is None.
+
+    Returns
+    -------
+    np.ndarray
+        Sorted voltages of the transitions on the swept gate.
+
+    """
+    Ec1, Ec2, Ecm = charging_energy(Cg1, Cg2, Cm, CL, CR, e=e)
+    Ec = np.array([[Ec1, Ecm], [Ecm, Ec2]])
+    sweep, fixed = (1, 0) if is_sweep_gate_2 else (0, 1)
+    Cg = (Cg1, Cg2)
+    Ng_fixed = Cg[fixed]*V_fixed/e
+
+    N = np.arange(N_min, N_max + 1)
+    N = np.stack(np.meshgrid(N, N, indexing='ij'), axis=-1).reshape(-1, 2)
+    crossings = []
+    for d in np.array([[1, 0], [0, 1], [-1, 1]]):
+        slope = Ec @ d
+        if slope[sweep] == 0:
+            continue
+        # Only the lines between two states of [N_min, N_max]
+        N_line = N[np.all((N + d >= N_min) & (N + d <= N_max), axis=1)]
+        # d^T Ec Ng = d^T Ec N + 0.5*d^T Ec d, solved for the swept gate charge
+        crossings.append((N_line @ slope + 0.5*d @ slope - slope[fixed]*Ng_fixed)/slope[sweep])
+    crossings = np.unique(np.concatenate(crossings))
+    if V_range is not None:
+        crossings = crossings[(crossings >= Cg[sweep]*V_range[0]/e) & (crossings <= Cg[sweep]*V_range[1]/e)]
+        if len(crossings) == 0:
+            return crossings
+
+    # One point in each interval between the crossings, and one on each side
+    points = np.concatenate([[crossings[0] - 1], (crossings[:-1] + crossings[1:])/2, [crossings[-1] + 1]])
+    Ng = [points, np.full(points.shape, Ng_fixed)] if sweep == 0 else [np.full(points.shape, Ng_fixed), points]
+    N1, N2 = ground_state_DQD(Ng[0], Ng[1], Ec1, Ec2, Ecm, N_min, N_max)
+    is_transition = (np.diff(N1) != 0) | (np.diff(N2) != 0)
+    return crossings[is_transition]*e/Cg[sweep]
+
+
+def window_error_bound(Ec1, Ec2, Ecm, kBT, window):
+    """
+    Bound on the absolute error of N_moy_DQD() when only the charge states at most window electrons away from the ground
+    state (on each dot) are summed. A state k electrons outside of the window is at least w+k-rho away from Ng (see
+    ground_state_DQD()), so its energy is at least 0.5*lambda_min*(w+k-rho)**2 - 0.25*lambda_max over the ground
+    state. There are 8*(w+k) such states, whose N1-N2 or N1+N2 differ by at most 4*w+2*k from the average.
+
+    Parameters
+    ----------
+    Ec1 : Float
+        Charging energy of dot 1.
+    Ec2 : Float
+        Charging energy of dot 2.
+    Ecm : Float
+        Electrostatic coupling energy between the two dots.
+    kBT : Float
+        Thermal energy.
+    window : Int
+        Number of electrons summed on each side of the ground state.
+
+    Returns
+    -------
+    Float
+        Maximum absolute error on the average number of electrons.
+
+    """
+    lambda_min, lambda_max = np.linalg.eigvalsh([[Ec1, Ecm], [Ecm, Ec2]])
+    rho = np.sqrt(0.5*lambda_max/lambda_min)
+    error = 0
+    k = 1
+    while True:
+        distance = window + k - rho
+        gap = 0.5*lambda_min*max(distance, 0)**2 - 0.25*lambda_max
+        term = 8*(window + k)*(4*window + 2*k)*np.exp(-gap/kBT)
+        error += term
+        if distance > 0 and term < 1e-300 or k > 10000:
+            break
+        k += 1
+    return error
+
+
+def N_moy_DQD(Vg1, Vg2, Cg1, Cg2, Cm, CL, CR, N_min=0, N_max=10, kBT=0.01, e=1, verbose=False, is_occupation=False,
+              block_size=2**20, window=None):
     """
+    The energies of every charge state (N1, N2) are computed by blocks of states for every voltage at once, and summed
+    with a running log-sum-exp, so the partition function doesn't overflow or underflow. With window, only the states
+    around the ground state of each voltage are summed (see window_error_bound() for the error).
 
     Parameters
     ----------
@@ -255,12 +519,23 @@ def N_moy_DQD(Vg1, Vg2, Cg1, Cg2, Cm, CL, CR, N_min=0, N_max=10, kBT=0.01, e=1,
         Capacitance of the source.
     CR : Float
         Capacitance of the drain.
+    N_min : Int, optional
+        Minimum number of electrons in a dot. The default is 0.
     N_max : Int, optional
         Maximum number of electrons in a dot. The default is 10.
     kBT : Float, optional
         Thermal energy. The default is 0.01.
     e : Float, optional
         Elementary charge. The default is 1.
+    verbose : Bool, optional
+        Output in console the time left. The default is False.
+    is_occupation : Bool, optional
+        If true, the average of N1 + N2 instead of N1 - N2. The default is False.
+    block_size : Int, optional
+        Maximum number of energies (charge states times voltages) computed at the same time. The default is 2**20.
+    window : Int, optional
+        If not None, only the states at most window electrons away from the ground state on each dot are summed,
+        which doesn't depend on N_max - N_min. The default is None.
 
     Returns
     -------
@@ -269,36 +544,70 @@ def N_moy_DQD(Vg1, Vg2, Cg1, Cg2, Cm, CL, CR, N_min=0, N_max=10, kBT=0.01, e=1,
 
     """
     if verbose:
-        number_loop = 0
-        total_loop = N_max
         start = time.time()
-        start_loop = 0
 
-    Z = 0  # partition function
-    moy = 0
-    for N2 in range(N_min, N_max + 1):  # loop from [0, N_max]
+    Ec1, Ec2, Ecm = charging_energy(Cg1, Cg2, Cm, CL, CR, e=e)
+    Vg1, Vg2 = np.broadcast_arrays(np.asarray(Vg1, dtype=float), np.asarray(Vg2, dtype=float))
+    shape = Vg1.shape
+    # U_DQD is 0.5*(N-Ng)^T Ec (N-Ng), with the dimensionless gate charges Ng
+    Ng1 = (Cg1*Vg1/e).ravel()
+    Ng2 = (Cg2*Vg2/e).ravel()
+
+    if window is not None:
+        moy = np.empty(Ng1.shape)
+        d = np.arange(-window, window + 1)
+        d1 = np.tile(d, len(d))[:, np.newaxis]
+        d2 = np.repeat(d, len(d))[:, np.newaxis]
+        block = max(1, block_size // len(d1))
+        for i in range(0, len(Ng1), block):
+            ground1, ground2 = ground_state_DQD(Ng1[i:i + block], Ng2[i:i + block], Ec1, Ec2, Ecm, N_min, N_max)
+            N1 = ground1 + d1
+            N2 = ground2 + d2
+            dN1 = N1 - Ng1[i:i + block]
+            dN2 = N2 - Ng2[i:i + block]
+            E = 0.5*Ec1*dN1**2 + 0.5*Ec2*dN2**2 + Ecm*dN1*dN2
+            E[(N1 < N_min) | (N1 > N_max) | (N2 < N_min) | (N2 > N_max)] = np.inf
+            moy[i:i + block] = thermal_average(E, N1 + N2 if is_occupation else N1 - N2, kBT)
         if verbose:
-            end_loop = time.time()
-            number_loop += 1
-            if number_loop % 10 == 0:
-                print(f'Loop number: {number_loop}\t'
-                      f'Time left: {round((total_loop - number_loop) * (end_loop - start_loop), 2)}\t'
-                      f'Time loop: {round(end_loop - start, 2)}')
-            start_loop = time.time()
-
-        for N1 in range(N_min, N_max + 1):
-            E = U_DQD(N1, N2, Vg1, Vg2, Cg1, Cg2, Cm, CL, CR, e=e)
-            Z = Z + np.exp(-E / kBT)
-
-            if is_occupation:
-                moy = moy + (N1 + N2) * np.exp(-E / kBT)
-            else:
-                moy = moy + (N1 - N2) * np.exp(-E / kBT)
+            end = time.time()
+            print(f'Total time: {end - start}\tError bound: {window_error_bound(Ec1, Ec2, Ecm, kBT, window)}')
+        return moy.reshape(shape)[()]
+
+    # The term 0.5*Ng^T Ec Ng is the same for every charge state, so it cancels out
+    slope1 = (Ec1*Ng1 + Ecm*Ng2)/kBT
+    slope2 = (Ecm*Ng1 + Ec2*Ng2)/kBT
+
+    N = np.arange(N_min, N_max + 1)
+    N1 = np.tile(N, len(N))
+    N2 = np.repeat(N, len(N))
+    charge = N1 + N2 if is_occupation else N1 - N2
+    log_weight_N = -(0.5*Ec1*N1**2 + 0.5*Ec2*N2**2 + Ecm*N1*N2)/kBT
+
+    log_max = np.full(Ng1.shape, -np.inf)
+    Z = np.zeros(Ng1.shape)  # partition function, scaled by exp(-log_max)
+    moy = np.zeros(Ng1.shape)
+    block = max(1, block_size // max(1, Ng1.size))
+    for number_loop, i in enumerate(range(0, len(N1), block)):
+        if verbose and number_loop % 10 == 0 and number_loop:
+            took = time.time() - start
+            print(f'Loop number: {number_loop}\t'
+                  f'Time left: {round(took * (len(N1) - i) / i, 2)}\t'
+                  f'Time loop: {round(took, 2)}')
+        log_weight = log_weight_N[i:i + block, np.newaxis] + N1[i:i + block, np.newaxis]*slope1
+        log_weight += N2[i:i + block, np.newaxis]*slope2
+
+        new_max = np.maximum(log_max, log_weight.max(axis=0))
+        scale = np.exp(log_max - new_max)
+        log_weight -= new_max
+        weight = np.exp(log_weight, out=log_weight)
+        Z = Z*scale + np.ones(len(weight)) @ weight
+        moy = moy*scale + charge[i:i + block].astype(float) @ weight
+        log_max = new_max
 
     if verbose:
         end = time.time()
         print(f'Total time: {end - start}')
-    return moy / Z
+    return (moy / Z).reshape(shape)[()]
 
 # Code examples
 """
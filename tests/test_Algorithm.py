@@ -0,0 +1,55 @@
+import numpy as np
+import qdms
+
+
+def create_memristor_simulation(distribution_type='linear'):
+    circuit = qdms.Circuit(qdms.Data_Driven(), 4)
+    memristor_simulation = qdms.MemristorSimulation(circuit, 6, distribution_type=distribution_type)
+    memristor_simulation.simulate()
+    return memristor_simulation
+
+
+def test_algorithm_direct_in_range():
+    for distribution_type in ['linear', 'full_spread']:
+        memristor_simulation = create_memristor_simulation(distribution_type)
+        voltages = memristor_simulation.voltages
+        # Bounds between two achievable voltages, so the nearest of the edge targets can be out of the range
+        v_min = (voltages[10] * 0.9 + voltages[11] * 0.1)
+        v_max = (voltages[-12] * 0.1 + voltages[-11] * 0.9)
+        table = qdms.algorithm(0.01, memristor_simulation, v_min=v_min, v_max=v_max, policy='full')
+        direct = qdms.algorithm(0.01, memristor_simulation, v_min=v_min, v_max=v_max, policy='full', is_direct=True)
+        assert np.allclose(list(direct.keys()), list(table.keys()), rtol=0, atol=1e-11)
+        assert all(v_min <= v <= v_max for v in direct.keys())
+        for resistances, resistances_ in zip(direct.values(), table.values()):
+            assert np.allclose(resistances, resistances_)
+
+
+def test_algorithm_default_policy():
+    # The default doesn't wait for the user
+    memristor_simulation = create_memristor_simulation()
+    voltages = qdms.algorithm(0.05, memristor_simulation)
+    expected = qdms.algorithm(0.05, memristor_simulation, policy='full')
+    assert list(voltages.keys()) == list(expected.keys())
+    assert qdms.Algorithm.ask_v_min_v_max(memristor_simulation.circuit) == \
+        qdms.Algorithm.calculate_min_max_voltage(memristor_simulation.circuit)
+
+
+def test_algorithm_old_memristor_simulation():
+    memristor_simulation = create_memristor_simulation()
+    expected = qdms.algorithm(0.05, memristor_simulation, policy='percentile')
+    # Pickled before the arrays of the voltages
+    state = memristor_simulation.__dict__.copy()
+    for name in ['voltages', 'states_index', 'resistances', 'chunk_size', 'is_meet_in_the_middle']:
+        del state[name]
+    old = qdms.MemristorSimulation.__new__(qdms.MemristorSimulation)
+    old.__setstate__(state)
+    voltages = qdms.algorithm(0.05, old, policy='percentile')
+    assert list(voltages.keys()) == list(expected.keys())
+
+
+def test_find_nearest_index():
+    array = np.array([0., 1., 2., 4.])
+    values = [-1, 0.4, 0.5, 1.5, 3, 3.1, 5]
+    index = qdms.Algorithm.find_nearest_index(array, values)
+    np.testing.assert_array_equal(index, [0, 0, 1, 2, 3, 3, 3])
+    assert [array[i] for i in index] == [qdms.Algorithm.find_nearest(array, value) for value in values]
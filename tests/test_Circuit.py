@@ -0,0 +1,46 @@
+import math
+import pickle
+import numpy as np
+import qdms
+
+
+def test_running_conductance():
+    rng = np.random.default_rng(0)
+    for refresh_interval in [100, 10**9]:
+        circuit = qdms.Circuit(qdms.Data_Driven(), 8, refresh_interval=refresh_interval)
+        for _ in range(20000):
+            memristor = circuit.list_memristor[rng.integers(8)]
+            memristor.g = 1 / rng.uniform(memristor.r_on, memristor.r_off)
+        exact = math.fsum(memristor.g for memristor in circuit.list_memristor)
+        assert np.isclose(circuit.running_conductance(), exact, rtol=1e-12, atol=0)
+        # Without variability, reading the memristors gives the same conductance
+        assert np.isclose(circuit.current_conductance(), exact, rtol=1e-12, atol=0)
+        assert np.isclose(circuit.running_v_out(), circuit.current_v_out(), rtol=1e-12, atol=0)
+        circuit = pickle.loads(pickle.dumps(circuit))
+        circuit.list_memristor[0].g *= 2
+        assert np.isclose(circuit.running_conductance(), exact + circuit.list_memristor[0].g / 2, rtol=1e-12, atol=0)
+
+
+def test_running_conductance_none():
+    circuit = qdms.Circuit(qdms.Data_Driven(), 4)
+    g = circuit.list_memristor[1].g
+    circuit.list_memristor[1].g = None
+    is_raised = False
+    try:
+        circuit.running_conductance()
+    except Exception:
+        is_raised = True
+    assert is_raised
+    circuit.list_memristor[2].g = g
+    circuit.list_memristor[1].g = g
+    assert np.isclose(circuit.running_conductance(), math.fsum(m.g for m in circuit.list_memristor), rtol=1e-12, atol=0)
+
+
+def test_current_conductance_variability():
+    circuit = qdms.Circuit(qdms.Data_Driven(is_variability_on=True), 4)
+    np.random.seed(0)
+    conductance = circuit.current_conductance()
+    np.random.seed(0)
+    expected = sum(1 / memristor.read() for memristor in circuit.list_memristor)
+    assert np.isclose(conductance, expected, rtol=1e-12, atol=0)
+    assert conductance != circuit.running_conductance()
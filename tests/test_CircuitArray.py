@@ -0,0 +1,74 @@
+import pickle
+import numpy as np
+import qdms
+from qdms.Data_Driven import stack_parameters, read_memristors
+
+
+def test_parameters():
+    circuit_array = qdms.CircuitArray(qdms.Data_Driven(), 5)
+    circuit = qdms.Circuit(qdms.Data_Driven(), 5)
+    expected = stack_parameters(circuit.list_memristor)
+    parameters = stack_parameters(circuit_array.list_memristor)
+    assert parameters.keys() == expected.keys()
+    for name in expected:
+        np.testing.assert_array_equal(parameters[name], expected[name])
+    for name in ['r_on', 'r_off', 'A_p', 'r_p', 'r_n']:
+        assert getattr(circuit_array.list_memristor[2], name) == getattr(circuit.list_memristor[2], name)
+
+    # The views read and write circuit.parameters
+    circuit_array.parameters['r_off'][1] = 20000
+    circuit_array.list_memristor[3].A_p = 1
+    assert circuit_array.list_memristor[1].r_off == 20000
+    assert circuit_array.parameters['A_p'][3] == 1
+    np.testing.assert_array_equal(stack_parameters(circuit_array.list_memristor[1:4])['r_off'],
+                                  circuit_array.parameters['r_off'][1:4])
+
+
+def create_circuit(circuit_class, is_variability_on):
+    circuit = circuit_class(qdms.Data_Driven(is_variability_on=is_variability_on), 20)
+    for memristor, resistance in zip(circuit.list_memristor, np.linspace(2000, 15000, 20)):
+        memristor.g = 1 / resistance
+    return circuit
+
+
+def test_circuit_array():
+    # The same memristors in a Circuit and in a CircuitArray give the same readings and the same programming
+    for is_variability_on in [False, True]:
+        circuit = create_circuit(qdms.Circuit, is_variability_on)
+        circuit_array = create_circuit(qdms.CircuitArray, is_variability_on)
+        np.random.seed(0)
+        expected = read_memristors(circuit.list_memristor)
+        np.random.seed(0)
+        np.testing.assert_array_equal(circuit_array.read_all(), expected)
+        np.random.seed(0)
+        np.testing.assert_array_equal(read_memristors(circuit_array.list_memristor), expected)
+
+        target = np.linspace(3000, 9000, 20)
+        conductances = []
+        for circuit_class, batch_threshold in [(qdms.Circuit, 16), (qdms.CircuitArray, 16), (qdms.CircuitArray, 100)]:
+            circuit = create_circuit(circuit_class, is_variability_on)
+            pulsed_programming = qdms.PulsedProgramming(qdms.MemristorSimulation(circuit, 4), tolerance=1,
+                                                        is_relative_tolerance=True)
+            np.random.seed(0)
+            pulsed_programming.lockstep_convergence(circuit.list_memristor, target, batch_threshold=batch_threshold)
+            conductances.append([memristor.g for memristor in circuit.list_memristor])
+            assert np.isclose(circuit.running_conductance(), np.sum(conductances[-1]), rtol=1e-12, atol=0)
+        np.testing.assert_allclose(conductances[1], conductances[0], rtol=1e-12)
+        np.testing.assert_allclose(conductances[2], conductances[0], rtol=1e-9)
+
+
+def test_pickle():
+    circuit_array = qdms.CircuitArray(qdms.Data_Driven(is_variability_on=True, noise_buffer_size=10), 5)
+    circuit_array.list_memristor[2].g = 1 / 5000
+    circuit_array.list_memristor[2].read()
+    restored = pickle.loads(pickle.dumps(circuit_array))
+    memristor = restored.list_memristor[2]
+    # The views still read the attributes of the model
+    assert 'noise_buffer_size' not in memristor.__dict__
+    assert memristor.noise_buffer_size == 10
+    assert memristor.circuit is restored and memristor.g == 1 / 5000
+    assert memristor.noise_buffer is None
+    memristor.read()
+    assert len(memristor.noise_buffer) == 10 and memristor.noise_index == 1
+    np.testing.assert_array_equal(restored.parameters['r_off'], circuit_array.parameters['r_off'])
+    assert np.isclose(restored.conductance, circuit_array.conductance)
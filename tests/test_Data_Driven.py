@@ -0,0 +1,112 @@
+import copy
+import numpy as np
+import qdms
+
+
+def create_memristors(number, parameter_model='O921C', seed=0):
+    rng = np.random.default_rng(seed)
+    model = qdms.Data_Driven(parameter_model)
+    memristors = []
+    for _ in range(number):
+        memristor = copy.deepcopy(model)
+        memristor.g = 1 / rng.uniform(memristor.r_on, memristor.r_off)
+        memristors.append(memristor)
+    return memristors
+
+
+def test_simulate_batch_shared_signal():
+    for parameter_model in ['O921C', 'N1257R']:
+        memristors = create_memristors(20, parameter_model)
+        voltage_signal = np.concatenate([np.full(30, 1.2), np.full(30, -1.4), np.linspace(-2, 2, 40)])
+        g = qdms.simulate_batch([m.g for m in memristors], voltage_signal, qdms.stack_parameters(memristors))
+        for memristor in memristors:
+            memristor.simulate(voltage_signal)
+        assert np.allclose(g, [m.g for m in memristors], rtol=1e-12, atol=0)
+
+
+def test_simulate_batch_signal_per_device():
+    memristors = create_memristors(10)
+    voltage_signal = np.random.default_rng(1).uniform(-2, 2, (10, 50))
+    g, current = qdms.simulate_batch([m.g for m in memristors], voltage_signal, qdms.stack_parameters(memristors),
+                                     return_current=True)
+    for i, memristor in enumerate(memristors):
+        current_ = memristor.simulate(voltage_signal[i], return_current=True)
+        assert np.allclose(current[i], current_, rtol=1e-12, atol=0)
+    assert np.allclose(g, [m.g for m in memristors], rtol=1e-12, atol=0)
+
+
+def test_simulate_memristors():
+    memristors = create_memristors(5)
+    copies = copy.deepcopy(memristors)
+    voltage_signal = np.full(100, 1.)
+    qdms.simulate_memristors(memristors, voltage_signal)
+    for memristor in copies:
+        memristor.simulate(voltage_signal)
+    assert np.allclose([m.g for m in memristors], [m.g for m in copies], rtol=1e-12, atol=0)
+
+
+def test_simulate_pulse_closed_form():
+    for voltage in [-2.5, -1.2, -0.3, 0.4, 1.1, 2.8]:
+        for number_step in [1, 2, 3, 200, 5000]:
+            memristors = create_memristors(5)
+            copies = copy.deepcopy(memristors)
+            for memristor, copy_ in zip(memristors, copies):
+                memristor.simulate_pulse(voltage, number_step)
+                copy_.simulate([voltage] * number_step)
+                assert np.isclose(memristor.g, copy_.g, rtol=1e-12, atol=0)
+
+
+def test_pulse_batch():
+    memristors = create_memristors(30)
+    voltage = np.random.default_rng(2).uniform(-3, 3, 30)
+    for version2018 in [False, True]:
+        parameters = qdms.stack_parameters(memristors)
+        g = [m.g for m in memristors]
+        pulsed = qdms.pulse_batch(g, voltage, 200, parameters, version2018=version2018)
+        simulated = qdms.simulate_batch(g, np.repeat(voltage[:, None], 200, axis=1), parameters,
+                                        version2018=version2018)
+        # The per-timestep 2018 model loses precision in exp(x) - 1
+        assert np.allclose(pulsed, simulated, rtol=1e-4 if version2018 else 1e-12, atol=0)
+
+
+def test_noise_buffer_refill():
+    # Readings across the end of the buffer take the next buffer, drawn from the same generator
+    memristor = qdms.Data_Driven(is_variability_on=True, noise_buffer_size=7, rng=3)
+    memristor.g = 1 / 10000
+    scale = memristor.variability(10000) * 10000 / 100
+    rng = np.random.default_rng(3)
+    noise = np.concatenate([rng.standard_normal(7) for _ in range(4)])
+    resistances = np.concatenate([memristor.read_many(5), [memristor.read() for _ in range(4)],
+                                  memristor.read_many(12), [memristor.read()]])
+    np.testing.assert_allclose(resistances, 10000 + scale * noise[:22], rtol=1e-12)
+    np.testing.assert_array_equal(memristor.draw_noise(6), noise[22:28])
+
+
+def test_noise_seeded():
+    for noise_buffer_size in [0, 100]:
+        readings = []
+        for seed in [5, 5, 6]:
+            memristor = qdms.Data_Driven(is_variability_on=True, noise_buffer_size=noise_buffer_size, rng=seed)
+            memristor.g = 1 / 10000
+            readings.append(np.concatenate([memristor.read_many(150), [memristor.read() for _ in range(10)]]))
+        np.testing.assert_array_equal(readings[0], readings[1])
+        assert not np.allclose(readings[0], readings[2])
+
+
+def test_noise_buffer_statistics():
+    # The buffer changes when the noise is drawn, not its distribution
+    number = 20000
+    for resistance in [1000, 10000]:
+        buffered = qdms.Data_Driven(is_variability_on=True, noise_buffer_size=1000, rng=7)
+        unbuffered = qdms.Data_Driven(is_variability_on=True, rng=8)
+        buffered.g = unbuffered.g = 1 / resistance
+        scale = unbuffered.variability(resistance) * resistance / 100
+        for resistances in [buffered.read_many(number), np.array([unbuffered.read() for _ in range(number)])]:
+            assert abs(resistances.mean() - resistance) < 5 * scale / np.sqrt(number)
+            assert abs(resistances.std() / scale - 1) < 0.05
+
+        # Without variability, the buffer is left alone and the readings are exact
+        buffered.is_variability_on = False
+        noise_index = buffered.noise_index
+        np.testing.assert_array_equal(buffered.read_many(10), np.full(10, resistance))
+        assert buffered.read() == resistance and buffered.noise_index == noise_index
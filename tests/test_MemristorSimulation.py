@@ -0,0 +1,75 @@
+import itertools
+import numpy as np
+import qdms
+
+
+def reference_voltages(circuit, combinations):
+    # Like the former loops: set each memristor, then read them one after the other for each combination
+    voltages = {}
+    for combination in combinations:
+        for memristor, resistance in zip(circuit.list_memristor, combination):
+            memristor.g = 1 / resistance
+        conductance = 0
+        for memristor in circuit.list_memristor:
+            conductance += 1 / memristor.read()
+        voltages[round(circuit.calculate_voltage(conductance), 12)] = combination
+    return {k: voltages[k] for k in sorted(voltages)}
+
+
+def test_simulate_linear():
+    for is_variability_on in [False, True]:
+        for chunk_size in [1, 7, 100000]:
+            circuit = qdms.Circuit(qdms.Data_Driven(is_variability_on=is_variability_on), 4)
+            memristor_simulation = qdms.MemristorSimulation(circuit, 6, chunk_size=chunk_size)
+            np.random.seed(0)
+            memristor_simulation.simulate()
+            np.random.seed(0)
+            expected = reference_voltages(circuit, itertools.combinations_with_replacement(
+                memristor_simulation.list_resistance[0], 4))
+            assert list(memristor_simulation.voltages_memristor.keys()) == list(expected.keys())
+            assert list(memristor_simulation.voltages_memristor.values()) == list(expected.values())
+
+
+def test_simulate_full_spread():
+    for is_variability_on in [False, True]:
+        for chunk_size in [1, 10, 100000]:
+            circuit = qdms.Circuit(qdms.Data_Driven(is_variability_on=is_variability_on), 3)
+            memristor_simulation = qdms.MemristorSimulation(circuit, 5, distribution_type='full_spread',
+                                                            chunk_size=chunk_size)
+            np.random.seed(0)
+            memristor_simulation.simulate()
+            np.random.seed(0)
+            # The former recursion changed the state of the first memristor the fastest
+            combinations = [tuple(reversed(states)) for states in itertools.product(range(5), repeat=3)]
+            expected = reference_voltages(circuit, [[memristor_simulation.list_resistance[i][state]
+                                                     for i, state in enumerate(states)] for states in combinations])
+            assert list(memristor_simulation.voltages_memristor.keys()) == list(expected.keys())
+            assert np.allclose(list(memristor_simulation.voltages_memristor.values()), list(expected.values()),
+                               rtol=1e-12, atol=0)
+
+
+def test_simulate_meet_in_the_middle():
+    for distribution_type in ['linear', 'full_spread']:
+        circuit = qdms.Circuit(qdms.Data_Driven(), 4)
+        memristor_simulation = qdms.MemristorSimulation(circuit, 5, distribution_type=distribution_type)
+        memristor_simulation.simulate()
+        meet_in_the_middle = qdms.MemristorSimulation(circuit, 5, distribution_type=distribution_type, chunk_size=50,
+                                                      is_meet_in_the_middle=True)
+        meet_in_the_middle.simulate()
+        # The voltages can differ by the rounding of the sum
+        assert len(meet_in_the_middle.voltages) == len(memristor_simulation.voltages)
+        assert np.allclose(meet_in_the_middle.voltages, memristor_simulation.voltages, rtol=1e-12, atol=0)
+
+
+def test_find_nearest_combination():
+    for distribution_type in ['linear', 'full_spread']:
+        circuit = qdms.Circuit(qdms.Data_Driven(), 4)
+        memristor_simulation = qdms.MemristorSimulation(circuit, 5, distribution_type=distribution_type)
+        memristor_simulation.simulate()
+        voltage_target = np.random.default_rng(0).uniform(memristor_simulation.voltages[0],
+                                                          memristor_simulation.voltages[-1], 200)
+        voltages, resistances = memristor_simulation.find_nearest_combination(voltage_target)
+        expected = memristor_simulation.voltages[np.argmin(np.abs(memristor_simulation.voltages[np.newaxis]
+                                                                  - voltage_target[:, np.newaxis]), axis=1)]
+        assert np.allclose(np.abs(voltages - voltage_target), np.abs(expected - voltage_target), rtol=0, atol=1e-12)
+        assert np.allclose(voltages, circuit.calculate_voltage(np.sum(1 / resistances, axis=1)), rtol=0, atol=1e-11)
@@ -0,0 +1,22 @@
+import contextlib
+import io
+import os
+import pickle
+import tempfile
+import numpy as np
+import qdms
+
+
+def test_parametric_test_quality_diagram():
+    with tempfile.TemporaryDirectory() as directory:
+        with contextlib.redirect_stdout(io.StringIO()):
+            qdms.ParaTest.parametric_test_quality_diagram(directory, [[2, 4, 1, 0.05]], variability=np.array([0, 1]),
+                                                          nb_occurences=3, seed=1)
+        with open(os.path.join(directory, 'parametric_stability_diagram_quality', 'data.pickle'), 'rb') as file:
+            results = pickle.load(file)
+    assert len(results) == 2
+    for result in results.values():
+        assert len(result['voltage_shift']) > 0
+        assert np.all(np.isfinite(result['RMS']))
+        # The transitions of the programmed diagram are near the exact ones
+        assert np.max(np.abs(result['voltage_shift'])) < 0.05
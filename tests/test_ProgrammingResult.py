@@ -0,0 +1,74 @@
+import pickle
+import numpy as np
+import qdms
+
+
+def create_result():
+    result = qdms.ProgrammingResult(capacity=1)
+    result.record(1.0, 1.02, [1000, 2000], 5)
+    result.record(1.5, 1.49, [1100, 2100], 3)
+    result.record(1.2, 1.2, [1050, 2050], 0)
+    result.record(np.nan, 2.0, [1200, 2200])
+    return result
+
+
+def test_simulate():
+    for chunk_size in [None, 3]:
+        circuit = qdms.Circuit(qdms.Data_Driven(), 2)
+        memristor_simulation = qdms.MemristorSimulation(circuit, 4)
+        memristor_simulation.simulate()
+        voltages_target = qdms.algorithm(0.05, memristor_simulation, policy='full')
+        pulsed_programming = qdms.PulsedProgramming(memristor_simulation, tolerance=1, is_relative_tolerance=True,
+                                                    chunk_size=chunk_size, max_workers=1, seed=0)
+        result = pulsed_programming.simulate(voltages_target, [[50, False], [10, False]])
+
+        # One row per target, in order, with the voltage output of the resistances read
+        assert result is pulsed_programming.result
+        assert len(result) == len(voltages_target)
+        np.testing.assert_array_equal(result.target_voltage, list(voltages_target.keys()))
+        assert result.resistances.shape == (len(voltages_target), 2)
+        np.testing.assert_allclose(result.voltage, [circuit.calculate_voltage(np.sum(1 / resistances))
+                                                    for resistances in result.resistances])
+        np.testing.assert_allclose(result.error, result.voltage - result.target_voltage)
+        assert np.all(result.number_of_pulse >= 0)
+        assert result.statistics()['total_pulse'] == pulsed_programming.number_of_pulse
+        assert pulsed_programming.voltage_output == dict(zip(result.voltage.tolist(), result.resistances.tolist()))
+
+
+def test_statistics():
+    result = create_result()
+    statistics = result.statistics()
+    assert np.isclose(statistics['resolution'], np.mean([0.47, -0.29, 0.8]))
+    assert np.isclose(statistics['std_resolution'], np.std([0.47, -0.29, 0.8]))
+    assert np.isclose(result.resolution(), statistics['resolution'])
+    # The row without target nor number of pulses is left out
+    assert np.isclose(statistics['mean_error'], 0.01)
+    assert np.isclose(statistics['max_error'], 0.02)
+    assert statistics['mean_pulse'] == 8 / 3 and statistics['total_pulse'] == 8
+
+    statistics = qdms.ProgrammingResult().statistics()
+    assert np.isnan(statistics['resolution']) and np.isnan(statistics['mean_error'])
+    assert np.isnan(statistics['mean_pulse']) and statistics['total_pulse'] == 0
+
+
+def test_sort_extend_pickle():
+    result = create_result()
+    sorted_result = result.sort_by_voltage()
+    np.testing.assert_array_equal(sorted_result.voltage, [1.02, 1.2, 1.49, 2.0])
+    np.testing.assert_array_equal(sorted_result.resistances[:, 0], [1000, 1050, 1100, 1200])
+    np.testing.assert_array_equal(sorted_result.number_of_pulse, [5, 0, 3, -1])
+
+    extended = qdms.ProgrammingResult()
+    extended.extend(result)
+    extended.extend(result)
+    assert len(extended) == 8 and extended.number_of_memristor == 2
+    np.testing.assert_array_equal(extended.voltage[4:], result.voltage)
+
+    restored = pickle.loads(pickle.dumps(result))
+    assert len(restored._voltage) == len(result)
+    np.testing.assert_array_equal(restored.resistances, result.resistances)
+    assert restored.voltage_output == result.voltage_output
+
+    from_dict = qdms.ProgrammingResult.from_voltage_output(result.voltage_output)
+    np.testing.assert_array_equal(from_dict.voltage, result.voltage)
+    assert np.all(np.isnan(from_dict.target_voltage)) and np.all(from_dict.number_of_pulse == -1)
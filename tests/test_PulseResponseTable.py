@@ -0,0 +1,21 @@
+import numpy as np
+import qdms
+
+
+def test_query_error_off_grid():
+    for parameter_model in ['N1257R', 'O921C']:
+        table = qdms.PulseResponseTable(parameter_model)
+        table.build()
+        rng = np.random.default_rng(0)
+        resistance = rng.uniform(table.r_min, table.r_max, 100000)
+        voltage = rng.uniform(table.v_min, table.v_max, 100000)
+        error = np.abs(table.query(resistance, voltage, 200e-9) - table.exact(resistance, voltage, 200e-9))
+        assert np.max(error) <= table.max_error
+
+
+def test_query_scalar():
+    table = qdms.PulseResponseTable('N1257R')
+    table.build()
+    rng = np.random.default_rng(1)
+    for resistance, voltage in zip(rng.uniform(table.r_min, table.r_max, 20), rng.uniform(-3, 3, 20)):
+        assert table.query(resistance, voltage, 200e-9) == table.query(np.array([resistance]), voltage, 200e-9)[0]
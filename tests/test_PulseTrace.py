@@ -0,0 +1,76 @@
+import pickle
+import numpy as np
+import qdms
+
+
+def create_pulse_trace(entries, capacity=2):
+    trace = qdms.PulseTrace(capacity=capacity)
+    for entry in entries:
+        trace.append(entry)
+    return trace
+
+
+ENTRIES = [[1000., 0, 'read', False], [1.2, 1, 'set', False], [900., 2, 'read', True],
+           [-1.1, 3, 'reset', False], [950., 4, 'read', True],
+           [800., 5, 'read', False], [1.3, 6, 'set', False], [700., 7, 'read', False], [750., 8, 'read', True]]
+
+
+def test_record():
+    # Grown from a capacity of 2, and like the list of pulses it replaces
+    trace = create_pulse_trace(ENTRIES)
+    assert len(trace) == len(ENTRIES)
+    assert list(trace) == ENTRIES
+    assert trace[-1] == ENTRIES[-1]
+    assert trace[2:5] == ENTRIES[2:5]
+    np.testing.assert_array_equal(trace.value, [entry[0] for entry in ENTRIES])
+    np.testing.assert_array_equal(trace.is_finish, [entry[3] for entry in ENTRIES])
+    assert trace.next_index == 9
+
+    is_raised = False
+    try:
+        trace[len(ENTRIES)]
+    except IndexError:
+        is_raised = True
+    assert is_raised
+
+    trace = qdms.PulseTrace(has_finish=False)
+    trace.append([1.2, 0, 'set'])
+    assert trace[0] == [1.2, 0, 'set'] and trace.number_segment == 0 and trace.next_index == 1
+
+
+def test_segment():
+    trace = create_pulse_trace(ENTRIES)
+    assert trace.number_segment == 3
+    np.testing.assert_array_equal(trace.segment_ends, [2, 4, 8])
+    assert trace.segment(0) == slice(0, 3)
+    assert trace.segment(1) == slice(3, 5)
+    assert trace.segment(2) == slice(5, 9)
+    assert trace.segment(-1) == trace.segment(2)
+    np.testing.assert_array_equal(trace.index[trace.segment(1)], [3, 4])
+
+
+def test_extend():
+    # Like recording the pulses of the other trace one by one, shifted by index_offset
+    for split in [0, 3, 5, 7, len(ENTRIES)]:
+        trace = create_pulse_trace(ENTRIES[:split])
+        other = create_pulse_trace([[value, index - split, action, is_finish]
+                                    for value, index, action, is_finish in ENTRIES[split:]])
+        trace.extend(other, index_offset=split)
+        expected = create_pulse_trace(ENTRIES)
+        assert list(trace) == list(expected)
+        assert trace.number_segment == expected.number_segment
+        for k in range(expected.number_segment):
+            assert trace.segment(k) == expected.segment(k)
+        # Still grows after an extend
+        trace.record(600., 9, 'read', is_finish=True)
+        assert trace.segment(-1) == slice(9, 10)
+
+
+def test_pickle():
+    trace = create_pulse_trace(ENTRIES, capacity=1024)
+    restored = pickle.loads(pickle.dumps(trace))
+    assert len(restored._value) == len(ENTRIES)
+    assert list(restored) == ENTRIES
+    assert restored.segment(-1) == trace.segment(-1)
+    restored.record(600., 9, 'read', is_finish=True)
+    assert len(restored) == len(ENTRIES) + 1 and restored.number_segment == 4
@@ -0,0 +1,135 @@
+import contextlib
+import copy
+import io
+import numpy as np
+import qdms
+from qdms.PulsedProgramming import program_chunk
+
+PRECISION = [[50, False], [10, False]]
+
+
+def create_pulsed_programming(**kwargs):
+    circuit = qdms.Circuit(qdms.Data_Driven(), 2)
+    memristor_simulation = qdms.MemristorSimulation(circuit, 4)
+    memristor_simulation.simulate()
+    voltages_target = qdms.algorithm(0.05, memristor_simulation, policy='full')
+    pulsed_programming = qdms.PulsedProgramming(memristor_simulation, tolerance=1, is_relative_tolerance=True,
+                                                **kwargs)
+    return pulsed_programming, voltages_target
+
+
+def test_program_chunk_write_noise():
+    for rng in [None, 1]:
+        # A block the chunks don't use up, so it is never refilled while programming
+        pulsed_programming, voltages_target = create_pulsed_programming(variance_write=0.01, rng=rng,
+                                                                        variability_block_size=10**6)
+        seeds = np.random.SeedSequence(0).spawn(2)
+        chunks = [copy.deepcopy(pulsed_programming) for _ in seeds]
+        for chunk, seed in zip(chunks, seeds):
+            program_chunk(chunk, voltages_target, PRECISION, seed)
+        assert not np.array_equal(chunks[0].variability_write, chunks[1].variability_write)
+        assert not np.array_equal(chunks[0].result.resistances, chunks[1].result.resistances)
+
+
+def test_simulate_parallel():
+    results = []
+    for max_workers in [1, 2]:
+        pulsed_programming, voltages_target = create_pulsed_programming(variance_write=0.01, rng=1, chunk_size=3,
+                                                                        max_workers=max_workers, seed=0)
+        pulsed_programming.simulate(voltages_target, PRECISION)
+        results.append(pulsed_programming)
+    assert len(results[0].result) == len(results[1].result) > 3
+    for name in ['target_voltage', 'voltage', 'resistances', 'number_of_pulse']:
+        np.testing.assert_array_equal(getattr(results[0].result, name), getattr(results[1].result, name))
+    np.testing.assert_array_equal(results[0].graph_resistance.value, results[1].graph_resistance.value)
+
+
+def test_lockstep_convergence():
+    # Without noise, programming the memristors together or one after the other gives the same pulses
+    for pulse_algorithm in ['fabien', 'log']:
+        for batch_threshold in [1, 16]:
+            pulsed_programming, _ = create_pulsed_programming(pulse_algorithm=pulse_algorithm)
+            list_resistance = pulsed_programming.memristor_simulation.list_resistance[0][1:3]
+            list_memristor = pulsed_programming.memristor_simulation.circuit.list_memristor
+            pulsed_programming.lockstep_convergence(list_memristor, list_resistance, batch_threshold=batch_threshold)
+
+            expected, _ = create_pulsed_programming(pulse_algorithm=pulse_algorithm)
+            for memristor, resistance in zip(expected.memristor_simulation.circuit.list_memristor, list_resistance):
+                if pulse_algorithm == 'fabien':
+                    expected.fabien_convergence(memristor, resistance)
+                else:
+                    expected.log_convergence(memristor, resistance)
+            np.testing.assert_allclose([memristor.g for memristor in list_memristor],
+                                       [memristor.g for memristor in expected.memristor_simulation.circuit.list_memristor],
+                                       rtol=1e-9)
+            assert [row[1] for row in pulsed_programming.trace_summary] == \
+                [row[1] for row in expected.trace_summary]
+
+
+def test_lockstep_convergence_without_noise_buffer():
+    # A memristor model without noise_buffer_size
+    pulsed_programming, _ = create_pulsed_programming()
+    list_resistance = pulsed_programming.memristor_simulation.list_resistance[0][1:3]
+    list_memristor = pulsed_programming.memristor_simulation.circuit.list_memristor
+    for memristor in list_memristor:
+        del memristor.noise_buffer_size
+    pulsed_programming.lockstep_convergence(list_memristor, list_resistance)
+    assert pulsed_programming.number_of_pulse > 0
+
+
+def test_trace_sampled():
+    for is_lockstep in [False, True]:
+        for chunk_size in [None, 3]:
+            pulsed_programming, voltages_target = create_pulsed_programming(
+                is_lockstep=is_lockstep, trace_level='sampled', trace_sampling=3, chunk_size=chunk_size,
+                max_workers=1, seed=0)
+            pulsed_programming.simulate(voltages_target, PRECISION)
+            graph_resistance = pulsed_programming.graph_resistance
+            graph_voltages = pulsed_programming.graph_voltages
+            # One row per pulse recorded in both, numbered by pulse and not by row
+            np.testing.assert_array_equal(graph_voltages.index, graph_resistance.index)
+            assert np.all(np.diff(graph_resistance.index) > 0)
+            assert graph_resistance.next_index > len(graph_resistance)
+            assert graph_resistance.number_segment >= len(voltages_target)
+
+            qdms.Plot.create_pulsed_programming_plot(pulsed_programming, is_annotation=True)
+            qdms.Plot.create_amplitude_plot(pulsed_programming)
+
+
+def test_trace_levels():
+    # What is recorded doesn't change the programming
+    for is_lockstep in [False, True]:
+        results = []
+        for trace_level in ['full', 'summary', 'sampled']:
+            pulsed_programming, voltages_target = create_pulsed_programming(is_lockstep=is_lockstep,
+                                                                            trace_level=trace_level, seed=0)
+            pulsed_programming.simulate(voltages_target, PRECISION)
+            results.append(pulsed_programming)
+        for pulsed_programming in results[1:]:
+            np.testing.assert_array_equal(pulsed_programming.result.resistances, results[0].result.resistances)
+            np.testing.assert_array_equal(pulsed_programming.result.number_of_pulse, results[0].result.number_of_pulse)
+            # The last column is the time taken
+            assert [row[:3] for row in pulsed_programming.trace_summary] == \
+                [row[:3] for row in results[0].trace_summary]
+        assert len(results[1].graph_resistance) == 0
+        assert len(results[2].graph_resistance) < len(results[0].graph_resistance)
+
+
+def test_pulse_table_queried():
+    table = qdms.PulseResponseTable(qdms.Data_Driven().parameter_model)
+    table.build()
+    number_of_query = []
+    query = table.query
+    table.query = lambda *args: number_of_query.append(len(args[0])) or query(*args)
+
+    circuit = qdms.Circuit(qdms.Data_Driven(), 20)
+    memristor_simulation = qdms.MemristorSimulation(circuit, 4)
+    pulsed_programming = qdms.PulsedProgramming(memristor_simulation, tolerance=1, is_relative_tolerance=True,
+                                                is_lockstep=True, pulse_table=table)
+    pulsed_programming.lockstep_convergence(circuit.list_memristor, np.linspace(3000, 9000, 20))
+    assert number_of_query and max(number_of_query) == 20
+
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+        qdms.PulsedProgramming(memristor_simulation, pulse_table=table)
+    assert 'pulse_table is never queried' in output.getvalue()
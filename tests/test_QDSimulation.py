@@ -0,0 +1,125 @@
+import os
+import pickle
+import tempfile
+import numpy as np
+import qdms
+
+
+def create_quantum_simulation(shape=(29, 37), **kwargs):
+    voltages_x = np.linspace(0, 0.05, shape[1])
+    voltages_y = np.linspace(0, 0.05, shape[0])
+    return qdms.QDSimulation(voltages_x, voltages_y, verbose=False, **kwargs)
+
+
+def test_simulate_tiles():
+    quantum_sim = create_quantum_simulation()
+    quantum_sim.simulate()
+    expected = np.array(quantum_sim.stability_diagram)
+
+    quantum_sim_tiles = create_quantum_simulation(tile_size=8, max_workers=2)
+    quantum_sim_tiles.simulate()
+    np.testing.assert_allclose(quantum_sim_tiles.stability_diagram, expected, rtol=0, atol=1e-12)
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'diagram.npy')
+        quantum_sim_tiles = create_quantum_simulation(tile_size=8, max_workers=2)
+        quantum_sim_tiles.simulate(path)
+        np.testing.assert_allclose(quantum_sim_tiles.stability_diagram, expected, rtol=0, atol=1e-12)
+        np.testing.assert_allclose(np.load(path), expected, rtol=0, atol=1e-12)
+        assert np.all(np.load(f'{path}.tiles.npy'))
+        del quantum_sim_tiles
+
+
+def test_simulate_tiles_resume():
+    quantum_sim = create_quantum_simulation()
+    quantum_sim.simulate()
+    expected = np.array(quantum_sim.stability_diagram)
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'diagram.npy')
+        tiles_path = f'{path}.tiles.npy'
+        create_quantum_simulation(tile_size=8, max_workers=2).simulate(path)
+
+        # Tiles 1 and 6 are corrupted and not finished, tile 0 is finished: only 1 and 6 are computed again
+        output = np.load(path, mmap_mode='r+')
+        output[0:8, 8:16] = np.nan
+        output[8:16, 8:16] = np.nan
+        output[0:8, 0:8] = -1
+        output.flush()
+        del output
+        is_done = np.load(tiles_path)
+        is_done[[1, 6]] = False
+        np.save(tiles_path, is_done)
+
+        quantum_sim_tiles = create_quantum_simulation(tile_size=8, max_workers=2)
+        quantum_sim_tiles.simulate(path)
+        diagram = np.array(quantum_sim_tiles.stability_diagram)
+        del quantum_sim_tiles
+        np.testing.assert_allclose(diagram[0:8, 8:16], expected[0:8, 8:16], rtol=0, atol=1e-12)
+        np.testing.assert_allclose(diagram[8:16, 8:16], expected[8:16, 8:16], rtol=0, atol=1e-12)
+        assert np.all(diagram[0:8, 0:8] == -1)
+        assert np.all(np.load(tiles_path))
+
+        # Without the list of finished tiles, the whole diagram is computed again
+        os.remove(tiles_path)
+        quantum_sim_tiles = create_quantum_simulation(tile_size=8, max_workers=2)
+        quantum_sim_tiles.simulate(path)
+        np.testing.assert_allclose(quantum_sim_tiles.stability_diagram, expected, rtol=0, atol=1e-12)
+        del quantum_sim_tiles
+
+        # The list of finished tiles doesn't match another tile size
+        is_raised = False
+        try:
+            create_quantum_simulation(tile_size=5, max_workers=2).simulate(path)
+        except Exception:
+            is_raised = True
+        assert is_raised
+
+
+def test_simulate_adaptive():
+    quantum_sim = create_quantum_simulation(shape=(121, 121))
+    quantum_sim.simulate()
+    expected = np.array(quantum_sim.stability_diagram)
+
+    for step in [4, 16]:
+        for tolerance in [0.01, 0.05]:
+            quantum_sim.simulate_adaptive(step=step, tolerance=tolerance)
+            assert np.abs(quantum_sim.stability_diagram - expected).max() <= tolerance
+            assert quantum_sim.evaluations < expected.size / 2
+
+
+def test_simulate_adaptive_transitions():
+    tolerance = 0.05
+    quantum_sim = create_quantum_simulation(shape=(121, 121))
+    voltages = quantum_sim.voltages_x
+    quantum_sim.simulate()
+    diagram = np.array(quantum_sim.stability_diagram)
+
+    # The cells one voltage wide whose corners differ by more than tolerance
+    corners = np.stack([diagram[:-1, :-1], diagram[:-1, 1:], diagram[1:, :-1], diagram[1:, 1:]])
+    rows, columns = np.nonzero(np.ptp(corners, axis=0) > tolerance)
+    expected = np.stack([(voltages[columns] + voltages[columns + 1]) / 2, (voltages[rows] + voltages[rows + 1]) / 2],
+                        axis=1)
+    expected = expected[np.lexsort(expected.T)]
+
+    quantum_sim = create_quantum_simulation(shape=(121, 121))
+    quantum_sim.simulate_adaptive(step=8, tolerance=tolerance, is_dense=False)
+    transitions = quantum_sim.transitions[np.lexsort(quantum_sim.transitions.T)]
+    np.testing.assert_allclose(transitions, expected, rtol=0, atol=1e-12)
+    # Only the transitions are kept
+    assert quantum_sim.stability_diagram[0][0] is None
+    assert quantum_sim.evaluations < diagram.size / 2
+
+
+def test_pickle():
+    quantum_sim = create_quantum_simulation(tile_size=8)
+    state = dict(quantum_sim.__dict__)
+    for name in ['window', 'tile_size', 'max_workers', 'transitions', 'evaluations']:
+        del state[name]
+    old_quantum_sim = qdms.QDSimulation.__new__(qdms.QDSimulation)
+    old_quantum_sim.__dict__.update(state)
+    quantum_sim = pickle.loads(pickle.dumps(old_quantum_sim))
+    assert quantum_sim.window is None and quantum_sim.tile_size is None and quantum_sim.max_workers is None
+    assert quantum_sim.transitions is None and quantum_sim.evaluations == 0
+    quantum_sim.simulate()
+    assert np.array(quantum_sim.stability_diagram).shape == (29, 37)
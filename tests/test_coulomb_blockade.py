@@ -0,0 +1,150 @@
+import numpy as np
+import qdms.coulomb_blockade as cb
+
+
+def reference_N_moy_DQD(Vg1, Vg2, Cg1, Cg2, Cm, CL, CR, N_min=0, N_max=10, kBT=0.01, e=1, is_occupation=False):
+    # Like the former loops: the Boltzmann weight of each charge state, one voltage at a time, relative to the ground
+    # state so it does not overflow
+    moy = []
+    for vg1, vg2 in zip(np.ravel(Vg1), np.ravel(Vg2)):
+        E = []
+        charge = []
+        for n1 in range(N_min, N_max + 1):
+            for n2 in range(N_min, N_max + 1):
+                E.append(cb.U_DQD(n1, n2, vg1, vg2, Cg1, Cg2, Cm, CL, CR, e=e))
+                charge.append(n1 + n2 if is_occupation else n1 - n2)
+        E = np.array(E)
+        weight = np.exp(-(E - E.min())/kBT)
+        moy.append(np.sum(weight*np.array(charge)) / np.sum(weight))
+    return np.array(moy)
+
+
+def test_N_moy_DQD():
+    Cg1, Cg2, Cm, CL, CR = 1, 1.2, 0.3, 0.5, 0.4
+    Vg = np.linspace(-1, 12, 23)
+    Vg1, Vg2 = np.meshgrid(Vg, Vg)
+    for is_occupation in [False, True]:
+        for kBT in [0.05, 0.5]:
+            expected = reference_N_moy_DQD(Vg1, Vg2, Cg1, Cg2, Cm, CL, CR, kBT=kBT, is_occupation=is_occupation)
+            for block_size in [1, 100, 2**20]:
+                moy = cb.N_moy_DQD(Vg1, Vg2, Cg1, Cg2, Cm, CL, CR, kBT=kBT, is_occupation=is_occupation,
+                                   block_size=block_size)
+                assert moy.shape == Vg1.shape
+                np.testing.assert_allclose(moy.ravel(), expected, atol=1e-9)
+
+
+def test_N_moy_low_temperature():
+    # exp(-E/kBT) underflows to 0 for every state at this temperature, the log domain doesn't
+    Ng = np.array([0.2, 1.3, 4.8, 9.6, 12])
+    np.testing.assert_allclose(cb.N_moy(Ng, kBT=1e-5), [0, 1, 5, 10, 10])
+    np.testing.assert_allclose(cb.U_moy(Ng, kBT=1e-5), 0.5*(Ng - [0, 1, 5, 10, 10])**2)
+
+    Cg1, Cg2, Cm, CL, CR = 1, 1.2, 0.3, 0.5, 0.4
+    Ec1, Ec2, Ecm = cb.charging_energy(Cg1, Cg2, Cm, CL, CR)
+    Vg = np.linspace(-1, 12, 23)
+    Vg1, Vg2 = np.meshgrid(Vg, Vg)
+    for is_occupation in [False, True]:
+        moy = cb.N_moy_DQD(Vg1, Vg2, Cg1, Cg2, Cm, CL, CR, kBT=1e-5, is_occupation=is_occupation)
+        N1, N2 = cb.ground_state_DQD(Cg1*Vg1, Cg2*Vg2, Ec1, Ec2, Ecm)
+        assert np.all(np.isfinite(moy))
+        np.testing.assert_allclose(moy, N1 + N2 if is_occupation else N1 - N2, atol=1e-9)
+
+
+def test_ground_state_DQD():
+    # Against every charge state of [N_min, N_max], with Ng inside and outside of it
+    rng = np.random.default_rng(0)
+    N = np.arange(0, 11)
+    N1, N2 = [a.ravel() for a in np.meshgrid(N, N)]
+    for _ in range(300):
+        Ec1, Ec2 = rng.uniform(0.2, 2, 2)
+        Ecm = rng.uniform(0, 0.95)*np.sqrt(Ec1*Ec2)
+        Ng1, Ng2 = rng.uniform(-8, 18, (2, 10))
+        dN1 = N1[:, np.newaxis] - Ng1
+        dN2 = N2[:, np.newaxis] - Ng2
+        E = 0.5*Ec1*dN1**2 + 0.5*Ec2*dN2**2 + Ecm*dN1*dN2
+        ground1, ground2 = cb.ground_state_DQD(Ng1, Ng2, Ec1, Ec2, Ecm, 0, 10)
+        assert np.all((ground1 >= 0) & (ground1 <= 10) & (ground2 >= 0) & (ground2 <= 10))
+        dN1 = ground1 - Ng1
+        dN2 = ground2 - Ng2
+        np.testing.assert_allclose(0.5*Ec1*dN1**2 + 0.5*Ec2*dN2**2 + Ecm*dN1*dN2, E.min(axis=0), rtol=1e-12)
+
+
+def test_N_moy_DQD_window():
+    Cg1, Cg2, Cm, CL, CR = 1, 1.2, 0.3, 0.5, 0.4
+    Ec1, Ec2, Ecm = cb.charging_energy(Cg1, Cg2, Cm, CL, CR)
+    Vg = np.linspace(-3, 14, 35)
+    Vg1, Vg2 = np.meshgrid(Vg, Vg)
+    for kBT in [0.02, 0.1]:
+        for window in [2, 3]:
+            bound = cb.window_error_bound(Ec1, Ec2, Ecm, kBT, window)
+            for is_occupation in [False, True]:
+                full = cb.N_moy_DQD(Vg1, Vg2, Cg1, Cg2, Cm, CL, CR, kBT=kBT, is_occupation=is_occupation)
+                windowed = cb.N_moy_DQD(Vg1, Vg2, Cg1, Cg2, Cm, CL, CR, kBT=kBT, is_occupation=is_occupation,
+                                        window=window, block_size=1000)
+                assert np.max(np.abs(windowed - full)) <= max(bound, 1e-9)
+
+
+def test_transition_voltages_DQD():
+    # Against the changes of the ground state along a dense sweep, found among every charge state
+    Cg1, Cg2, Cm, CL, CR = 1, 1.2, 0.3, 0.5, 0.4
+    Ec1, Ec2, Ecm = cb.charging_energy(Cg1, Cg2, Cm, CL, CR)
+    N = np.arange(0, 6)
+    N1, N2 = [a.ravel()[:, np.newaxis] for a in np.meshgrid(N, N)]
+    V_sweep = np.linspace(-3, 9, 120001)
+    step = V_sweep[1] - V_sweep[0]
+    for is_sweep_gate_2 in [False, True]:
+        for V_fixed in [-1.3, 0.37, 2.71, 4.05, 8.2]:
+            if is_sweep_gate_2:
+                dN1, dN2 = N1 - Cg1*V_fixed, N2 - Cg2*V_sweep
+            else:
+                dN1, dN2 = N1 - Cg1*V_sweep, N2 - Cg2*V_fixed
+            E = 0.5*Ec1*dN1**2 + 0.5*Ec2*dN2**2 + Ecm*dN1*dN2
+            ground = np.argmin(E, axis=0)
+            expected = V_sweep[:-1][np.diff(ground) != 0] + step/2
+
+            transitions = cb.transition_voltages_DQD(V_fixed, Cg1, Cg2, Cm, CL, CR, 0, 5,
+                                                     is_sweep_gate_2=is_sweep_gate_2)
+            transitions = transitions[(transitions > V_sweep[0]) & (transitions < V_sweep[-1])]
+            assert len(transitions) == len(expected)
+            np.testing.assert_allclose(transitions, expected, atol=step)
+            np.testing.assert_allclose(cb.transition_voltages_DQD(V_fixed, Cg1, Cg2, Cm, CL, CR, 0, 5,
+                                                                  is_sweep_gate_2=is_sweep_gate_2,
+                                                                  V_range=(V_sweep[0], V_sweep[-1])), transitions)
+
+
+def test_honeycomb_DQD():
+    # Against the changes of the ground state on a dense grid of voltages
+    Cg1, Cg2, Cm, CL, CR = 1, 1.2, 0.3, 0.5, 0.4
+    Ec1, Ec2, Ecm = cb.charging_energy(Cg1, Cg2, Cm, CL, CR)
+    vertices, edges = cb.honeycomb_DQD(Cg1, Cg2, Cm, CL, CR, 0, 5)
+    Vg1, Vg2 = np.meshgrid(np.linspace(-1, 6, 701), np.linspace(-1, 5, 601))
+    step = 0.01
+    N1, N2 = cb.ground_state_DQD(Cg1*Vg1, Cg2*Vg2, Ec1, Ec2, Ecm, 0, 5)
+    state = 6*N1 + N2
+
+    # Each change between two neighbors of the grid is on an edge, away from the infinite edges of the border
+    is_change = state[:, 1:] != state[:, :-1]
+    points = [np.stack([(Vg1[:, 1:] + Vg1[:, :-1])[is_change]/2, Vg2[:, 1:][is_change]], axis=1)]
+    is_change = state[1:] != state[:-1]
+    points.append(np.stack([Vg1[1:][is_change], (Vg2[1:] + Vg2[:-1])[is_change]/2], axis=1))
+    points = np.concatenate(points)
+    points = points[np.all((points >= vertices.min(axis=0)) & (points <= vertices.max(axis=0)), axis=1)]
+    start, end = edges[:, 0], edges[:, 1]
+    t = np.einsum('pij,ij->pi', points[:, np.newaxis] - start, end - start) / np.sum((end - start)**2, axis=1)
+    nearest = start + np.clip(t, 0, 1)[..., np.newaxis]*(end - start)
+    distance = np.linalg.norm(points[:, np.newaxis] - nearest, axis=2).min(axis=1)
+    assert len(points) > 1000
+    assert distance.max() <= step/2
+
+    # The ground state changes across the middle of each edge, and three states meet at each vertex
+    middle = edges.mean(axis=1)
+    normal = (edges[:, 1] - edges[:, 0])[:, ::-1]*[1, -1]
+    normal *= 1e-6/np.linalg.norm(normal, axis=1)[:, np.newaxis]
+    side1 = cb.ground_state_DQD(Cg1*(middle + normal)[:, 0], Cg2*(middle + normal)[:, 1], Ec1, Ec2, Ecm, 0, 5)
+    side2 = cb.ground_state_DQD(Cg1*(middle - normal)[:, 0], Cg2*(middle - normal)[:, 1], Ec1, Ec2, Ecm, 0, 5)
+    assert np.all((side1[0] != side2[0]) | (side1[1] != side2[1]))
+    angles = np.linspace(0, 2*np.pi, 24, endpoint=False)
+    for vertex in vertices:
+        around = vertex + 1e-6*np.stack([np.cos(angles), np.sin(angles)], axis=1)
+        N1, N2 = cb.ground_state_DQD(Cg1*around[:, 0], Cg2*around[:, 1], Ec1, Ec2, Ecm, 0, 5)
+        assert len(set(zip(N1.tolist(), N2.tolist()))) == 3